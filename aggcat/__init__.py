@@ -1,3 +1,6 @@
 from __future__ import absolute_import
 
 from .client import AggcatClient
+from .async_client import AsyncAggcatClient
+from .pool import AggcatClientPool
+from . import models
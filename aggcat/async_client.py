@@ -0,0 +1,95 @@
+from __future__ import absolute_import
+
+from multiprocessing.pool import ThreadPool
+
+from .client import AggcatClient
+from .transport import Transport
+
+
+def _endpoint(name):
+    """Build a method that runs :class:`AggcatClient` method `name` on the thread pool"""
+    def method(self, *args, **kwargs):
+        return self.pool.apply_async(getattr(self.client, name), args, kwargs)
+
+    method.__name__ = name
+    method.__doc__ = 'Run :meth:`AggcatClient.%s` in the background and return a ' \
+        '``multiprocessing.pool.AsyncResult``' % name
+
+    return method
+
+
+class AsyncAggcatClient(object):
+    """Intuit Customer Data API client that keeps many requests in flight at once
+
+    Takes the same arguments as :class:`AggcatClient` plus:
+
+    :param integer workers: (optional) Maximum number of requests in flight. Default: ``100``
+
+    Every endpoint of :class:`AggcatClient` is available and returns immediately with a
+    ``multiprocessing.pool.AsyncResult``. Call ``get()`` on it to wait for the
+    :class:`AggCatResponse`. Signing, the network and objectification all happen on the worker
+    threads and the client gets its own connection pool sized to ``workers``::
+
+        from aggcat.async_client import AsyncAggcatClient
+
+        client = AsyncAggcatClient(
+            'oauth_consumer_key',
+            'oauth_consumer_secret',
+            'saml_identity_provider_id',
+            'customer_id',
+            '/path/to/x509/appname.key',
+            workers=200
+        )
+
+        accounts = client.get_customer_accounts().get()
+
+        results = [
+            client.get_account_transactions(account.account_id, '2013-08-01')
+            for account in accounts.content
+        ]
+
+        for r in results:
+            transactions = r.get()
+
+    .. note::
+
+        This library supports Python 2 so it uses threads instead of ``asyncio``. The
+        ``get()`` call releases the GIL while waiting, as do the network and lxml parsing.
+    """
+    def __init__(self, *args, **kwargs):
+        workers = kwargs.pop('workers', 100)
+
+        if kwargs.get('transport') is None:
+            kwargs['transport'] = Transport(pool_maxsize=workers)
+
+        self.client = AggcatClient(*args, **kwargs)
+        self.pool = ThreadPool(workers)
+
+    get_credential_fields = _endpoint('get_credential_fields')
+    get_institutions = _endpoint('get_institutions')
+    get_institution_details = _endpoint('get_institution_details')
+    discover_and_add_accounts = _endpoint('discover_and_add_accounts')
+    confirm_challenge = _endpoint('confirm_challenge')
+    get_customer_accounts = _endpoint('get_customer_accounts')
+    get_login_accounts = _endpoint('get_login_accounts')
+    get_account = _endpoint('get_account')
+    get_account_transactions = _endpoint('get_account_transactions')
+    get_investment_positions = _endpoint('get_investment_positions')
+    update_account_type = _endpoint('update_account_type')
+    update_institution_login = _endpoint('update_institution_login')
+    update_challenge = _endpoint('update_challenge')
+    delete_account = _endpoint('delete_account')
+    delete_customer = _endpoint('delete_customer')
+    list_files = _endpoint('list_files')
+    get_file_data = _endpoint('get_file_data')
+    download_file = _endpoint('download_file')
+    delete_file = _endpoint('delete_file')
+
+    def close(self):
+        """Wait for requests in flight to finish and stop the worker threads"""
+        self.pool.close()
+        self.pool.join()
+        self.client.close()
+
+    def __repr__(self):
+        return '<AsyncAggcatClient %s @ %s>' % (self.client.customer_id, hex(id(self)))
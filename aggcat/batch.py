@@ -0,0 +1,164 @@
+from __future__ import absolute_import
+
+from datetime import datetime, date, timedelta
+from multiprocessing.pool import ThreadPool
+
+from .ratelimit import TokenBucket
+
+
+class BatchResult(object):
+    """The outcome of fetching one account in a batch. Either ``response``
+    is the :class:`AggCatResponse` or ``error`` is the exception raised"""
+    __slots__ = ('account_id', 'start_date', 'end_date', 'response', 'error')
+
+    def __init__(self, account_id, start_date, end_date, response=None, error=None):
+        self.account_id = account_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.response = response
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return '<BatchResult %s %s>' % (self.account_id, 'ok' if self.ok else repr(self.error))
+
+
+def _run(func, items, concurrency, rate_limit=None, ordered=False):
+    """Call `func` on every item on a thread pool and yield the results. Results
+    come back as they finish unless `ordered` is ``True``"""
+    throttle = TokenBucket(rate_limit) if rate_limit else None
+
+    def call(item):
+        if throttle is not None:
+            throttle.acquire()
+        return func(item)
+
+    pool = ThreadPool(concurrency)
+
+    try:
+        if ordered:
+            results = pool.imap(call, items)
+        else:
+            results = pool.imap_unordered(call, items)
+
+        for result in results:
+            yield result
+    finally:
+        pool.terminate()
+
+
+def fetch_transactions(client, accounts, concurrency=10, rate_limit=None):
+    """Fetch the transactions of many accounts at once
+
+    :param client: An :class:`AggcatClient`
+    :param accounts: An iterable of ``(account_id, start_date)`` or ``(account_id, start_date, end_date)``
+                     tuples. Dates are in the format YYYY-MM-DD.
+    :param integer concurrency: (optional) Maximum number of requests in flight. Default: ``10``
+    :param float rate_limit: (optional) Maximum number of requests started per second. Default: ``None``
+    :returns: A generator of :class:`BatchResult` in the order the requests finish
+
+    A failing account does not stop the batch. Its error is on the result instead::
+
+        >>> from aggcat.batch import fetch_transactions
+        >>> accounts = client.get_customer_accounts()
+        >>> batch = [(a.account_id, '2013-08-01', '2013-08-31') for a in accounts.content]
+        >>> for result in fetch_transactions(client, batch, concurrency=20, rate_limit=10):
+                if result.ok:
+                    print result.account_id, len(result.response.content)
+                else:
+                    print result.account_id, result.error
+    """
+    def fetch(account):
+        account_id, start_date = account[0], account[1]
+        end_date = account[2] if len(account) > 2 else None
+
+        try:
+            response = client.get_account_transactions(account_id, start_date, end_date)
+        except Exception as e:
+            return BatchResult(account_id, start_date, end_date, error=e)
+
+        return BatchResult(account_id, start_date, end_date, response)
+
+    return _run(fetch, accounts, concurrency, rate_limit)
+
+
+def date_windows(start_date, end_date=None, window_days=90):
+    """Split a date range into consecutive windows of at most `window_days` days
+
+    :param string start_date: the first day in the format YYYY-MM-DD
+    :param string end_date: (optional) the last day in the format YYYY-MM-DD. Default: today
+    :param integer window_days: (optional) days in each window. Default: ``90``
+    :returns: ``list`` of ``(start_date, end_date)`` tuples in the format YYYY-MM-DD
+
+    ::
+
+        >>> date_windows('2013-01-01', '2013-03-15', 30)
+        [('2013-01-01', '2013-01-30'), ('2013-01-31', '2013-03-01'), ('2013-03-02', '2013-03-15')]
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+
+    if end_date:
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    else:
+        end = date.today()
+
+    windows = []
+    while start <= end:
+        window_end = min(start + timedelta(days=window_days - 1), end)
+        windows.append((start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')))
+        start = window_end + timedelta(days=1)
+
+    return windows
+
+
+def _transaction_date(transaction):
+    """The date to order a transaction by"""
+    return getattr(transaction, 'posted_date', None) or getattr(transaction, 'user_date', None) or ''
+
+
+def fetch_transaction_history(client, account_id, start_date, end_date=None, window_days=90, concurrency=4, rate_limit=None):
+    """Fetch a long transaction history as many small requests made in parallel
+
+    :param client: An :class:`AggcatClient`
+    :param integer account_id: the id of an account retrieved from :meth:`get_login_accounts`
+        or :meth:`get_customer_accounts`.
+    :param string start_date: the date you want the transactions to start in the format YYYY-MM-DD
+    :param string end_date: (optional) the date you want the transactions to end in the format YYYY-MM-DD
+    :param integer window_days: (optional) days of transactions to get per request. Default: ``90``
+    :param integer concurrency: (optional) Maximum number of requests in flight. Default: ``4``
+    :param float rate_limit: (optional) Maximum number of requests started per second. Default: ``None``
+    :returns: A generator of transaction objects ordered by date
+
+    The range is split with :func:`date_windows`. Each window is streamed and objectified on
+    a worker thread. Transactions that show up in two windows are only yielded once::
+
+        >>> from aggcat.batch import fetch_transaction_history
+        >>> for t in fetch_transaction_history(client, 400004540560, '2010-01-01', window_days=30):
+                print t.posted_date, t.id, t.total_amount
+
+    .. note::
+
+        Transactions are yielded in order one window at a time so later windows
+        may still be downloading while you work on earlier ones. If a window fails
+        its exception is raised when it is reached.
+    """
+    def fetch(window):
+        r = client.get_account_transactions(account_id, window[0], window[1], stream=True)
+        return sorted(r.content, key=_transaction_date)
+
+    seen = set()
+    windows = date_windows(start_date, end_date, window_days)
+
+    for transactions in _run(fetch, windows, concurrency, rate_limit, ordered=True):
+        for transaction in transactions:
+            transaction_id = getattr(transaction, 'id', None)
+
+            if transaction_id is not None:
+                if transaction_id in seen:
+                    continue
+                seen.add(transaction_id)
+
+            yield transaction
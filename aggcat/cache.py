@@ -0,0 +1,341 @@
+from __future__ import absolute_import
+
+import time
+import zlib
+import logging
+import sqlite3
+import threading
+
+from lxml import etree
+
+from .parser import RecordObjectify
+from .exceptions import HTTPError
+
+log = logging.getLogger(__name__)
+
+class TTLCache(object):
+    """A thread safe in memory cache whose entries expire
+
+    :param integer ttl: (optional) Seconds an entry is kept for. Default: ``3600``
+    """
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Get the value of `key` or ``None`` if it is missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is None:
+                return None
+
+            if time.time() - entry[0] > self.ttl:
+                del self._data[key]
+                return None
+
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+
+    def invalidate(self, key=None):
+        """Remove `key` or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# credential fields by institution id shared by every client in the process
+credential_fields = TTLCache()
+
+
+def _name_key(name):
+    """Lower case utf-8 name used for prefix lookups"""
+    name = (name or u'').lower()
+
+    if isinstance(name, unicode):
+        name = name.encode('utf-8')
+
+    return name
+
+
+class InstitutionCache(object):
+    """Keep the institution list and institution details on disk
+
+    :param client: An :class:`AggcatClient` used to refresh the cache
+    :param string path: (optional) Path to the SQLite database file. Default: ``aggcat_institutions.db``
+    :param integer ttl: (optional) Seconds before the institution list is refreshed. Default: ``86400``
+    :param integer details_ttl: (optional) Seconds before institution details are refreshed. Default: ``86400``
+    :param boolean background_refresh: (optional) Download a stale list from a background thread instead
+                                       of in the call that found it stale. Default: ``True``
+
+    :meth:`AggcatClient.get_institutions` takes minutes. The cache downloads the list once,
+    stores every institution as a compressed record indexed by id and name, and only
+    downloads it again once it is older than ``ttl``. When Intuit sends ``ETag`` or
+    ``Last-Modified`` headers the refresh is a conditional request.
+
+    Only the first download blocks the caller. After that, lookups keep reading the stale list
+    while it is refreshed. A failed refresh is logged and tried again ``retry_interval`` seconds
+    later, and the old list is served until then. Call :meth:`refresh` to download the list
+    yourself and see its errors::
+
+        >>> from aggcat.cache import InstitutionCache
+        >>> cache = InstitutionCache(client, '/var/lib/myapp/institutions.db')
+        >>> cache.get(13278).institution_name
+        'JP Morgan Chase Bank'
+        >>> [i.institution_name for i in cache.search_prefix('chase', limit=2)]
+        ['Chase Bank Credit Card (Amazon.com)', 'Chase e-Funds Card']
+        >>> cache.get_institution_details(13278).content.address.city
+        'Louisville'
+    """
+    def __init__(self, client, path='aggcat_institutions.db', ttl=86400, details_ttl=86400, background_refresh=True):
+        self.client = client
+        self.path = path
+        self.ttl = ttl
+        self.details_ttl = details_ttl
+        self.background_refresh = background_refresh
+
+        # seconds to wait before retrying a failed refresh of a stale list
+        self.retry_interval = 300
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+        self._retry_at = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.text_factory = str
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS institutions (
+                institution_id INTEGER PRIMARY KEY,
+                name_key TEXT NOT NULL,
+                record BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS institutions_name ON institutions (name_key);
+            CREATE TABLE IF NOT EXISTS details (
+                institution_id INTEGER PRIMARY KEY,
+                fetched_at REAL NOT NULL,
+                record BLOB NOT NULL
+            );
+        """)
+
+    def _get_meta(self, key):
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def is_stale(self):
+        """Check if the institution list needs to be downloaded again"""
+        with self._lock:
+            fetched_at = self._get_meta('fetched_at')
+
+        return fetched_at is None or time.time() - float(fetched_at) > self.ttl
+
+    def _has_institutions(self):
+        with self._lock:
+            return self._get_meta('fetched_at') is not None
+
+    def refresh(self, force=False):
+        """Download the institution list if it is stale. Only one thread downloads at
+        a time and, when there is a list to read from, other threads keep using it
+
+        :param boolean force: (optional) Download even if the list is not stale. Default: ``False``
+        :returns: ``True`` if the list changed
+        """
+        if not force and not self.is_stale():
+            return False
+
+        if not self._refresh_lock.acquire(force or not self._has_institutions()):
+            return False
+
+        try:
+            # another thread may have refreshed while we waited
+            if not force and not self.is_stale():
+                return False
+
+            # conditional request when intuit gave us validators last time
+            headers = {}
+            with self._lock:
+                etag = self._get_meta('etag')
+                last_modified = self._get_meta('last_modified')
+            if etag and not force:
+                headers['If-None-Match'] = etag
+            if last_modified and not force:
+                headers['If-Modified-Since'] = last_modified
+
+            r = self.client._make_request('institutions', headers=headers, stream=True)
+
+            try:
+                if r.status_code == 304:
+                    with self._lock:
+                        with self._db:
+                            self._set_meta('fetched_at', repr(time.time()))
+                    return False
+
+                if r.status_code != 200:
+                    raise HTTPError('Status Code: %s refreshing the institution list' % r.status_code)
+
+                # download everything before touching the table so readers never see half a list
+                rows = [
+                    (
+                        int(element.findtext('institutionId')),
+                        _name_key(element.findtext('institutionName')),
+                        sqlite3.Binary(zlib.compress(etree.tostring(element, with_tail=False)))
+                    )
+                    for element in r.content.iterelements()
+                ]
+            finally:
+                r.content.close()
+
+            with self._lock:
+                with self._db:
+                    self._db.execute('DELETE FROM institutions')
+                    self._db.executemany(
+                        'INSERT OR REPLACE INTO institutions (institution_id, name_key, record) VALUES (?, ?, ?)',
+                        rows
+                    )
+                    self._set_meta('fetched_at', repr(time.time()))
+                    self._set_meta('etag', r.headers.get('etag'))
+                    self._set_meta('last_modified', r.headers.get('last-modified'))
+        finally:
+            self._refresh_lock.release()
+
+        return True
+
+    def _refresh_quietly(self):
+        """Refresh the list, logging any error since the stale list can still be used"""
+        try:
+            self.refresh()
+        except Exception:
+            self._retry_at = time.time() + self.retry_interval
+            log.exception('Refreshing the institution list failed. The stale list is used until it is retried')
+
+    def _ensure_fresh(self):
+        """Download the list if there is none. Otherwise refresh a stale list without
+        making the caller wait for it or see its errors"""
+        if not self.is_stale():
+            return
+
+        if not self._has_institutions():
+            self.refresh()
+            return
+
+        if time.time() < self._retry_at:
+            return
+
+        if not self.background_refresh:
+            self._refresh_quietly()
+            return
+
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refresh_quietly, name='aggcat-institution-refresh')
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _record(self, blob):
+        return RecordObjectify(zlib.decompress(blob)).get_object()
+
+    def get(self, institution_id):
+        """Get an institution by id or ``None`` if it does not exist"""
+        self._ensure_fresh()
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT record FROM institutions WHERE institution_id = ?',
+                (int(institution_id),)
+            ).fetchone()
+
+        return self._record(row[0]) if row else None
+
+    def search_prefix(self, prefix, limit=None):
+        """Get institutions whose name starts with `prefix`, ignoring case, ordered by name"""
+        self._ensure_fresh()
+
+        prefix = _name_key(prefix)
+        query = 'SELECT record FROM institutions WHERE name_key >= ? AND name_key < ? ORDER BY name_key'
+        params = [prefix, prefix + '\xff']
+
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        return [self._record(row[0]) for row in rows]
+
+    def institutions(self):
+        """Get every institution ordered by id"""
+        self._ensure_fresh()
+
+        with self._lock:
+            rows = self._db.execute('SELECT record FROM institutions ORDER BY institution_id').fetchall()
+
+        return [self._record(row[0]) for row in rows]
+
+    def to_xml(self):
+        """Get the institution list as XML in the same form as :meth:`AggcatClient.get_institutions`
+        with the namespaces removed"""
+        self._ensure_fresh()
+
+        with self._lock:
+            rows = self._db.execute('SELECT record FROM institutions ORDER BY institution_id').fetchall()
+
+        return '<Institutions>%s</Institutions>' % ''.join(zlib.decompress(row[0]) for row in rows)
+
+    def get_institution_details(self, institution_id):
+        """Cached :meth:`AggcatClient.get_institution_details`"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT fetched_at, record FROM details WHERE institution_id = ?',
+                (int(institution_id),)
+            ).fetchone()
+
+        if row is not None and time.time() - row[0] <= self.details_ttl:
+            return self.client._response(200, {}, zlib.decompress(row[1]))
+
+        # keep the body exactly as sent so the cache works whatever the client retains
+        r = self.client._make_request('institutions/%s' % institution_id, raw=True)
+
+        if r.status_code == 200:
+            with self._lock:
+                with self._db:
+                    self._db.execute(
+                        'INSERT OR REPLACE INTO details (institution_id, fetched_at, record) VALUES (?, ?, ?)',
+                        (int(institution_id), time.time(), sqlite3.Binary(zlib.compress(r.content)))
+                    )
+
+        return self.client._response(r.status_code, r.headers, r.content)
+
+    def invalidate(self, institution_id=None):
+        """Force the institution list, or the details of one institution, to be downloaded again"""
+        with self._lock:
+            with self._db:
+                if institution_id is None:
+                    self._db.execute('DELETE FROM meta')
+                else:
+                    self._db.execute('DELETE FROM details WHERE institution_id = ?', (int(institution_id),))
+
+    def close(self):
+        """Wait for a background refresh to finish and close the database"""
+        with self._thread_lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+        self._db.close()
@@ -1,16 +1,23 @@
 from __future__ import absolute_import
 
 import urlparse
+from timeit import default_timer
 
-import requests
 from requests_oauthlib import OAuth1Session
 from lxml import etree
 
 from .saml import SAML
 from .exceptions import HTTPError
-from .utils import remove_namespaces
-from .parser import Objectify
+from .utils import strip_namespaces
+from .parser import Objectify, IterObjectify, LazyObjectify, RETAIN_XML, RETAIN_MODES
 from .helpers import AccountType
+from .transport import default_transport
+from .tokens import TokenManager
+from .cache import credential_fields
+from .files import FileDownloader, range_header
+from .retry import endpoint_family, default_retry_policy
+from . import profiling
+from .metrics import default_client_metrics
 
 
 class AggCatResponse(object):
@@ -37,6 +44,24 @@ class AggcatClient(object):
     :param string private_key: The absolute path to the generated x509 private key
     :param boolean objectify: (optional) Convert XML into pythonic object on every API call. Default: ``True``
     :param boolean verify_ssl: (optional) Verify SSL Certificate. See :ref:`known_issues`. Default: ``True``
+    :param boolean lazy: (optional) Only objectify the parts of the XML that are accessed. Default: ``False``
+    :param transport: (optional) The :class:`aggcat.transport.Transport` connection pool to send requests through.
+                      Default: a pool shared by every client in the process
+    :param boolean background_refresh: (optional) Refresh OAuth tokens from a background thread before
+                                       they expire. Stop it with :meth:`close`. Default: ``False``
+    :param credential_fields_cache: (optional) The :class:`aggcat.cache.TTLCache` that :meth:`get_credential_fields`
+                                    are kept in. Default: a cache shared by every client in the process
+    :param signer: (optional) How SAML assertions are signed. ``m2crypto``, ``cryptography`` or an
+                   :class:`aggcat.saml.Signer`. Default: ``m2crypto`` if it is installed, otherwise ``cryptography``
+    :param retry: (optional) The :class:`aggcat.retry.RetryPolicy` with the timeouts, retries and circuit
+                  breakers of requests. Default: a policy shared by every client in the process
+    :param rate_limiter: (optional) The :class:`aggcat.ratelimit.RateLimiter` every request waits for. Share one
+                         between the clients using a consumer key. Default: ``None`` for no limit
+    :param metrics: (optional) The :class:`aggcat.metrics.ClientMetrics` requests are counted and timed in.
+                    Default: metrics in :data:`aggcat.metrics.REGISTRY` shared by every client in the process
+    :param string assertion: (optional) A base64 SAML assertion for `customer_id` from
+                             :func:`aggcat.saml.sign_assertions` that the first token exchange sends
+                             instead of signing one. Default: ``None``
 
     :returns: :class:`AggcatClient`
 
@@ -61,8 +86,18 @@ class AggcatClient(object):
 
         ``objectify`` (Boolean) This is a BETA functionality. It will objectify the XML returned from
         intuit into standard python objects so you don't have to mess with XML. Default: ``True``
+
+        ``lazy`` (Boolean) When used with ``objectify`` the XML is not parsed until ``r.content``
+        is first used and child objects are only created when they are accessed. This saves a lot of
+        time on large responses when you only need a few fields or ``to_xml()``. Default: ``False``
+
+        ``retain`` (String) What objectified responses keep for ``r.content.to_xml()``. ``xml`` keeps the
+        raw XML, ``tree`` keeps the parsed tree (``to_xml()`` then returns XML without namespaces) and
+        ``none`` keeps nothing so ``to_xml()`` raises ``ValueError``. Responses held in long lived
+        caches use a third of the memory with ``none``. Lazy responses always keep the raw XML.
+        Default: ``xml``
     """
-    def __init__(self, consumer_key, consumer_secret, saml_identity_provider_id, customer_id, private_key, objectify=True, verify_ssl=True):
+    def __init__(self, consumer_key, consumer_secret, saml_identity_provider_id, customer_id, private_key, objectify=True, verify_ssl=True, lazy=False, transport=None, background_refresh=False, credential_fields_cache=None, retain=RETAIN_XML, signer=None, retry=None, rate_limiter=None, metrics=None, assertion=None):
         # base API url
         self.base_url = 'https://financialdatafeed.platform.intuit.com/rest-war/v1'
 
@@ -76,20 +111,45 @@ class AggcatClient(object):
         # verify ssl
         self.verify_ssl = verify_ssl
 
+        # pooled keep-alive connections used for the token exchange and API requests
+        self.transport = transport or default_transport()
+
+        # timeouts, retries of idempotent requests and circuit breakers per endpoint family
+        self.retry = retry or default_retry_policy()
+
+        # shared limits on how fast requests are sent
+        self.rate_limiter = rate_limiter
+
+        # request counts, latencies and errors by endpoint family
+        self.metrics = metrics or default_client_metrics()
+
         # SAML object to help create SAML assertion message
-        self.saml = SAML(private_key, saml_identity_provider_id, customer_id)
+        self.saml = SAML(private_key, saml_identity_provider_id, customer_id, signer)
+        if assertion is not None:
+            self.saml.use(assertion)
 
         # intuit saml authentication url
         self.saml_url = 'https://oauth.intuit.com/oauth/v1/get_access_token_by_saml'
 
-        # contact intuit, authenticate, and get the consumer tokens
-        self._oauth_tokens = self._get_oauth_tokens()
-
         # Beta objectification
         self.objectify = objectify
-
-        # assign the client
-        self.client = self._client()
+        self.lazy = lazy
+        if retain not in RETAIN_MODES:
+            raise ValueError('retain must be one of %s' % (RETAIN_MODES,))
+        self.retain = retain
+
+        # credential fields by institution so logins only make one request
+        if credential_fields_cache is None:
+            credential_fields_cache = credential_fields
+        self.credential_fields_cache = credential_fields_cache
+
+        # contact intuit, authenticate, and get the consumer tokens. The token
+        # manager assigns the client and replaces it before the tokens expire
+        self.tokens = TokenManager(
+            self._fetch_oauth_tokens,
+            self._set_oauth_tokens,
+            background=background_refresh
+        )
 
     def _client(self):
         """Build an oAuth client from consumer tokens, and oauth tokens"""
@@ -100,89 +160,184 @@ class AggcatClient(object):
             self._oauth_tokens['oauth_token'][0],
             self._oauth_tokens['oauth_token_secret'][0]
         )
-        return session
+
+        # time the oauth signature of every request when profiling
+        session.auth = profiling.ProfiledAuth(session.auth)
+
+        # send requests through the shared connection pool so
+        # connections outlive the session when tokens are refreshed
+        return self.transport.mount(session)
 
     def _get_oauth_tokens(self):
         """Get an oauth token by sending over the SAML assertion"""
-        payload = {'saml_assertion': self.saml.assertion()}
+        with profiling.phase(profiling.SAML_SIGNING, profiling.TOKENS):
+            payload = {'saml_assertion': self.saml.assertion()}
         headers = {'Authorization': 'OAuth oauth_consumer_key="%s"' % self.consumer_key}
 
-        r = requests.post(self.saml_url, data=payload, headers=headers)
+        with profiling.phase(profiling.TOKEN_EXCHANGE, profiling.TOKENS) as p:
+            r = self.transport.post(self.saml_url, data=payload, headers=headers, timeout=self.retry.timeout)
+            p.add_bytes(len(r.content))
 
         if r.status_code == 200:
             return urlparse.parse_qs(r.text)
         else:
             raise HTTPError('A %s error occured retrieving token. Please check your settings.' % r.status_code)
 
-    def _refresh_client(self):
-        """If a token expires, refresh the client"""
-        # refresh the saml assertion
+    def _fetch_oauth_tokens(self):
+        """Refresh the saml assertion and get new oauth tokens"""
         self.saml.refresh()
+        return self._get_oauth_tokens()
 
-        # set new auth tokens
-        self._oauth_tokens = self._get_oauth_tokens()
-
-        # get a new client
+    def _set_oauth_tokens(self, tokens):
+        """Set new auth tokens and get a new client"""
+        self._oauth_tokens = tokens
         self.client = self._client()
 
+    def close(self):
+        """Stop refreshing tokens in the background. Call it when a client created
+        with ``background_refresh=True`` is no longer needed"""
+        self.tokens.stop()
+
+    def _refresh_client(self, generation=None):
+        """If a token expires, refresh the client. Pass the `generation` of the
+        tokens that were rejected so concurrent callers share one refresh"""
+        self.tokens.refresh(generation)
+
     def _build_url(self, path):
         """Build a url from a string path"""
         return '%s/%s' % (self.base_url, path)
 
-    def _make_request(self, path, method='GET', body=None, query={}, headers={}):
-        """Make the signed request to the API"""
-        # build the query url
-        url = self._build_url(path)
-
-        # check for plain object request
-        return_obj = self.objectify
+    def _send(self, client, url, method, body, query, headers, stream):
+        """Send one request with the OAuth session `client`"""
+        timeout = self.retry.timeout
 
         if method == 'GET':
-            response = self.client.get(url, params=query, verify=self.verify_ssl)
+            return client.get(url, params=query, headers=headers, verify=self.verify_ssl, stream=stream, timeout=timeout)
 
         if method == 'PUT':
-            headers.update({'Content-Type': 'application/xml'})
-            response = self.client.put(url, params=query, data=body, headers=headers, verify=self.verify_ssl)
+            headers = dict(headers, **{'Content-Type': 'application/xml'})
+            return client.put(url, params=query, data=body, headers=headers, verify=self.verify_ssl, timeout=timeout)
 
         if method == 'DELETE':
-            response = self.client.delete(url, verify=self.verify_ssl)
+            return client.delete(url, verify=self.verify_ssl, timeout=timeout)
 
         if method == 'POST':
-            headers.update({'Content-Type': 'application/xml'})
-            response = self.client.post(url, params=query, data=body, headers=headers, verify=self.verify_ssl)
+            headers = dict(headers, **{'Content-Type': 'application/xml'})
+            return client.post(url, params=query, data=body, headers=headers, verify=self.verify_ssl, timeout=timeout)
+
+    def _make_request(self, path, method='GET', body=None, query={}, headers={}, stream=False, replay=True, raw=False):
+        """Make the signed request to the API. If ``stream`` is ``True`` the content
+        of the response is an :class:`IterObjectify` reading from the open connection.
+        If ``raw`` is ``True`` the content is never objectified. It is the body, or the
+        ``requests.Response`` to read the body from when ``stream`` is also ``True``"""
+        # build the query url
+        url = self._build_url(path)
+
+        # refresh tokens that are about to expire before using them
+        self.tokens.ensure_fresh()
+        generation = self.tokens.generation
+        client = self.client
+
+        family = endpoint_family(path)
+
+        def send():
+            # every try waits its turn under the rate limits
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(family)
+
+            with profiling.phase(profiling.NETWORK, family) as p:
+                response = self._send(client, url, method, body, query, headers, stream)
+                if not stream:
+                    p.add_bytes(len(response.content))
+
+            return response
+
+        started = default_timer()
+        try:
+            response = self.retry.send(family, method, send)
+        except Exception as e:
+            self.metrics.error(family, e)
+            raise
+
+        if stream:
+            size = response.headers.get('content-length')
+            size = int(size) if size else None
+        else:
+            size = len(response.content)
+        self.metrics.request(family, method, response.status_code, default_timer() - started, size)
 
-        # refresh the token if token expires and retry the query
-        if 'www-authenticate' in response.headers:
+        # refresh the token if token expires and replay the query once
+        if replay and 'www-authenticate' in response.headers:
             if response.headers['www-authenticate'] == 'OAuth oauth_problem="token_rejected"':
-                self._refresh_client()
-                self._make_request(path, method, body, query, headers)
+                self.metrics.token_refresh(family)
+                self._refresh_client(generation)
+                return self._make_request(path, method, body, query, headers, stream, replay=False, raw=raw)
 
-        if response.status_code not in [200, 201, 401]:
+        if response.status_code >= 400:
+            self.metrics.error(family, response.status_code)
+
+        # 304 is only returned to conditional requests made with the caller's headers
+        # and 206 to requests for a range of a file
+        if response.status_code not in [200, 201, 206, 304, 401]:
             raise HTTPError('Status Code: %s, Response %s' % (response.status_code, response.text,))
 
-        if return_obj:
+        if raw:
+            return AggCatResponse(
+                response.status_code,
+                response.headers,
+                response if stream else response.content
+            )
+
+        if stream:
+            # parse the body as it comes off the socket instead of loading it all
+            response.raw.decode_content = True
+            return AggCatResponse(
+                response.status_code,
+                response.headers,
+                IterObjectify(response.raw)
+            )
+
+        with profiling.endpoint(family):
+            return self._response(response.status_code, response.headers, response.content, family)
+
+    def _response(self, status_code, headers, content, endpoint=None):
+        """Build an :class:`AggCatResponse` objectifying the content if needed"""
+        # check for plain object request
+        return_obj = self.objectify
+
+        # blank responses are returned unobjectified. the lazy objectifier would
+        # otherwise only find out when the content is first used
+        if return_obj and self.lazy and content.strip():
+            return AggCatResponse(
+                status_code,
+                headers,
+                LazyObjectify(content).get_object()
+            )
+
+        if return_obj and not self.lazy:
             try:
                 return AggCatResponse(
-                    response.status_code,
-                    response.headers,
-                    Objectify(response.content).get_object()
+                    status_code,
+                    headers,
+                    Objectify(content, self.retain).get_object()
                 )
             except etree.XMLSyntaxError:
                 # this errors happens when the response is blank
                 # in case of this error or others in the objectifier
                 # pass and give the response unobjectified
-                pass
+                if content.strip():
+                    self.metrics.objectify_failure(endpoint)
 
         return AggCatResponse(
-            response.status_code,
-            response.headers,
-            response.content
+            status_code,
+            headers,
+            content
         )
 
 
     def _remove_namespaces(self, tree):
         """Remove the namspaces from the Intuit XML for easier parsing"""
-        return remove_namespaces(tree)
+        return strip_namespaces(tree)
 
     def _generate_login_xml(self, **credentials):
         """Generate the xml needed to login"""
@@ -269,36 +424,68 @@ class AggcatClient(object):
                 <div>Enter banking password (go): <input type="password" name="Banking Password" /></div>
                 <input type="submit" value="Login to your bank" />
             </form>
-        """
-        fields = []
 
-        response = self.get_institution_details(institution_id)
-        if self.objectify:
-            t = etree.fromstring(response.content.to_xml())
-        else:
-            t = etree.fromstring(response.content)
+        .. note::
 
-        # remove all the namespaces for easier parsing and get all the keys
-        t = etree.fromstring(self._remove_namespaces(t))
-        keys = t.xpath('./keys/key')
+            The fields are cached for an hour per institution and shared by every client in the
+            process. Use :meth:`invalidate_credential_fields` to get them from Intuit again.
+        """
+        cached = self.credential_fields_cache.get(str(institution_id))
+        if cached is not None:
+            return [dict(field) for field in cached]
 
-        # extract the field name and value
-        for key in keys:
-            fields_data = {}
-            for part in key.xpath('./*'):
-                fields_data[part.tag] = part.text
-            # only provide fields that should be displayed to the user
-            if fields_data['displayFlag'] == 'true':
-                fields.append(fields_data)
+        fields = []
+        found_keys = False
+
+        # stream the institution details so they are never objectified and the
+        # namespaces are already removed from each element
+        response = self._make_request('institutions/%s' % institution_id, stream=True)
+
+        try:
+            if response.status_code == 200:
+                for element in response.content.iterelements():
+                    if element.tag != 'keys':
+                        continue
+                    found_keys = True
+
+                    # extract the field name and value
+                    for key in element.iterchildren('key'):
+                        fields_data = {}
+                        for part in key.iterchildren(etree.Element):
+                            fields_data[part.tag] = part.text
+                        # only provide fields that should be displayed to the user
+                        if fields_data['displayFlag'] == 'true':
+                            fields.append(fields_data)
+        finally:
+            response.content.close()
+
+        # never cache an error response, every login would be accepted for an hour
+        if not found_keys:
+            raise HTTPError('Status Code: %s getting the credential fields of institution %s' % (
+                response.status_code, institution_id))
 
         # order by displayOrder
         fields = sorted(fields, key=lambda x: x['displayOrder'])
 
-        return fields
+        self.credential_fields_cache.set(str(institution_id), fields)
+
+        return [dict(field) for field in fields]
+
+    def invalidate_credential_fields(self, institution_id=None):
+        """Forget the cached credential fields of an institution, or of every
+        institution when no ``institution_id`` is given
+
+        :param integer institution_id: (optional) The institution's id. See :ref:`search_for_institution`.
+        """
+        if institution_id is not None:
+            institution_id = str(institution_id)
+
+        self.credential_fields_cache.invalidate(institution_id)
 
-    def get_institutions(self):
+    def get_institutions(self, stream=False):
         """Get a list of financial instituions
 
+        :param boolean stream: (optional) Stream the institutions one at a time. Default: ``False``
         :returns: :class:`AccgatResponse`
 
         ::
@@ -314,8 +501,18 @@ class AggcatClient(object):
             This call takes a very long time! Once you get your ``institution_id``
             write it down so you don't forget it. Saving the output using
             :meth:`AggCatResponse.content.to_xml()` is a good idea.
+
+        .. note::
+
+            Pass ``stream=True`` to get an iterator of institutions in ``r.content`` instead. The
+            response is parsed as it is downloaded and each record is thrown away once you
+            move on to the next one, so memory stays flat no matter how large the response is::
+
+                >>> r = client.get_institutions(stream=True)
+                >>> for institution in r.content:
+                        print institution.institution_name
         """
-        return self._make_request('institutions')
+        return self._make_request('institutions', stream=stream)
 
     def get_institution_details(self, institution_id):
         """Get the details of a finanical institution
@@ -479,9 +676,10 @@ class AggcatClient(object):
             headers=headers
         )
 
-    def get_customer_accounts(self):
+    def get_customer_accounts(self, stream=False):
         """Get a list of all current customer accounts
 
+        :param boolean stream: (optional) Stream the accounts one at a time. Default: ``False``
         :returns: :class:`AggcatResponse`
 
         This endpoint assumes that the customer accounts we are getting
@@ -508,13 +706,24 @@ class AggcatClient(object):
             in the Intuit documentation <https://developer.intuit.com/docs/0020_customeraccountdata/customer_account_data_api/0020_api_documentation/0035_getaccount>`_.
             Also note that when the XML gets objectified XML attributes like ``accountId`` get converted
             to ``account_id``
+
+        .. note::
+
+            Pass ``stream=True`` to get an iterator of accounts in ``r.content`` instead. The
+            response is parsed as it is downloaded and each record is thrown away once you
+            move on to the next one, so memory stays flat no matter how large the response is::
+
+                >>> r = client.get_customer_accounts(stream=True)
+                >>> for account in r.content:
+                        print account.account_nickname
         """
-        return self._make_request('accounts')
+        return self._make_request('accounts', stream=stream)
 
-    def get_login_accounts(self, login_id):
+    def get_login_accounts(self, login_id, stream=False):
         """Get a list of account belonging to a login
 
         :param integer login_id: Login id of the instiution. This can be retrieved from an account.
+        :param boolean stream: (optional) Stream the accounts one at a time. Default: ``False``
         :returns: :class:`AggcatResponse`
 
         You may have multiple logins. For example, a Fidelity Account and a Bank of America. This
@@ -536,7 +745,7 @@ class AggcatClient(object):
             Also note that when the XML gets objectified XML attributes like ``accountId`` get converted
             to ``account_id``
         """
-        return self._make_request('logins/%s/accounts' % login_id)
+        return self._make_request('logins/%s/accounts' % login_id, stream=stream)
 
     def get_account(self, account_id):
         """Get the details of an account
@@ -562,13 +771,14 @@ class AggcatClient(object):
         """
         return self._make_request('accounts/%s' % account_id)
 
-    def get_account_transactions(self, account_id, start_date, end_date=None):
+    def get_account_transactions(self, account_id, start_date, end_date=None, stream=False):
         """Get specific account transactions from a date range
 
         :param integer account_id: the id of an account retrieved from :meth:`get_login_accounts`
             or :meth:`get_customer_accounts`.
         :param string start_date: the date you want the transactions to start in the format YYYY-MM-DD
         :param string end_date: (optional) the date you want the transactions to end in the format YYYY-MM-DD
+        :param boolean stream: (optional) Stream the transactions one at a time. Default: ``False``
         :returns: :class:`AggcatResponse`
 
         ::
@@ -594,6 +804,16 @@ class AggcatClient(object):
 
             **Pending** transactions are unstable, the transaction id will change once the it has
             posted so it is difficult to correlate a once pending transaction with its posted one.
+
+        .. note::
+
+            Pass ``stream=True`` to get an iterator of transactions in ``r.content`` instead. The
+            response is parsed as it is downloaded and each record is thrown away once you
+            move on to the next one, so memory stays flat no matter how large the response is::
+
+                >>> r = client.get_account_transactions(400004540560, '2010-01-01', '2013-08-12', stream=True)
+                >>> for t in r.content:
+                        print t.id, t.description, t.total_amount
         """
         query = {
             'txnStartDate': start_date,
@@ -607,7 +827,8 @@ class AggcatClient(object):
 
         return self._make_request(
             'accounts/%s/transactions' % account_id,
-            query=query
+            query=query,
+            stream=stream
         )
 
     def get_investment_positions(self, account_id):
@@ -844,13 +1065,52 @@ class AggcatClient(object):
 
     def list_files(self):
         """List of files available for download that contain
-        your bulk customer information"""
-        raise NotImplementedError('Due to not having a production account available. That costs money.')
+        your bulk customer information
+
+        :returns: :class:`AggCatResponse`
+        """
+        return self._make_request('export/files')
 
     def get_file_data(self, file_name, range=None):
-        """The file data of `file_name` and `range` of bytes"""
-        raise NotImplementedError('Due to not having a production account available. That costs money.')
+        """The file data of `file_name` and `range` of bytes
+
+        :param string file_name: The name of a file from :meth:`list_files`
+        :param range: (optional) An inclusive ``(start, end)`` tuple of byte offsets or a
+                      ``Range`` header such as ``bytes=0-1023``. ``end`` can be ``None``
+                      to read to the end of the file. Default: the whole file
+        :returns: :class:`AggCatResponse` with the bytes as the content
+
+        .. note::
+
+            The whole range is held in memory. Use :meth:`download_file` for large files.
+        """
+        headers = {}
+        if range is not None:
+            headers['Range'] = range_header(range)
+
+        return self._make_request('export/files/%s' % file_name, headers=headers, raw=True)
+
+    def download_file(self, file_name, path, size=None, checksum=None, **kwargs):
+        """Stream a file to disk resuming after failures and fetching big files in parallel segments
+
+        :param string file_name: The name of a file from :meth:`list_files`
+        :param string path: Where to write the file
+        :param integer size: (optional) The size of the file in bytes
+        :param string checksum: (optional) The md5 hex digest the file must have
+        :returns: `path`
+
+        Any other keyword arguments are passed to :class:`aggcat.files.FileDownloader`::
+
+            >>> client.download_file('export-2013-08-11.gz', '/data/export-2013-08-11.gz', segments=8)
+            '/data/export-2013-08-11.gz'
+        """
+        algorithm = kwargs.pop('algorithm', 'md5')
+        return FileDownloader(self, **kwargs).download(file_name, path, size, checksum, algorithm)
 
     def delete_file(self, file_name):
-        """Delete a file"""
-        raise NotImplementedError('Due to not having a production account available. That costs money.')
+        """Delete a file
+
+        :param string file_name: The name of a file from :meth:`list_files`
+        :returns: :class:`AggCatResponse`
+        """
+        return self._make_request('export/files/%s' % file_name, 'DELETE')
@@ -0,0 +1,236 @@
+from __future__ import absolute_import
+
+from .parser import IterObjectify
+from .utils import _local_name
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+def _require(module, name):
+    if module is None:
+        raise ImportError('%s is required for columnar transactions. Install it with: pip install %s' % (name, name))
+
+
+class Categorical(object):
+    """A column of repeated values stored once each in ``categories`` and
+    referenced by position in ``codes``. Missing values have the code ``-1``"""
+    __slots__ = ('codes', 'categories')
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def code(self, value):
+        """The code of `value` or ``-1`` if it never occurs"""
+        try:
+            return self.categories.index(value)
+        except ValueError:
+            return -1
+
+    def __eq__(self, value):
+        """A boolean array of the rows equal to `value`"""
+        return self.codes == self.code(value)
+
+    def __ne__(self, value):
+        return self.codes != self.code(value)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+
+        if isinstance(code, numpy.ndarray):
+            return Categorical(code, self.categories)
+
+        return self.categories[code] if code >= 0 else None
+
+    def tolist(self):
+        return [self.categories[code] if code >= 0 else None for code in self.codes]
+
+    def __repr__(self):
+        return '<Categorical %d rows %s>' % (len(self), self.categories)
+
+
+class _Interner(object):
+    """Build the codes and categories of a :class:`Categorical` one value at a time"""
+    def __init__(self):
+        self.codes = []
+        self.categories = []
+        self._index = {}
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+
+        self.codes.append(code)
+
+    def build(self):
+        return Categorical(numpy.array(self.codes, dtype=numpy.int32), self.categories)
+
+
+# transaction tags that are read into columns
+_TEXT_TAGS = frozenset(['id', 'amount', 'totalAmount', 'postedDate', 'userDate', 'currencyType', 'type', 'pending', 'payeeName'])
+
+
+class TransactionColumns(object):
+    """Transactions stored as one NumPy array per field
+
+    ``id`` (``int64``), ``amount`` (``float64``, ``nan`` when missing), ``posted_date`` and ``user_date``
+    (``datetime64[D]`` of the day in the institution's time zone, ``NaT`` when missing) and ``pending``
+    (``bool``) are arrays. ``currency``, ``category``, ``type``, ``record_type`` and ``payee`` are
+    :class:`Categorical` columns. ``amount`` falls back to ``totalAmount`` for investment transactions.
+    """
+    columns = ('id', 'amount', 'posted_date', 'user_date', 'pending', 'currency', 'category', 'type', 'record_type', 'payee')
+
+    def __init__(self, **columns):
+        for name in self.columns:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, index):
+        """Select rows with a boolean array, an array of positions or a slice"""
+        return TransactionColumns(**dict((name, getattr(self, name)[index]) for name in self.columns))
+
+    def total(self):
+        """Sum of the amounts"""
+        return float(numpy.nansum(self.amount))
+
+    def totals_by(self, column='category'):
+        """Sum of the amounts for each value of a :class:`Categorical` column
+
+        ::
+
+            >>> columns.totals_by('category')
+            {'Dining': -812.4, 'Groceries': -1504.17, None: 30.0, ...}
+        """
+        categorical = getattr(self, column)
+        amounts = numpy.nan_to_num(self.amount)
+        codes = categorical.codes
+        missing = codes < 0
+
+        totals = numpy.bincount(codes[~missing], weights=amounts[~missing], minlength=len(categorical.categories))
+        result = dict(zip(categorical.categories, totals.tolist()))
+
+        if missing.any():
+            result[None] = float(amounts[missing].sum())
+
+        return result
+
+    def to_dataframe(self):
+        """A pandas ``DataFrame`` with a column for each field. Categorical columns are ``pandas.Categorical``"""
+        _require(pandas, 'pandas')
+
+        data = {}
+        for name in self.columns:
+            column = getattr(self, name)
+            if isinstance(column, Categorical):
+                column = pandas.Categorical.from_codes(column.codes, column.categories)
+            data[name] = column
+
+        return pandas.DataFrame(data, columns=list(self.columns))
+
+    def __repr__(self):
+        return '<TransactionColumns %d rows>' % len(self)
+
+
+def _categorization(element):
+    """The first category name in ``<categorization>``"""
+    for child in element.iter():
+        if isinstance(child.tag, basestring) and _local_name(child.tag) == 'categoryName':
+            return child.text
+    return None
+
+
+def decode_transactions(source):
+    """Decode a transaction list straight into :class:`TransactionColumns`
+
+    :param source: XML as a string, a file opened for reading or the :class:`aggcat.parser.IterObjectify`
+                   of a :meth:`AggcatClient.get_account_transactions` response requested with ``stream=True``
+
+    The transactions are streamed. Only the text of each field is kept while reading and it is converted
+    to arrays in bulk at the end, so no object is created per transaction::
+
+        >>> from aggcat.columnar import decode_transactions
+        >>> r = client.get_account_transactions(400004540560, '2010-01-01', stream=True)
+        >>> columns = decode_transactions(r.content)
+        >>> columns.amount[columns.category == 'Dining'].sum()
+        -812.4
+        >>> columns.to_dataframe().groupby('category').amount.sum()
+
+    numpy is required and pandas is required for :meth:`TransactionColumns.to_dataframe`.
+    """
+    _require(numpy, 'numpy')
+
+    if not isinstance(source, IterObjectify):
+        source = IterObjectify(source)
+
+    ids = []
+    amounts = []
+    posted_dates = []
+    user_dates = []
+    pending = []
+    currency = _Interner()
+    category = _Interner()
+    types = _Interner()
+    record_types = _Interner()
+    payees = _Interner()
+
+    for element in source.iterelements():
+        record_type = _local_name(element.tag)
+        if not record_type.endswith('Transaction'):
+            continue
+
+        values = {}
+        category_name = None
+
+        for child in element:
+            tag = child.tag
+            if not isinstance(tag, basestring):
+                continue
+
+            tag = _local_name(tag)
+            if tag in _TEXT_TAGS:
+                values[tag] = child.text
+            elif tag == 'categorization':
+                category_name = _categorization(child)
+
+        ids.append(values.get('id') or 0)
+        amounts.append(values.get('amount') or values.get('totalAmount') or 'nan')
+        posted_dates.append((values.get('postedDate') or 'NaT')[:10])
+        user_dates.append((values.get('userDate') or 'NaT')[:10])
+        pending.append(values.get('pending') == 'true')
+        currency.append(values.get('currencyType'))
+        category.append(category_name)
+        types.append(values.get('type'))
+        record_types.append(record_type)
+        payees.append(values.get('payeeName'))
+
+    return TransactionColumns(
+        id=numpy.array(ids, dtype=numpy.int64),
+        amount=numpy.array(amounts, dtype=numpy.float64),
+        posted_date=numpy.array(posted_dates, dtype='datetime64[D]'),
+        user_date=numpy.array(user_dates, dtype='datetime64[D]'),
+        pending=numpy.array(pending, dtype=bool),
+        currency=currency.build(),
+        category=category.build(),
+        type=types.build(),
+        record_type=record_types.build(),
+        payee=payees.build()
+    )
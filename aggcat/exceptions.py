@@ -2,3 +2,18 @@
 class HTTPError(Exception):
     """Http Error Exception"""
     pass
+
+
+class DownloadError(Exception):
+    """A file could not be downloaded"""
+    pass
+
+
+class ChecksumError(DownloadError):
+    """A downloaded file does not match its checksum"""
+    pass
+
+
+class CircuitOpenError(HTTPError):
+    """Requests to an endpoint family are failing fast because its circuit breaker is open"""
+    pass
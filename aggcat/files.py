@@ -0,0 +1,206 @@
+from __future__ import absolute_import
+
+import os
+import re
+import socket
+import hashlib
+from multiprocessing.pool import ThreadPool
+
+from requests.exceptions import RequestException
+
+from .exceptions import ChecksumError, DownloadError
+
+_content_range = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+# errors that are worth resuming the download after
+_network_errors = (RequestException, socket.error)
+
+
+def range_header(byte_range):
+    """Build a ``Range`` header from an inclusive ``(start, end)`` tuple. ``end`` can be
+    ``None`` to read to the end of the file. Strings are passed through as is.
+
+    ::
+
+        >>> range_header((0, 1023))
+        'bytes=0-1023'
+        >>> range_header((1024, None))
+        'bytes=1024-'
+    """
+    if isinstance(byte_range, basestring):
+        return byte_range
+
+    start, end = byte_range
+    return 'bytes=%s-%s' % (start, '' if end is None else end)
+
+
+def file_checksum(path, algorithm='md5', chunk_size=1024 * 1024):
+    """Hex digest of a file read `chunk_size` bytes at a time"""
+    digest = hashlib.new(algorithm)
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class FileDownloader(object):
+    """Download bulk files to disk without holding them in memory
+
+    :param client: An :class:`AggcatClient`
+    :param integer chunk_size: (optional) Bytes read from the connection and written at a time. Default: ``1048576``
+    :param integer segments: (optional) Ranged requests made at once for big files. Default: ``4``
+    :param integer segment_threshold: (optional) Files at least this many bytes are downloaded in
+                                      ``segments``. Default: ``67108864``
+    :param integer retries: (optional) Times a request is resumed in a row without getting any
+                            bytes before giving up. Default: ``5``
+
+    Files are written to ``<path>.part`` and renamed once complete and verified. When a
+    connection fails the download is resumed from the last byte written with a ``Range``
+    request. Small files also resume a ``.part`` file left behind by an earlier run::
+
+        >>> from aggcat.files import FileDownloader
+        >>> downloader = FileDownloader(client, segments=8)
+        >>> downloader.download('export-2013-08-11.gz', '/data/export-2013-08-11.gz', checksum='5d41402abc4b2a76b9719d911017c592')
+        '/data/export-2013-08-11.gz'
+    """
+    def __init__(self, client, chunk_size=1024 * 1024, segments=4, segment_threshold=64 * 1024 * 1024, retries=5):
+        self.client = client
+        self.chunk_size = chunk_size
+        self.segments = segments
+        self.segment_threshold = segment_threshold
+        self.retries = retries
+
+    def _request(self, file_name, byte_range=None):
+        headers = {}
+        if byte_range is not None:
+            headers['Range'] = range_header(byte_range)
+
+        return self.client._make_request('export/files/%s' % file_name, headers=headers, stream=True, raw=True)
+
+    def size(self, file_name):
+        """Size of a file in bytes or ``None`` if the server does not support ranges"""
+        r = self._request(file_name, (0, 0))
+
+        try:
+            match = _content_range.match(r.headers.get('content-range', ''))
+            if r.status_code == 206 and match and match.group(3) != '*':
+                return int(match.group(3))
+            return None
+        finally:
+            r.content.close()
+
+    def _fetch(self, file_name, f, start, end):
+        """Write bytes `start` to `end` (inclusive) of a file to `f` at the same offsets,
+        resuming after failures. Returns the number of bytes written."""
+        position = start
+        failures = 0
+
+        while position <= end:
+            progress = position
+
+            try:
+                r = self._request(file_name, (position, end))
+
+                try:
+                    # a server that ignores the range sends the whole file
+                    if r.status_code != 206 and position != 0:
+                        raise DownloadError('%s does not support ranges so it can not be resumed' % file_name)
+
+                    f.seek(position)
+                    for chunk in r.content.iter_content(self.chunk_size):
+                        chunk = chunk[:end + 1 - position]
+                        f.write(chunk)
+                        position += len(chunk)
+
+                        if position > end:
+                            break
+                finally:
+                    r.content.close()
+            except _network_errors:
+                pass
+
+            if position > end:
+                break
+
+            # the connection failed or closed early. give up if it keeps happening without progress
+            failures = failures + 1 if position == progress else 1
+            if failures > self.retries:
+                raise DownloadError('%s stopped at byte %s of %s-%s' % (file_name, position, start, end))
+
+        return position - start
+
+    def _fetch_segment(self, args):
+        file_name, part, start, end = args
+
+        with open(part, 'r+b') as f:
+            return self._fetch(file_name, f, start, end)
+
+    def _segments(self, size):
+        """Split `size` bytes into inclusive ``(start, end)`` ranges"""
+        segment_size = -(-size // self.segments)
+        return [(start, min(start + segment_size, size) - 1) for start in xrange(0, size, segment_size)]
+
+    def download(self, file_name, path, size=None, checksum=None, algorithm='md5'):
+        """Download a file to `path`
+
+        :param string file_name: The name of a file from :meth:`AggcatClient.list_files`
+        :param string path: Where to write the file
+        :param integer size: (optional) The size of the file in bytes. Found with a ranged request if not given
+        :param string checksum: (optional) The hex digest the file must have
+        :param string algorithm: (optional) The ``hashlib`` algorithm of ``checksum``. Default: ``md5``
+        :returns: `path`
+        :raises: :class:`aggcat.exceptions.ChecksumError` if the file does not match ``checksum``.
+                 :class:`aggcat.exceptions.DownloadError` if the download can not be completed.
+        """
+        part = path + '.part'
+
+        if size is None:
+            size = self.size(file_name)
+
+        if size is None:
+            # no ranges so all we can do is read it in one go
+            r = self._request(file_name)
+            try:
+                with open(part, 'wb') as f:
+                    for chunk in r.content.iter_content(self.chunk_size):
+                        f.write(chunk)
+            finally:
+                r.content.close()
+        elif self.segments > 1 and size >= self.segment_threshold:
+            with open(part, 'wb') as f:
+                f.truncate(size)
+
+            pool = ThreadPool(self.segments)
+            try:
+                pool.map(self._fetch_segment, [
+                    (file_name, part, start, end) for start, end in self._segments(size)
+                ])
+            except:
+                # the part file is already full size so a later run would take the holes for data
+                os.remove(part)
+                raise
+            finally:
+                pool.terminate()
+        else:
+            # pick up where an earlier run left off
+            start = os.path.getsize(part) if os.path.exists(part) else 0
+            if start > size:
+                start = 0
+
+            with open(part, 'r+b' if start else 'wb') as f:
+                self._fetch(file_name, f, start, size - 1)
+                f.truncate(size)
+
+        if checksum is not None:
+            actual = file_checksum(part, algorithm, self.chunk_size)
+            if actual != checksum.lower():
+                os.remove(part)
+                raise ChecksumError('%s has the %s checksum %s instead of %s' % (file_name, algorithm, actual, checksum))
+
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(part, path)
+
+        return path
@@ -0,0 +1,292 @@
+from __future__ import absolute_import
+
+import threading
+import BaseHTTPServer
+import SocketServer
+
+from . import profiling
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# upper bounds in bytes of the response size buckets
+SIZE_BOUNDS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values) + list(extra)]
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, (int, long)):
+        return str(value)
+    return repr(float(value))
+
+
+class _Metric(object):
+    """A named metric with a value per combination of label values. Every update only
+    holds the lock of its metric for a dictionary update"""
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _check(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError('%s takes the labels %s' % (self.name, self.labelnames))
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s %s' % (self.name, self.type)]
+
+        with self._lock:
+            values = sorted(self._snapshot())
+
+        for labels, value in values:
+            lines.extend(self._samples(labels, value))
+
+        return lines
+
+
+class Counter(_Metric):
+    """A count that only goes up
+
+    ::
+
+        >>> requests = registry.counter('myapp_requests_total', 'Requests', ('endpoint',))
+        >>> requests.inc('accounts')
+    """
+    type = 'counter'
+
+    def inc(self, *labels, **kwargs):
+        """Add ``amount`` (``1`` by default) to the count of `labels`"""
+        self._check(labels)
+        amount = kwargs.get('amount', 1)
+
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def _snapshot(self):
+        return self._values.items()
+
+    def _samples(self, labels, value):
+        return ['%s%s %s' % (self.name, _format_labels(self.labelnames, labels), _format_value(value))]
+
+
+class Histogram(_Metric):
+    """Counts of observed values in buckets, with their sum and count
+
+    :param bounds: (optional) Upper bounds of the buckets. Default: :data:`aggcat.profiling.DEFAULT_BOUNDS`
+    """
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), bounds=profiling.DEFAULT_BOUNDS):
+        super(Histogram, self).__init__(name, help, labelnames)
+        self.bounds = tuple(bounds)
+
+    def observe(self, value, *labels):
+        self._check(labels)
+
+        with self._lock:
+            histogram = self._values.get(labels)
+            if histogram is None:
+                histogram = self._values[labels] = profiling.Histogram(self.bounds)
+            histogram.observe(value)
+
+    def value(self, *labels):
+        """A copy of the :class:`aggcat.profiling.Histogram` of `labels` or ``None``"""
+        with self._lock:
+            histogram = self._values.get(labels)
+            return histogram.copy() if histogram is not None else None
+
+    def _snapshot(self):
+        return [(labels, histogram.copy()) for labels, histogram in self._values.iteritems()]
+
+    def _samples(self, labels, histogram):
+        samples = [
+            '%s_bucket%s %s' % (self.name, _format_labels(self.labelnames, labels, [('le', _format_value(float(bound)))]), count)
+            for bound, count in histogram.cumulative()
+        ]
+        samples.append('%s_sum%s %s' % (self.name, _format_labels(self.labelnames, labels), _format_value(histogram.sum)))
+        samples.append('%s_count%s %s' % (self.name, _format_labels(self.labelnames, labels), histogram.count))
+        return samples
+
+
+class MetricsRegistry(object):
+    """A thread safe set of metrics that renders as Prometheus text
+
+    ::
+
+        >>> from aggcat.metrics import REGISTRY
+        >>> print REGISTRY.render()
+        # HELP aggcat_requests_total Requests by endpoint family, method and status code
+        # TYPE aggcat_requests_total counter
+        aggcat_requests_total{endpoint="accounts",method="GET",status="200"} 12
+        ...
+    """
+    def __init__(self):
+        self._metrics = []
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._names.get(name)
+            if metric is None:
+                metric = self._names[name] = cls(name, *args, **kwargs)
+                self._metrics.append(metric)
+            elif not isinstance(metric, cls):
+                raise ValueError('%s is already registered as a %s' % (name, metric.type))
+
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        """Get or create a :class:`Counter`"""
+        return self._register(Counter, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), bounds=profiling.DEFAULT_BOUNDS):
+        """Get or create a :class:`Histogram`"""
+        return self._register(Histogram, name, help, labelnames, bounds)
+
+    def get(self, name):
+        return self._names.get(name)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+
+# metrics of every client in the process
+REGISTRY = MetricsRegistry()
+
+
+class ClientMetrics(object):
+    """The metrics :class:`AggcatClient` records in a :class:`MetricsRegistry`
+
+    ``aggcat_requests_total``
+        Requests by ``endpoint`` family, ``method`` and ``status`` code. Retries are counted once
+    ``aggcat_request_duration_seconds``
+        Histogram of the seconds from sending a request to getting its response, retries included
+    ``aggcat_response_size_bytes``
+        Histogram of response body sizes. Streamed responses are only counted when they have a ``Content-Length``
+    ``aggcat_token_refreshes_total``
+        OAuth token refreshes caused by Intuit rejecting a token
+    ``aggcat_objectify_failures_total``
+        Responses that could not be objectified and were returned as XML
+    ``aggcat_errors_total``
+        Error responses by ``code``, the status code, and requests that raised by ``code``, the exception name
+    """
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+        self.requests = registry.counter(
+            'aggcat_requests_total', 'Requests by endpoint family, method and status code', ('endpoint', 'method', 'status'))
+        self.duration = registry.histogram(
+            'aggcat_request_duration_seconds', 'Seconds until a response is received', ('endpoint',))
+        self.size = registry.histogram(
+            'aggcat_response_size_bytes', 'Size of response bodies', ('endpoint',), SIZE_BOUNDS)
+        self.token_refreshes = registry.counter(
+            'aggcat_token_refreshes_total', 'OAuth token refreshes after a token was rejected', ('endpoint',))
+        self.objectify_failures = registry.counter(
+            'aggcat_objectify_failures_total', 'Responses that could not be objectified', ('endpoint',))
+        self.errors = registry.counter(
+            'aggcat_errors_total', 'Error status codes and exceptions by endpoint family', ('endpoint', 'code'))
+
+    def request(self, endpoint, method, status, seconds, size=None):
+        self.requests.inc(endpoint, method, str(status))
+        self.duration.observe(seconds, endpoint)
+        if size is not None:
+            self.size.observe(size, endpoint)
+
+    def error(self, endpoint, code):
+        """Count an error status code or an exception, which is counted by its class name"""
+        if isinstance(code, BaseException):
+            code = code.__class__.__name__
+        self.errors.inc(endpoint, str(code))
+
+    def token_refresh(self, endpoint):
+        self.token_refreshes.inc(endpoint)
+
+    def objectify_failure(self, endpoint):
+        self.objectify_failures.inc(endpoint)
+
+
+_default_metrics = None
+_default_metrics_lock = threading.Lock()
+
+
+def default_client_metrics():
+    """The :class:`ClientMetrics` in :data:`REGISTRY` used by clients that are not given any"""
+    global _default_metrics
+
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = ClientMetrics()
+
+    return _default_metrics
+
+
+class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serve the Prometheus text of :attr:`registry` on every ``GET``"""
+    registry = REGISTRY
+
+    def do_GET(self):
+        body = self.registry.render()
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _MetricsServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+def start_http_server(port, addr='', registry=REGISTRY):
+    """Serve the metrics for Prometheus to scrape from a background thread
+
+    :param integer port: The port to listen on. ``0`` picks a free one
+    :param string addr: (optional) The address to listen on. Default: every address
+    :param registry: (optional) The :class:`MetricsRegistry` to serve. Default: :data:`REGISTRY`
+    :returns: The server. Its ``server_address`` has the port and ``shutdown()`` stops it
+
+    ::
+
+        >>> from aggcat.metrics import start_http_server
+        >>> server = start_http_server(9107)
+    """
+    class Handler(MetricsHandler):
+        pass
+    Handler.registry = registry
+
+    server = _MetricsServer((addr, port), Handler)
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
@@ -0,0 +1,583 @@
+from __future__ import absolute_import
+
+import re
+from decimal import Decimal
+from datetime import datetime, timedelta, tzinfo
+
+from lxml import etree
+
+from .parser import IterObjectify, clean_tag_name
+from .utils import _local_name
+
+_datetime_pattern = re.compile(
+    r'(\d{4})-(\d\d)-(\d\d)(?:T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,6})\d*)?)?(Z|[+-]\d\d:?\d\d)?$'
+)
+
+
+class FixedOffset(tzinfo):
+    """A timezone that is a fixed number of minutes from UTC"""
+    def __init__(self, minutes):
+        self._minutes = minutes
+        self._offset = timedelta(minutes=minutes)
+        self._name = '%s%02d:%02d' % ('-' if minutes < 0 else '+', abs(minutes) // 60, abs(minutes) % 60)
+
+    def utcoffset(self, dt):
+        return self._offset
+
+    def dst(self, dt):
+        return timedelta(0)
+
+    def tzname(self, dt):
+        return self._name
+
+    def __reduce__(self):
+        return FixedOffset, (self._minutes,)
+
+    def __repr__(self):
+        return '<FixedOffset %s>' % self._name
+
+
+_offsets = {}
+
+
+def _offset(value):
+    """A shared :class:`FixedOffset` for ``Z``, ``-07:00`` or ``-0700``"""
+    try:
+        return _offsets[value]
+    except KeyError:
+        minutes = 0
+        if value != 'Z':
+            digits = value[1:].replace(':', '')
+            minutes = int(digits[:2]) * 60 + int(digits[2:])
+            if value[0] == '-':
+                minutes = -minutes
+        _offsets[value] = FixedOffset(minutes)
+        return _offsets[value]
+
+
+def to_decimal(text):
+    return Decimal(text) if text else None
+
+
+def to_int(text):
+    return int(text) if text else None
+
+
+def to_bool(text):
+    return text == 'true' if text else None
+
+
+_datetimes = {}
+
+
+def to_datetime(text):
+    """Parse an Intuit date like ``2013-08-11T08:52:26.397-07:00``. Transactions share
+    a handful of dates so parsed dates are kept and shared"""
+    if not text:
+        return None
+
+    try:
+        return _datetimes[text]
+    except KeyError:
+        pass
+
+    match = _datetime_pattern.match(text)
+    if match is None:
+        raise ValueError('Invalid date %r' % text)
+
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+
+    value = datetime(
+        int(year), int(month), int(day),
+        int(hour or 0), int(minute or 0), int(second or 0),
+        int(fraction.ljust(6, '0')) if fraction else 0,
+        _offset(offset) if offset else None
+    )
+
+    if len(_datetimes) >= 10000:
+        _datetimes.clear()
+    _datetimes[text] = value
+
+    return value
+
+
+def to_text(text):
+    return text
+
+
+_codes = {}
+
+
+def to_code(text):
+    """Text from a small set of values like ``USD`` or ``CHECKING``. Every
+    record shares one copy of each value"""
+    if text is None:
+        return None
+    return _codes.setdefault(text, text)
+
+
+class _RecordType(type):
+    """Build ``__slots__`` and the tag lookup of a :class:`Record` from its ``schema``"""
+    def __new__(mcs, name, bases, attrs):
+        schema = attrs.pop('schema', ())
+        nested = attrs.pop('nested', {})
+
+        fields = {}
+        nested_decoders = {}
+        for base in bases:
+            fields.update(getattr(base, '_fields', {}))
+            nested_decoders.update(getattr(base, '_nested', {}))
+
+        inherited = set(attribute for attribute, converter in fields.values())
+        slots = []
+        for tag, converter in schema:
+            # the same attribute names Objectify uses. This also seeds its tag names
+            attribute = clean_tag_name(tag)
+            fields[tag] = (attribute, converter)
+            if attribute not in inherited:
+                slots.append(attribute)
+
+        for tag, (decoder, attributes) in nested.items():
+            nested_decoders[tag] = decoder
+            slots.extend(attributes)
+
+        attrs['__slots__'] = tuple(slots)
+        attrs['_fields'] = fields
+        attrs['_nested'] = nested_decoders
+
+        cls = type.__new__(mcs, name, bases, attrs)
+        cls._attributes = tuple(a for klass in reversed(cls.__mro__) for a in getattr(klass, '__slots__', ()))
+
+        return cls
+
+
+class Record(object):
+    """Base of the typed models. Every attribute in the schema is set and
+    is ``None`` when the element was not in the response"""
+    __metaclass__ = _RecordType
+
+    def __init__(self, **kwargs):
+        for attribute in self._attributes:
+            setattr(self, attribute, None)
+
+        for attribute, value in kwargs.iteritems():
+            setattr(self, attribute, value)
+
+    @classmethod
+    def from_element(cls, element):
+        """Decode an lxml element straight into a record"""
+        record = cls()
+        fields = cls._fields
+        nested = cls._nested
+
+        for child in element:
+            tag = child.tag
+            if not isinstance(tag, basestring):
+                continue
+
+            if tag[0] == '{':
+                tag = _local_name(tag)
+
+            field = fields.get(tag)
+            if field is not None:
+                setattr(record, field[0], field[1](child.text))
+            elif tag in nested:
+                nested[tag](record, child)
+
+        return record
+
+    def to_dict(self):
+        return dict((attribute, getattr(self, attribute)) for attribute in self._attributes)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        for attribute, value in state.iteritems():
+            setattr(self, attribute, value)
+
+    def __repr__(self):
+        return '<%s %s>' % (type(self).__name__, getattr(self, 'account_id', None) or getattr(self, 'id', None) or hex(id(self)))
+
+
+class Account(Record):
+    """Fields every account type has"""
+    schema = (
+        ('accountId', to_int),
+        ('status', to_code),
+        ('accountNumber', to_text),
+        ('accountNickname', to_text),
+        ('displayPosition', to_int),
+        ('institutionId', to_int),
+        ('description', to_text),
+        ('registeredUserName', to_text),
+        ('balanceAmount', to_decimal),
+        ('balanceDate', to_datetime),
+        ('balancePreviousAmount', to_decimal),
+        ('lastTxnDate', to_datetime),
+        ('aggrSuccessDate', to_datetime),
+        ('aggrAttemptDate', to_datetime),
+        ('aggrStatusCode', to_int),
+        ('currencyCode', to_code),
+        ('bankId', to_text),
+        ('institutionLoginId', to_int),
+    )
+
+
+class BankingAccount(Account):
+    schema = (
+        ('bankingAccountType', to_code),
+        ('postedDate', to_datetime),
+        ('availableBalanceAmount', to_decimal),
+        ('interestType', to_code),
+        ('originationDate', to_datetime),
+        ('openDate', to_datetime),
+        ('periodInterestRate', to_decimal),
+        ('periodDepositAmount', to_decimal),
+        ('periodInterestAmount', to_decimal),
+        ('interestAmountYtd', to_decimal),
+        ('interestPriorAmountYtd', to_decimal),
+        ('maturityDate', to_datetime),
+        ('maturityAmount', to_decimal),
+    )
+
+
+class CreditAccount(Account):
+    schema = (
+        ('creditAccountType', to_code),
+        ('detailedDescription', to_text),
+        ('interestRate', to_decimal),
+        ('creditAvailableAmount', to_decimal),
+        ('creditMaxAmount', to_decimal),
+        ('cashAdvanceAvailableAmount', to_decimal),
+        ('cashAdvanceMaxAmount', to_decimal),
+        ('cashAdvanceBalance', to_decimal),
+        ('cashAdvanceInterestRate', to_decimal),
+        ('currentBalance', to_decimal),
+        ('paymentMinAmount', to_decimal),
+        ('paymentDueDate', to_datetime),
+        ('previousBalance', to_decimal),
+        ('statementEndDate', to_datetime),
+        ('statementPurchaseAmount', to_decimal),
+        ('statementFinanceAmount', to_decimal),
+        ('pastDueAmount', to_decimal),
+        ('lastPaymentAmount', to_decimal),
+        ('lastPaymentDate', to_datetime),
+        ('statementCloseBalance', to_decimal),
+        ('statementLateFeeAmount', to_decimal),
+    )
+
+
+class InvestmentAccount(Account):
+    schema = (
+        ('investmentAccountType', to_code),
+        ('interestMarginBalance', to_decimal),
+        ('shortBalance', to_decimal),
+        ('availableCashBalance', to_decimal),
+        ('currentBalance', to_decimal),
+        ('maturityValueAmount', to_decimal),
+        ('unvestedBalance', to_decimal),
+        ('vestedBalance', to_decimal),
+        ('empMatchDeferAmount', to_decimal),
+        ('empMatchDeferAmountYtd', to_decimal),
+        ('empMatchAmount', to_decimal),
+        ('empMatchAmountYtd', to_decimal),
+        ('empPretaxContribAmount', to_decimal),
+        ('empPretaxContribAmountYtd', to_decimal),
+        ('rolloverItd', to_decimal),
+        ('cashBalanceAmount', to_decimal),
+        ('initialLoanBalance', to_decimal),
+        ('loanStartDate', to_datetime),
+        ('currentLoanBalance', to_decimal),
+        ('loanRate', to_decimal),
+    )
+
+
+class LoanAccount(Account):
+    schema = (
+        ('loanType', to_code),
+        ('postedDate', to_datetime),
+        ('term', to_text),
+        ('holderName', to_text),
+        ('lateFeeAmount', to_decimal),
+        ('payoffAmount', to_decimal),
+        ('payoffAmountDate', to_datetime),
+        ('referenceNumber', to_text),
+        ('originalMaturityDate', to_datetime),
+        ('taxPayeeName', to_text),
+        ('principalBalance', to_decimal),
+        ('escrowBalance', to_decimal),
+        ('interestRate', to_decimal),
+        ('interestPeriod', to_code),
+        ('initialAmount', to_decimal),
+        ('initialDate', to_datetime),
+        ('nextPaymentPrincipalAmount', to_decimal),
+        ('nextPaymentInterestAmount', to_decimal),
+        ('nextPayment', to_decimal),
+        ('nextPaymentDate', to_datetime),
+        ('lastPaymentDueDate', to_datetime),
+        ('lastPaymentReceiveDate', to_datetime),
+        ('lastPaymentAmount', to_decimal),
+        ('lastPaymentPrincipalAmount', to_decimal),
+        ('lastPaymentInterestAmount', to_decimal),
+        ('lastPaymentEscrowAmount', to_decimal),
+        ('ytdPrincipalPaid', to_decimal),
+        ('ytdInterestPaid', to_decimal),
+        ('ytdInsurancePaid', to_decimal),
+        ('ytdTaxPaid', to_decimal),
+        ('autopayEnrolled', to_bool),
+        ('collateral', to_text),
+        ('currentSchool', to_text),
+        ('firstPaymentDate', to_datetime),
+        ('guarantor', to_text),
+        ('firstMortgage', to_bool),
+        ('loanPaymentFreq', to_code),
+        ('paymentMinAmount', to_decimal),
+        ('originalSchool', to_text),
+        ('recurringPaymentAmount', to_decimal),
+        ('lender', to_text),
+        ('endingBalanceAmount', to_decimal),
+        ('availableBalanceAmount', to_decimal),
+        ('loanTermType', to_code),
+        ('noOfPayments', to_int),
+        ('balloonAmount', to_decimal),
+        ('interestRateType', to_code),
+        ('loanPaymentType', to_code),
+        ('loanAccountType', to_code),
+    )
+
+
+def _categorization(record, element):
+    """Pull the payee and category out of ``<categorization>``"""
+    for child in element.iter(etree.Element):
+        tag = _local_name(child.tag)
+        if tag == 'normalizedPayeeName' and record.normalized_payee_name is None:
+            record.normalized_payee_name = child.text
+        elif tag == 'categoryName' and record.category_name is None:
+            record.category_name = to_code(child.text)
+
+
+class Transaction(Record):
+    """Fields every transaction type has"""
+    schema = (
+        ('id', to_int),
+        ('currencyType', to_code),
+        ('institutionTransactionId', to_text),
+        ('correctInstitutionTransactionId', to_text),
+        ('correctAction', to_code),
+        ('serverTransactionId', to_text),
+        ('checkNumber', to_text),
+        ('refNumber', to_text),
+        ('confirmationNumber', to_text),
+        ('payeeId', to_text),
+        ('payeeName', to_text),
+        ('extendedPayeeName', to_text),
+        ('memo', to_text),
+        ('type', to_code),
+        ('valueType', to_code),
+        ('currencyRate', to_decimal),
+        ('originalCurrency', to_bool),
+        ('postedDate', to_datetime),
+        ('userDate', to_datetime),
+        ('availableDate', to_datetime),
+        ('amount', to_decimal),
+        ('runningBalanceAmount', to_decimal),
+        ('pending', to_bool),
+    )
+    nested = {
+        'categorization': (_categorization, ('normalized_payee_name', 'category_name')),
+    }
+
+
+class BankingTransaction(Transaction):
+    pass
+
+
+class CreditCardTransaction(Transaction):
+    pass
+
+
+class LoanTransaction(Transaction):
+    schema = (
+        ('principalAmount', to_decimal),
+        ('interestAmount', to_decimal),
+        ('escrowTotalAmount', to_decimal),
+        ('escrowTaxAmount', to_decimal),
+        ('escrowInsuranceAmount', to_decimal),
+        ('escrowPmiAmount', to_decimal),
+        ('escrowFeesAmount', to_decimal),
+        ('escrowOtherAmount', to_decimal),
+    )
+
+
+class InvestmentTransaction(Transaction):
+    schema = (
+        ('reversalInstitutionTransactionId', to_text),
+        ('description', to_text),
+        ('buyType', to_code),
+        ('incomeType', to_code),
+        ('inv401kSource', to_code),
+        ('loanId', to_text),
+        ('positionType', to_code),
+        ('securedType', to_code),
+        ('sellReason', to_code),
+        ('sellType', to_code),
+        ('subaccountFromType', to_code),
+        ('subaccountFundType', to_code),
+        ('subaccountSecurityType', to_code),
+        ('subaccountToType', to_code),
+        ('transferAction', to_code),
+        ('unitType', to_code),
+        ('cusip', to_text),
+        ('symbol', to_text),
+        ('unitAction', to_code),
+        ('tradeDate', to_datetime),
+        ('settleDate', to_datetime),
+        ('payrollDate', to_datetime),
+        ('purchaseDate', to_datetime),
+        ('accruedInterestAmount', to_decimal),
+        ('averageCostBasisAmount', to_decimal),
+        ('commissionAmount', to_decimal),
+        ('gainAmount', to_decimal),
+        ('feesAmount', to_decimal),
+        ('loadAmount', to_decimal),
+        ('markdownAmount', to_decimal),
+        ('markupAmount', to_decimal),
+        ('newUnits', to_decimal),
+        ('oldUnits', to_decimal),
+        ('penaltyAmount', to_decimal),
+        ('stateWithholding', to_decimal),
+        ('totalAmount', to_decimal),
+        ('taxesAmount', to_decimal),
+        ('taxExempt', to_bool),
+        ('unitPrice', to_decimal),
+        ('units', to_decimal),
+        ('withholdingAmount', to_decimal),
+    )
+
+
+class Position(Record):
+    """An investment position from :meth:`AggcatClient.get_investment_positions`"""
+    schema = (
+        ('investmentPositionId', to_int),
+        ('changePercent', to_decimal),
+        ('costBasis', to_decimal),
+        ('currencyCode', to_code),
+        ('currencyRate', to_decimal),
+        ('currencyType', to_code),
+        ('dailyChange', to_decimal),
+        ('description', to_text),
+        ('heldType', to_code),
+        ('holdType', to_code),
+        ('maturityValue', to_decimal),
+        ('memo', to_text),
+        ('positionType', to_code),
+        ('posType', to_code),
+        ('reinvestCapGains', to_bool),
+        ('reinvestDividend', to_bool),
+        ('securityId', to_text),
+        ('securityIdType', to_code),
+        ('status', to_code),
+        ('symbol', to_text),
+        ('units', to_decimal),
+        ('unitPrice', to_decimal),
+        ('unitsStreet', to_decimal),
+        ('unitsUser', to_decimal),
+        ('marketValue', to_decimal),
+        ('priceAsOfDate', to_datetime),
+    )
+
+    def __repr__(self):
+        return '<Position %s>' % (self.symbol or self.investment_position_id)
+
+
+# model for the tag of each record in a response
+MODELS = {
+    'BankingAccount': BankingAccount,
+    'CreditAccount': CreditAccount,
+    'InvestmentAccount': InvestmentAccount,
+    'LoanAccount': LoanAccount,
+    'BankingTransaction': BankingTransaction,
+    'CreditCardTransaction': CreditCardTransaction,
+    'LoanTransaction': LoanTransaction,
+    'InvestmentTransaction': InvestmentTransaction,
+    'Position': Position,
+}
+
+
+def model_for(tag):
+    """The model for a record tag. Account and transaction types without
+    a model of their own get the common fields"""
+    tag = _local_name(tag)
+    model = MODELS.get(tag)
+
+    if model is None:
+        if tag.endswith('Account'):
+            model = Account
+        elif tag.endswith('Transaction'):
+            model = Transaction
+
+    return model
+
+
+def from_element(element):
+    """Decode a record element or return ``None`` if it is not an account, transaction or position"""
+    if not isinstance(element.tag, basestring):
+        return None
+
+    model = model_for(element.tag)
+    return model.from_element(element) if model is not None else None
+
+
+def decode(xml):
+    """Decode the accounts, transactions or positions in a response
+
+    :param xml: The XML of an :class:`AggCatResponse` from a client created with ``objectify=False``
+    :returns: ``list`` of records
+
+    ::
+
+        >>> from aggcat import models
+        >>> client = AggcatClient(..., objectify=False)
+        >>> accounts = models.decode(client.get_customer_accounts().content)
+        >>> accounts[0]
+        <CreditAccount 400004530271>
+        >>> accounts[0].current_balance
+        Decimal('-811.52')
+        >>> accounts[0].balance_date
+        datetime.datetime(2013, 8, 11, 0, 0, tzinfo=<FixedOffset -07:00>)
+    """
+    records = []
+
+    for element in etree.XML(xml):
+        record = from_element(element)
+        if record is not None:
+            records.append(record)
+
+    return records
+
+
+def iterdecode(source):
+    """Decode records one at a time from a streamed response
+
+    :param source: XML as a string, a file opened for reading or the :class:`aggcat.parser.IterObjectify`
+                   of a response requested with ``stream=True``
+
+    ::
+
+        >>> r = client.get_account_transactions(400004540560, '2010-01-01', stream=True)
+        >>> spent = sum(t.amount for t in models.iterdecode(r.content) if t.amount < 0)
+    """
+    if not isinstance(source, IterObjectify):
+        source = IterObjectify(source)
+
+    for element in source.iterelements():
+        record = from_element(element)
+        if record is not None:
+            yield record
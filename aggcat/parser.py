@@ -1,14 +1,11 @@
 from __future__ import absolute_import
 
 import re
+from io import BytesIO
 from lxml import etree
 
-try:
-    from collections import Counter
-except ImportError:
-    from .counter import Counter
-
-from .utils import remove_namespaces
+from . import profiling
+from .utils import strip_namespaces
 
 
 def _get_item(self, index):
@@ -31,94 +28,297 @@ def _repr(self):
         return '<%s object @ %s>' % (self._name, hex(id(self)))
 
 
+# generated classes keyed by (tag name, child attribute names, is list).
+# Elements with the same shape share a class across elements and responses
+_classes = {}
+
+# attribute names that can be used in __slots__
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# CamelCase tag name to camel_case attribute name. Intuit uses a small fixed set of
+# tags so every name is converted once per process and looked up after that
+_tag_pattern = re.compile('(?!^)([A-Z]+)')
+_tag_names = {}
+
+
+def clean_tag_name(tag_name):
+    """Convert the CamelCase format of tag name to a camel_case format"""
+    try:
+        return _tag_names[tag_name]
+    except KeyError:
+        return _tag_names.setdefault(tag_name, _tag_pattern.sub(r'_\1', tag_name).lower())
+
+
+def seed_tag_names(tag_names):
+    """Convert known tag names ahead of time"""
+    for tag_name in tag_names:
+        clean_tag_name(tag_name)
+
+
+# tags of institutions, credentials and challenges. The account, transaction and
+# position tags are seeded by :mod:`aggcat.models`
+seed_tag_names((
+    'institutionId', 'institutionName', 'homeUrl', 'phoneNumber', 'emailAddress', 'specialText',
+    'currencyCode', 'address1', 'address2', 'address3', 'city', 'state', 'postalCode', 'country',
+    'name', 'val', 'status', 'valueLengthMin', 'valueLengthMax', 'displayFlag', 'displayOrder',
+    'mask', 'instructions', 'description', 'text', 'image', 'choice', 'challengeSessionId',
+    'challengeNodeId', 'accountId', 'id', 'amount', 'postedDate', 'userDate', 'pending',
+    'payeeName', 'memo', 'currencyType', 'normalizedPayeeName', 'categoryName', 'source',
+))
+
+
+def _get_class(name, attributes, is_list=False):
+    """Get or create a ``__slots__`` based class for a tag and its child attributes"""
+    key = (name, attributes, is_list)
+
+    try:
+        return _classes[key]
+    except KeyError:
+        pass
+
+    # every root object gets to_xml() assigned so leave room for it
+    slots = set(attributes)
+    slots.add('to_xml')
+
+    # tags that are not valid identifiers can't be slots so
+    # give the object a __dict__ to hold them instead
+    for attribute in attributes:
+        if not _identifier.match(attribute):
+            slots = set(a for a in slots if _identifier.match(a))
+            slots.add('__dict__')
+            break
+
+    class_attributes = {
+        '_name': name.capitalize(),
+        '__repr__': _repr
+    }
+
+    if is_list:
+        slots.add('_list')
+        class_attributes.update({
+            '__len__': _len,
+            '__iter__': _iter,
+            '__getitem__': _get_item
+        })
+
+    class_attributes['__slots__'] = tuple(sorted(slots))
+
+    return _classes.setdefault(key, type(name.capitalize(), (object,), class_attributes))
+
+
+# what an objectified response keeps around for to_xml()
+RETAIN_XML = 'xml'
+RETAIN_TREE = 'tree'
+RETAIN_NONE = 'none'
+RETAIN_MODES = (RETAIN_XML, RETAIN_TREE, RETAIN_NONE)
+
+
+class RetainedXML(object):
+    """The ``to_xml()`` of an objectified response. It only holds the raw XML or the
+    parsed tree, never the :class:`Objectify` that created it.
+
+    ::
+
+        >>> r.content.to_xml()
+        '<?xml version="1.0" ...'
+        >>> r.content.to_xml(view=True)
+        <memory at 0x10a380710>
+        >>> with open('accounts.xml', 'wb') as f:
+                r.content.to_xml(f)
+    """
+    __slots__ = ('_xml', '_tree')
+
+    def __init__(self, xml=None, tree=None):
+        self._xml = xml
+        self._tree = tree
+
+    def __call__(self, out=None, view=False):
+        """Get the XML
+
+        :param out: (optional) A file-like object to write the XML to instead of returning it
+        :param boolean view: (optional) Return a ``memoryview`` of the raw XML instead of a copy. Default: ``False``
+
+        When only the tree was retained the XML is serialized from the namespace free tree
+        """
+        if self._xml is None and self._tree is None:
+            raise ValueError('The XML was not retained. Objectify with retain="xml" or retain="tree" to use to_xml()')
+
+        if out is not None:
+            if self._xml is not None:
+                out.write(self._encoded())
+            else:
+                self._tree.getroottree().write(out)
+            return None
+
+        if view:
+            return memoryview(self._encoded() if self._xml is not None else etree.tostring(self._tree))
+
+        return self._xml if self._xml is not None else etree.tostring(self._tree)
+
+    def _encoded(self):
+        """The raw XML as bytes. Only XML passed in as unicode is copied"""
+        if isinstance(self._xml, unicode):
+            return self._xml.encode('utf-8')
+        return self._xml
+
+
 class Objectify(object):
     """Take XML output and turn it into a Pythonic Object
     The goals are to:
        * Provide an object that resembles the XML structure
        * Have the ability to go back to XML from the object
+
+    :param string xml: The XML
+    :param string retain: (optional) What ``to_xml()`` keeps once the XML is objectified. ``xml`` keeps
+                          the raw XML, ``tree`` keeps the parsed tree and ``none`` keeps nothing so
+                          ``to_xml()`` raises ``ValueError``. Default: ``xml``
     """
-    def __init__(self, xml):
+    def __init__(self, xml, retain=RETAIN_XML):
+        if retain not in RETAIN_MODES:
+            raise ValueError('retain must be one of %s' % (RETAIN_MODES,))
+
         # raw xml
         self.xml = xml
 
         # parse the tree with lxml
-        self.tree = etree.fromstring(remove_namespaces(etree.XML(xml)))
-
-        # regex pattern for tag name cleanup
-        self.tag_pattern = re.compile("(?!^)([A-Z]+)")
+        self.tree = self._parse(xml)
 
         self.root_tag = self.tree.tag
 
-        # create a base object wrapper
-        self.obj = self._create_object('Objectified XML')
+        with profiling.phase(profiling.OBJECTIFY):
+            # create a base object wrapper
+            self.obj = self._create_object('Objectified XML', (self.root_tag,))
 
-        # check to see this is only one node with no children
-        # Ex. get_customer_accounts is empty
-        if not self.tree.getchildren():
-            self.obj = self._create_object(self.tree.tag)
-        else:
-            self._walk_and_objectify(self.tree, self.obj)
-
-    def _create_object(self, name, attributes={}):
-        """Dynamically create an object"""
-        attributes.update({
-            '_name': name.capitalize(),
-            '__repr__': _repr
-        })
-        return type(name.capitalize(), (object,), attributes)()
+            # check to see this is only one node with no children
+            # Ex. get_customer_accounts is empty
+            if not len(self.tree):
+                self.obj = self._create_object(self.tree.tag)
+            else:
+                self._walk_and_objectify(self.tree, self.obj)
+
+        self._retain(retain)
+
+    def _parse(self, xml):
+        """Parse the XML and strip its namespaces"""
+        with profiling.phase(profiling.PARSE) as p:
+            p.add_bytes(len(xml))
+            tree = etree.XML(xml)
+
+        with profiling.phase(profiling.NAMESPACES):
+            return strip_namespaces(tree)
+
+    def _retain(self, retain):
+        """Build to_xml() and let go of what it does not need"""
+        self._to_xml = RetainedXML(
+            self.xml if retain == RETAIN_XML else None,
+            self.tree if retain == RETAIN_TREE else None
+        )
+
+        if retain != RETAIN_XML:
+            self.xml = None
+        if retain != RETAIN_TREE:
+            self.tree = None
+
+    def _create_object(self, name, attributes=()):
+        """Create an object from the cached class for `name` and the
+        attribute names it will hold"""
+        return _get_class(name, frozenset(attributes))()
+
+    def _create_list_object(self, name, attributes=()):
+        """Create an object that has list type functionality"""
+        obj = _get_class(name, frozenset(attributes), True)()
+        obj._list = []
+        return obj
+
+    def _child_attributes(self, element):
+        """The attribute names the children of `element` will be set as"""
+        return [
+            child.tag if len(child) else clean_tag_name(child.tag)
+            for child in element.iterchildren(etree.Element)
+        ]
 
-    def _create_list_object(self, name):
-        """Dynamically create an object that has list type functionality"""
-        return self._create_object(name, {
-            '_list': [],
-            '__len__': _len,
-            '__iter__': _iter,
-            '__getitem__': _get_item
-        })
+    # regex pattern for tag name cleanup
+    tag_pattern = _tag_pattern
 
     def _clean_tag_name(self, tag_name):
         """Convert the CamelCase format of tag name to
         a camel_case format"""
-        return re.sub(self.tag_pattern, r'_\1', tag_name).lower()
+        return clean_tag_name(tag_name)
 
     def _is_list_xml(self, element):
         """Detect if the next set of XML elements contain duplicates
         which means it is a listable set of elements"""
-        tags = []
-        for e in element.xpath('./*'):
-            tags.append(e.tag)
+        seen = set()
 
-        for count in Counter(tags).values():
-            if count > 1:
+        for child in element.iterchildren(etree.Element):
+            tag = child.tag
+            if tag in seen:
                 return True
+            seen.add(tag)
 
         return False
 
+    def _objectify_element(self, element):
+        """Objectify a single element and its children"""
+        if not len(element):
+            return element.text
+
+        wrapper = self._create_object('Objectified XML', (element.tag,))
+        self._walk_and_objectify(element, wrapper)
+
+        return getattr(wrapper, element.tag)
+
     def _walk_and_objectify(self, element, obj):
-        """Walk the XML tree recursively and make objects out of the structure"""
-        if element.getchildren():
-            # look ahead and create a list object instead
-            needs_list_obj = self._is_list_xml(element)
+        """Walk the XML tree and make objects out of the structure. The tree is walked
+        with a stack instead of recursion and the children of each element are only
+        looked at once to find their attribute names, leaf values and duplicate tags"""
+        if not len(element):
+            setattr(obj, clean_tag_name(element.tag), element.text)
+            return
+
+        stack = [(element, obj)]
+
+        while stack:
+            element, obj = stack.pop()
+
+            tags = set()
+            attributes = []
+            leaves = []
+            children = []
+            needs_list_obj = False
+
+            for child in element.iterchildren(etree.Element):
+                tag = child.tag
+
+                # look ahead and create a list object instead
+                if tag in tags:
+                    needs_list_obj = True
+                tags.add(tag)
+
+                if len(child):
+                    attributes.append(tag)
+                    children.append(child)
+                else:
+                    name = clean_tag_name(tag)
+                    attributes.append(name)
+                    leaves.append((name, child.text))
 
             if needs_list_obj:
-                new_obj = self._create_list_object(element.tag)
+                new_obj = self._create_list_object(element.tag, attributes)
             else:
-                new_obj = self._create_object(element.tag)
+                new_obj = self._create_object(element.tag, attributes)
 
-            obj_attr_value = getattr(obj, element.tag, None)
-            has_list = hasattr(obj, '_list')
-
-            if obj_attr_value is None and not has_list:
+            if not hasattr(obj, '_list') and getattr(obj, element.tag, None) is None:
                 setattr(obj, element.tag, new_obj)
             else:
-                l = getattr(obj, '_list')
-                l.append(new_obj)
-                setattr(obj, '_list', l)
+                obj._list.append(new_obj)
 
-            for child in element.getchildren():
-                self._walk_and_objectify(child, new_obj)
-        else:
-            setattr(obj, self._clean_tag_name(element.tag), element.text)
+            for name, text in leaves:
+                setattr(new_obj, name, text)
+
+            # push in reverse so children are objectified, and listed, in document order
+            for child in reversed(children):
+                stack.append((child, new_obj))
 
     def get_object(self):
         root_obj = self.obj
@@ -131,13 +331,241 @@ class Objectify(object):
         # sure this is the desired result, but i'll leave it for now
         appended_attrs = [
             k for k
-            in root_obj.__dict__.iterkeys()
-            if not k.startswith('_') and not '_' in k
+            in root_obj.__slots__
+            if not k.startswith('_') and not '_' in k and hasattr(root_obj, k)
         ]
         if len(appended_attrs) == 1:
             root_obj = getattr(root_obj, appended_attrs.pop())
 
         # append the to_xml() attribute to you can easily get the xml from the root object
-        root_obj.to_xml = lambda: self.xml
+        root_obj.to_xml = self._to_xml
+
+        return root_obj
+
+
+class IterObjectify(Objectify):
+    """Objectify a response one top level element at a time
+
+    Iterating over this object yields each child of the root element (an institution,
+    transaction, account, etc.) as an objectified record. Elements are parsed with
+    ``lxml.etree.iterparse`` and cleared once they have been objectified so memory
+    stays flat no matter how large the response is.
+
+    :param source: A file-like object such as ``requests.Response.raw`` or a string of XML
+
+    .. note::
+
+        The records can only be iterated over once
+    """
+    def __init__(self, source):
+        if isinstance(source, basestring):
+            source = BytesIO(source)
+
+        self.source = source
+
+    def iterelements(self):
+        """Yield the namespace free children of the root element without objectifying
+        them. Each element is cleared once the next one is asked for."""
+        for event, element in etree.iterparse(self.source, events=('end',)):
+            parent = element.getparent()
+
+            # only objectify the children of the root element
+            if parent is None or parent.getparent() is not None:
+                continue
+
+            yield strip_namespaces(element)
+
+            # free the element and any siblings that came before it
+            element.clear()
+            while element.getprevious() is not None:
+                del parent[0]
+
+    def __iter__(self):
+        for element in self.iterelements():
+            yield self._objectify_element(element)
+
+    def close(self):
+        """Close the source and give its connection back to the pool, like ``requests.Response.close``"""
+        for name in ('close', 'release_conn'):
+            method = getattr(self.source, name, None)
+            if method is not None:
+                method()
+
+    def __repr__(self):
+        return '<IterObjectify object @ %s>' % hex(id(self))
+
+
+class RecordObjectify(Objectify):
+    """Objectify the XML of a single record (an institution, account, transaction, etc.)
+    the same way :class:`IterObjectify` objectifies each of its records"""
+    def __init__(self, xml, retain=RETAIN_XML):
+        if retain not in RETAIN_MODES:
+            raise ValueError('retain must be one of %s' % (RETAIN_MODES,))
+
+        # raw xml
+        self.xml = xml
+
+        # parse the tree with lxml
+        self.tree = self._parse(xml)
+
+        with profiling.phase(profiling.OBJECTIFY):
+            self.obj = self._objectify_element(self.tree)
+        self._retain(retain)
+
+    def get_object(self):
+        obj = self.obj
+
+        if not isinstance(obj, basestring) and obj is not None:
+            obj.to_xml = self._to_xml
+
+        return obj
+
+
+class LazyObject(object):
+    """An objectified element that only builds its children when they are first
+    accessed. Attribute, index and ``len()`` access behave the same as the objects
+    created by :class:`Objectify` and each child is memoized once it is built."""
+    __slots__ = ('_element', '_objectify', '_attributes', '_items', 'to_xml')
+
+    def __init__(self, objectify, element=None):
+        # a root object without an element loads it from `objectify` when first used
+        self._element = element
+        self._objectify = objectify
+        self._attributes = None
+        self._items = None
+
+    def _build(self):
+        """Index the children of the element without objectifying them"""
+        if self._element is None:
+            self._element = self._objectify._load()
+
+        element = self._element
+        attributes = {}
+        items = []
+        is_list = self._objectify._is_list_xml(element)
+
+        for child in element.iterchildren(etree.Element):
+            if len(child):
+                if is_list:
+                    items.append(child)
+                else:
+                    attributes[child.tag] = child
+            else:
+                attributes[clean_tag_name(child.tag)] = child.text
+
+        self._items = items if is_list else None
+        self._attributes = attributes
+
+    def _item(self, index):
+        """Objectify and memoize a list item"""
+        item = self._items[index]
+        if isinstance(item, etree._Element):
+            item = self._items[index] = LazyObject(self._objectify, item)
+        return item
+
+    def _is_list(self):
+        if self._attributes is None:
+            self._build()
+        return self._items is not None
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        if self._attributes is None:
+            self._build()
+
+        if name == '_name':
+            return self._element.tag.capitalize()
+
+        if name == '_list':
+            if self._items is None:
+                raise AttributeError(name)
+            return [self._item(i) for i in xrange(len(self._items))]
+
+        try:
+            value = self._attributes[name]
+        except KeyError:
+            raise AttributeError(name)
+
+        if isinstance(value, etree._Element):
+            value = self._attributes[name] = LazyObject(self._objectify, value)
+
+        return value
+
+    def __len__(self):
+        if not self._is_list():
+            raise TypeError('%s object has no len()' % self._name)
+        return len(self._items)
+
+    def __nonzero__(self):
+        return not self._is_list() or bool(self._items)
+
+    def __iter__(self):
+        if not self._is_list():
+            raise TypeError('%s object is not iterable' % self._name)
+        return (self._item(i) for i in xrange(len(self._items)))
+
+    def __getitem__(self, index):
+        if not self._is_list():
+            raise TypeError('%s object does not support indexing' % self._name)
+
+        if isinstance(index, slice):
+            return [self._item(i) for i in xrange(*index.indices(len(self._items)))]
+
+        if index < 0:
+            index += len(self._items)
+
+        return self._item(index)
+
+    def __repr__(self):
+        if self._is_list():
+            ls = [repr(l) for l in self[:2]]
+            return '<%s object [%s ...] @ %s>' % (self._name, ','.join(ls), hex(id(self)))
+        else:
+            return '<%s object @ %s>' % (self._name, hex(id(self)))
+
+
+class LazyObjectify(Objectify):
+    """Objectify XML on demand. The XML is not parsed until the object returned by
+    :meth:`get_object` is first used and each child object is only created when it
+    is accessed. Calling ``to_xml()`` never parses the XML.
+
+    .. note::
+
+        Since parsing is deferred, invalid XML raises ``lxml.etree.XMLSyntaxError``
+        the first time the object is used instead of when it is created. The raw XML is
+        always retained since it is parsed on demand.
+    """
+    def __init__(self, xml):
+        # raw xml
+        self.xml = xml
+        self._to_xml = RetainedXML(xml)
+
+    def _load(self):
+        """Parse the XML and find the element that :meth:`Objectify.get_object`
+        would have returned an object for"""
+        tree = strip_namespaces(etree.XML(self.xml))
+
+        # the same single attribute unwrapping as Objectify.get_object
+        root = LazyObject(self, tree)
+        root._build()
+        appended_attrs = [
+            k for k
+            in root._attributes.iterkeys()
+            if not k.startswith('_') and not '_' in k
+        ]
+        if len(appended_attrs) == 1:
+            value = root._attributes[appended_attrs.pop()]
+            if isinstance(value, etree._Element):
+                return value
+
+        return tree
+
+    def get_object(self):
+        root_obj = LazyObject(self)
+
+        # append the to_xml() attribute to you can easily get the xml from the root object
+        root_obj.to_xml = self._to_xml
 
         return root_obj
@@ -0,0 +1,124 @@
+from __future__ import absolute_import
+
+import threading
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from .ordereddict import OrderedDict
+
+from .client import AggcatClient
+
+
+class AggcatClientPool(object):
+    """A set of :class:`AggcatClient` objects keyed by ``customer_id``
+
+    :param string consumer_key: The OAuth consumer key given on the Intuit application page
+    :param string consumer_secret: The OAuth consumer secret given on the Intuit application page
+    :param string saml_identity_provider_id: The SAML identitity provider id given on the Intuit application page
+    :param string private_key: The absolute path to the generated x509 private key
+    :param integer max_customers: (optional) Number of customers to keep clients for. The least
+                                  recently used client is evicted after that. Default: ``1000``
+
+    Any other keyword arguments are passed to every :class:`AggcatClient`.
+
+    A customer's client (and its SAML assertion and OAuth tokens) is only created the first time
+    it is asked for. Every client shares the loaded private key, the connection pool and the
+    objectifier caches so serving many customers from one process is cheap::
+
+        from aggcat.pool import AggcatClientPool
+
+        pool = AggcatClientPool(
+            'oauth_consumer_key',
+            'oauth_consumer_secret',
+            'saml_identity_provider_id',
+            '/path/to/x509/appname.key',
+            max_customers=10000
+        )
+
+        r = pool[customer_id].get_customer_accounts()
+    """
+    def __init__(self, consumer_key, consumer_secret, saml_identity_provider_id, private_key, max_customers=1000, **client_kwargs):
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.saml_identity_provider_id = saml_identity_provider_id
+        self.private_key = private_key
+        self.max_customers = max_customers
+        self.client_kwargs = client_kwargs
+
+        # customer_id -> client, least recently used first
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _create_client(self, customer_id):
+        """Create the client for a customer"""
+        return AggcatClient(
+            self.consumer_key,
+            self.consumer_secret,
+            self.saml_identity_provider_id,
+            customer_id,
+            self.private_key,
+            **self.client_kwargs
+        )
+
+    def _close_client(self, client):
+        """Clean up an evicted client"""
+        client.close()
+
+    def get(self, customer_id):
+        """Get the client for a customer, creating it if needed"""
+        with self._lock:
+            client = self._clients.pop(customer_id, None)
+            if client is not None:
+                self._clients[customer_id] = client
+                return client
+
+        # create the client outside of the lock since it talks to intuit
+        client = self._create_client(customer_id)
+
+        evicted = []
+        with self._lock:
+            # another thread may have created one in the meantime
+            existing = self._clients.pop(customer_id, None)
+            if existing is not None:
+                evicted.append(client)
+                client = existing
+
+            self._clients[customer_id] = client
+
+            while len(self._clients) > self.max_customers:
+                evicted.append(self._clients.popitem(last=False)[1])
+
+        for c in evicted:
+            self._close_client(c)
+
+        return client
+
+    def evict(self, customer_id):
+        """Remove the client for a customer"""
+        with self._lock:
+            client = self._clients.pop(customer_id, None)
+
+        if client is not None:
+            self._close_client(client)
+
+    def clear(self):
+        """Remove every client"""
+        with self._lock:
+            clients = self._clients.values()
+            self._clients.clear()
+
+        for client in clients:
+            self._close_client(client)
+
+    def __getitem__(self, customer_id):
+        return self.get(customer_id)
+
+    def __contains__(self, customer_id):
+        return customer_id in self._clients
+
+    def __len__(self):
+        return len(self._clients)
+
+    def __repr__(self):
+        return '<AggcatClientPool %s customers @ %s>' % (len(self), hex(id(self)))
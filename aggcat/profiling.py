@@ -0,0 +1,290 @@
+from __future__ import absolute_import
+
+import threading
+from bisect import bisect_left
+from timeit import default_timer
+
+# phases of a request
+SAML_SIGNING = 'saml_signing'
+TOKEN_EXCHANGE = 'token_exchange'
+OAUTH_SIGNING = 'oauth_signing'
+NETWORK = 'network'
+PARSE = 'parse'
+NAMESPACES = 'namespaces'
+OBJECTIFY = 'objectify'
+PHASES = (SAML_SIGNING, TOKEN_EXCHANGE, OAUTH_SIGNING, NETWORK, PARSE, NAMESPACES, OBJECTIFY)
+
+# endpoint the token phases are reported under
+TOKENS = 'tokens'
+
+# upper bounds in seconds of the histogram buckets
+DEFAULT_BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# replaced, never changed in place, so phases can read it without a lock
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+# endpoint of the phases running in each thread
+_local = threading.local()
+
+
+class Hook(object):
+    """Called at the start and end of every phase once added with :func:`add_hook`. Hooks
+    run in the thread of the request so they should be quick and thread safe"""
+    def start(self, phase, endpoint):
+        pass
+
+    def end(self, phase, endpoint, seconds, size):
+        """`size` is the bytes sent or received by the phase when known, otherwise ``0``"""
+        pass
+
+
+def add_hook(hook):
+    """Start calling `hook` for every phase in the process"""
+    global _hooks
+
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    global _hooks
+
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def enabled():
+    """Check if any hooks are added"""
+    return bool(_hooks)
+
+
+class _Phase(object):
+    __slots__ = ('name', 'endpoint', 'hooks', 'size', 'started', 'outer')
+
+    def __init__(self, name, endpoint, hooks):
+        self.name = name
+        self.endpoint = endpoint
+        self.hooks = hooks
+        self.size = 0
+
+    def add_bytes(self, size):
+        self.size += size
+
+    def __enter__(self):
+        # phases inside this one are reported under the same endpoint
+        self.outer = getattr(_local, 'endpoint', None)
+        _local.endpoint = self.endpoint
+
+        for hook in self.hooks:
+            hook.start(self.name, self.endpoint)
+
+        self.started = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = default_timer() - self.started
+        _local.endpoint = self.outer
+
+        for hook in self.hooks:
+            hook.end(self.name, self.endpoint, seconds, self.size)
+
+
+class _Endpoint(object):
+    __slots__ = ('endpoint', 'outer')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.outer = getattr(_local, 'endpoint', None)
+        _local.endpoint = self.endpoint
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.endpoint = self.outer
+
+
+class _Disabled(object):
+    """What phases are when there are no hooks"""
+    __slots__ = ()
+
+    def add_bytes(self, size):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_DISABLED = _Disabled()
+
+
+def phase(name, endpoint=None):
+    """Time the ``with`` block as phase `name` of `endpoint`. Without an endpoint the phase
+    belongs to the one it runs inside of. Call ``add_bytes`` on the value of the ``with``
+    to count bytes. When no hooks are added this returns a shared object that does nothing::
+
+        with profiling.phase(profiling.NETWORK, 'accounts') as p:
+            response = session.get(url)
+            p.add_bytes(len(response.content))
+    """
+    hooks = _hooks
+    if not hooks:
+        return _DISABLED
+
+    if endpoint is None:
+        endpoint = getattr(_local, 'endpoint', None)
+
+    return _Phase(name, endpoint, hooks)
+
+
+def endpoint(name):
+    """Report the phases run in the ``with`` block under endpoint `name`"""
+    if not _hooks:
+        return _DISABLED
+
+    return _Endpoint(name)
+
+
+class ProfiledAuth(object):
+    """Wrap a ``requests`` auth, such as the OAuth1 signer of a session, to time it as ``oauth_signing``"""
+    def __init__(self, auth):
+        self.auth = auth
+
+    def __call__(self, request):
+        with phase(OAUTH_SIGNING):
+            return self.auth(request)
+
+
+class Histogram(object):
+    """Counts of values at or below each of `bounds`. Not thread safe"""
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """``(bound, count of values at or below it)`` pairs ending with ``float('inf')``"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q):
+        """The bound of the bucket holding the `q` quantile, e.g. ``0.99``"""
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank and total:
+                return bound
+        return 0.0
+
+    def copy(self):
+        histogram = Histogram(self.bounds)
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        return histogram
+
+
+class PhaseStats(object):
+    """Timings and byte counts of one phase of one endpoint"""
+    __slots__ = ('seconds', 'bytes', 'max')
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.seconds = Histogram(bounds)
+        self.bytes = 0
+        self.max = 0.0
+
+    @property
+    def count(self):
+        return self.seconds.count
+
+    @property
+    def mean(self):
+        return self.seconds.sum / self.seconds.count if self.seconds.count else 0.0
+
+    def copy(self):
+        stats = PhaseStats()
+        stats.seconds = self.seconds.copy()
+        stats.bytes = self.bytes
+        stats.max = self.max
+        return stats
+
+    def __repr__(self):
+        return '<PhaseStats %s calls %.4f sec mean>' % (self.count, self.mean)
+
+
+class PhaseCollector(Hook):
+    """A :class:`Hook` that keeps a timing histogram and byte count per endpoint and phase
+
+    :param bounds: (optional) Upper bounds in seconds of the histogram buckets. Default: ``DEFAULT_BOUNDS``
+
+    ::
+
+        >>> from aggcat import profiling
+        >>> collector = profiling.PhaseCollector()
+        >>> profiling.add_hook(collector)
+        >>> r = client.get_account_transactions(400004540560, '2013-08-10')
+        >>> print collector.report()
+        endpoint      phase              calls   total sec    mean sec     p99 sec     max sec        bytes
+        tokens        saml_signing           1      0.0004      0.0004      0.0005      0.0004            0
+        tokens        token_exchange         1      0.3321      0.3321      0.5000      0.3321          312
+        transactions  network                1      1.2040      1.2040      2.5000      1.2040       184210
+        ...
+    """
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = bounds
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def end(self, phase, endpoint, seconds, size):
+        key = (endpoint, phase)
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = PhaseStats(self.bounds)
+
+            stats.seconds.observe(seconds)
+            stats.bytes += size
+            if seconds > stats.max:
+                stats.max = seconds
+
+    def stats(self):
+        """A copy of the :class:`PhaseStats` by ``(endpoint, phase)``"""
+        with self._lock:
+            return dict((key, stats.copy()) for key, stats in self._stats.iteritems())
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def report(self):
+        """The stats as a table ordered by endpoint and phase"""
+        lines = ['%-13s %-16s %7s %11s %11s %11s %11s %12s' % (
+            'endpoint', 'phase', 'calls', 'total sec', 'mean sec', 'p99 sec', 'max sec', 'bytes')]
+
+        stats = self.stats()
+        order = lambda key: (key[0] or '', PHASES.index(key[1]) if key[1] in PHASES else len(PHASES), key[1])
+
+        for key in sorted(stats, key=order):
+            s = stats[key]
+            # the quantile is a bucket bound which can be above anything seen
+            p99 = min(s.seconds.quantile(0.99), s.max)
+            lines.append('%-13s %-16s %7d %11.4f %11.4f %11.4f %11.4f %12d' % (
+                key[0], key[1], s.count, s.seconds.sum, s.mean, p99, s.max, s.bytes))
+
+        return '\n'.join(lines)
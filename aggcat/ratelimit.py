@@ -0,0 +1,198 @@
+from __future__ import absolute_import
+
+import os
+import mmap
+import time
+import fcntl
+import struct
+import threading
+from contextlib import contextmanager
+
+# tokens left and when they were counted, shared by processes in a memory mapped file
+_STATE = struct.Struct('dd')
+
+
+class TokenBucket(object):
+    """A thread safe token bucket for one process
+
+    :param float rate: Tokens added per second
+    :param float burst: (optional) Most tokens the bucket holds, which is how many calls can be
+                        made at once after a quiet period. Default: ``1``
+
+    Every call reserves its tokens in the order it arrives, even when they are not there yet, and
+    then sleeps until they are. Callers are served first come first served and can never starve
+    each other. :meth:`backlog` is how long a new call would wait behind them::
+
+        >>> bucket = TokenBucket(10)
+        >>> bucket.acquire()
+        True
+        >>> bucket.backlog()
+        0.1
+    """
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._lock = threading.Lock()
+        self._state = (self.burst, time.time())
+
+    def _locked(self):
+        return self._lock
+
+    def _load(self):
+        return self._state
+
+    def _save(self, state):
+        self._state = state
+
+    def _tokens(self, now):
+        tokens, updated = self._load()
+        return min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+    def reserve(self, count=1, timeout=None):
+        """Take `count` tokens and get the seconds until they are available. Returns ``None``
+        without taking anything if that is longer than `timeout`"""
+        with self._locked():
+            now = time.time()
+            tokens = self._tokens(now)
+            wait = max(0.0, (count - tokens) / self.rate)
+
+            if timeout is not None and wait > timeout:
+                return None
+
+            self._save((tokens - count, now))
+            return wait
+
+    def acquire(self, count=1, timeout=None):
+        """Wait for `count` tokens
+
+        :param integer count: (optional) Tokens to take. Default: ``1``
+        :param float timeout: (optional) Most seconds to wait. Default: ``None`` waits as long as it takes
+        :returns: ``False`` if the tokens would not be available within `timeout`
+        """
+        wait = self.reserve(count, timeout)
+        if wait is None:
+            return False
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return True
+
+    def backlog(self):
+        """Seconds a call made now would wait"""
+        with self._locked():
+            return max(0.0, (1 - self._tokens(time.time())) / self.rate)
+
+    def __repr__(self):
+        return '<%s %s/sec>' % (self.__class__.__name__, self.rate)
+
+
+class FileTokenBucket(TokenBucket):
+    """A :class:`TokenBucket` shared by every process on the host that opens the same `path`
+
+    :param string path: The file the bucket is kept in. It is created if it does not exist
+    :param float rate: Tokens added per second. Every process should use the same rate
+    :param float burst: (optional) Most tokens the bucket holds. Default: ``1``
+
+    The bucket is memory mapped from the file and changed while holding an exclusive
+    ``flock`` on it. Unix only.
+    """
+    def __init__(self, path, rate, burst=1):
+        super(FileTokenBucket, self).__init__(rate, burst)
+        self.path = path
+
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0644), 'r+b')
+
+        with self._flock():
+            # the first process to open the bucket fills it
+            if os.fstat(self._file.fileno()).st_size < _STATE.size:
+                self._file.write(_STATE.pack(self.burst, time.time()))
+                self._file.flush()
+
+        self._map = mmap.mmap(self._file.fileno(), _STATE.size)
+
+    @contextmanager
+    def _flock(self):
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def _locked(self):
+        # flock is per open file so threads sharing this one still need the thread lock
+        with self._lock:
+            with self._flock():
+                yield
+
+    def _load(self):
+        return _STATE.unpack(self._map[:_STATE.size])
+
+    def _save(self, state):
+        self._map[:_STATE.size] = _STATE.pack(*state)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class RateLimiter(object):
+    """Limit how fast requests are sent overall and per endpoint family
+
+    :param float rate: (optional) Requests per second across every endpoint. Default: ``None`` for no limit
+    :param float burst: (optional) Requests that can be sent at once after a quiet period. Default: ``1``
+    :param dict limits: (optional) Requests per second, or ``(rate, burst)`` tuples, by endpoint family
+                        (see :func:`aggcat.retry.endpoint_family`). Default: ``None``
+    :param string path: (optional) Share the limits with every process on the host that uses the same
+                        path. The buckets are kept in ``<path>.<family>`` files. Default: ``None`` limits
+                        this process only
+
+    Intuit throttles per consumer key, so give every client and process using a key the same limits.
+    Requests that have to wait are sent in the order they arrived::
+
+        >>> from aggcat.ratelimit import RateLimiter
+        >>> limiter = RateLimiter(20, limits={'transactions': 5}, path='/var/run/myapp/aggcat')
+        >>> client = AggcatClient(..., rate_limiter=limiter)
+    """
+    def __init__(self, rate=None, burst=1, limits=None, path=None):
+        self.path = path
+        self._all = self._bucket('all', rate, burst) if rate else None
+        self._families = {}
+
+        for family, limit in (limits or {}).iteritems():
+            family_rate, family_burst = limit if isinstance(limit, tuple) else (limit, 1)
+            self._families[family] = self._bucket(family, family_rate, family_burst)
+
+    def _bucket(self, name, rate, burst):
+        if self.path is None:
+            return TokenBucket(rate, burst)
+
+        return FileTokenBucket('%s.%s' % (self.path, name), rate, burst)
+
+    def _buckets(self, family):
+        return [b for b in (self._families.get(family), self._all) if b is not None]
+
+    def acquire(self, family=None):
+        """Wait until a request to an endpoint family can be sent
+
+        :returns: The seconds waited
+        """
+        start = time.time()
+
+        for bucket in self._buckets(family):
+            bucket.acquire()
+
+        return time.time() - start
+
+    def backlog(self, family=None):
+        """Seconds a request to an endpoint family made now would wait"""
+        return sum(bucket.backlog() for bucket in self._buckets(family))
+
+    def close(self):
+        for bucket in [self._all] + self._families.values():
+            if isinstance(bucket, FileTokenBucket):
+                bucket.close()
+
+    def __repr__(self):
+        return '<RateLimiter %s/sec %s>' % (self._all.rate if self._all else None, sorted(self._families))
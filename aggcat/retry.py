@@ -0,0 +1,236 @@
+from __future__ import absolute_import
+
+import time
+import random
+import threading
+from email.utils import parsedate_tz, mktime_tz
+
+from requests.exceptions import ConnectionError, Timeout
+
+from .exceptions import CircuitOpenError
+
+# circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# errors where the request may never have reached intuit or the answer never came back
+_network_errors = (ConnectionError, Timeout)
+
+# first path segments that are not their own endpoint family
+_FAMILIES = {'export': 'files'}
+
+
+def endpoint_family(path):
+    """The endpoint family of an API path, e.g. ``institutions``, ``accounts``,
+    ``transactions`` or ``logins``
+
+    ::
+
+        >>> endpoint_family('accounts/400004540560/transactions')
+        'transactions'
+        >>> endpoint_family('institutions/100000/logins')
+        'logins'
+    """
+    parts = path.strip('/').split('/')
+
+    if len(parts) > 2 and parts[2] in ('logins', 'transactions'):
+        return parts[2]
+
+    return _FAMILIES.get(parts[0], parts[0])
+
+
+def retry_after(value):
+    """Seconds to wait from a ``Retry-After`` header given in seconds or as an HTTP date.
+    ``None`` if there is no header or it can not be read"""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+
+    return max(0.0, mktime_tz(parsed) - time.time())
+
+
+class CircuitBreaker(object):
+    """Fail fast while an endpoint family keeps failing
+
+    :param string name: The endpoint family
+    :param integer failure_threshold: (optional) Failures in a row that open the circuit. Default: ``5``
+    :param float reset_timeout: (optional) Seconds the circuit stays open before one request is let
+                                through to test the endpoint again. Default: ``30``
+
+    While the circuit is open requests raise :class:`aggcat.exceptions.CircuitOpenError` without
+    being sent. After ``reset_timeout`` it is half open: the next request is sent and closes the
+    circuit if it succeeds or opens it again if it fails.
+    """
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Raise :class:`aggcat.exceptions.CircuitOpenError` unless a request can be sent"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+
+            now = time.time()
+            if now - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError('Requests to %s are failing. Retry in %.0f seconds' % (
+                    self.name, self.reset_timeout - (now - self.opened_at)))
+
+            # let this request through to test the endpoint and hold back the rest
+            self.state = HALF_OPEN
+            self.opened_at = now
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.time()
+
+    def __repr__(self):
+        return '<CircuitBreaker %s %s>' % (self.name, self.state)
+
+
+class RetryPolicy(object):
+    """When and how long to wait before requests are sent again
+
+    :param integer retries: (optional) Times a request is sent again after the first try. Default: ``3``
+    :param float backoff: (optional) Seconds the first wait is at most. It doubles with every retry. Default: ``0.5``
+    :param float max_backoff: (optional) Longest wait in seconds. A ``Retry-After`` longer than this
+                              is not waited for. Default: ``30``
+    :param methods: (optional) HTTP methods that are safe to send again. Default: ``('GET', 'DELETE')``
+    :param statuses: (optional) Status codes that are retried and count as failures of the endpoint.
+                     Default: ``(429, 500, 502, 503, 504)``
+    :param timeout: (optional) Seconds to wait for a connection and between bytes of the response,
+                    as a ``(connect, read)`` tuple or a single number. Default: ``(10, 300)``
+    :param integer failure_threshold: (optional) Failures in a row that open the circuit breaker of an
+                                      endpoint family. Default: ``5``
+    :param float reset_timeout: (optional) Seconds a circuit breaker stays open. Default: ``30``
+
+    Connection errors, timeouts and ``statuses`` are retried for idempotent ``methods`` only, so
+    adding a login with a ``POST`` is never sent twice. Waits are picked at random up to the
+    exponential backoff so clients that failed together do not retry together, and a
+    ``Retry-After`` header is obeyed. Every endpoint family (``institutions``, ``accounts``,
+    ``transactions``, ``logins``, ...) has a :class:`CircuitBreaker`::
+
+        >>> from aggcat.retry import RetryPolicy
+        >>> client = AggcatClient(..., retry=RetryPolicy(retries=5, timeout=(5, 60)))
+
+    ``RetryPolicy(retries=0)`` turns retries off.
+    """
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30, methods=('GET', 'DELETE'), statuses=(429, 500, 502, 503, 504), timeout=(10, 300), failure_threshold=5, reset_timeout=30):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.methods = frozenset(methods)
+        self.statuses = frozenset(statuses)
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, family):
+        """The :class:`CircuitBreaker` of an endpoint family"""
+        with self._lock:
+            if family not in self._breakers:
+                self._breakers[family] = CircuitBreaker(family, self.failure_threshold, self.reset_timeout)
+
+            return self._breakers[family]
+
+    def breakers(self):
+        """Every :class:`CircuitBreaker` created so far by endpoint family"""
+        with self._lock:
+            return dict(self._breakers)
+
+    def delay(self, method, attempt, response=None):
+        """Seconds to wait before sending a request again or ``None`` if it should not be.
+        `attempt` counts from ``0`` and `response` is ``None`` after a connection error"""
+        if attempt >= self.retries or method not in self.methods:
+            return None
+
+        if response is not None:
+            if response.status_code not in self.statuses:
+                return None
+
+            wait = retry_after(response.headers.get('retry-after'))
+            if wait is not None:
+                return wait if wait <= self.max_backoff else None
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def send(self, family, method, send):
+        """Call `send` until it returns a response that should not be retried
+
+        :param string family: The endpoint family from :func:`endpoint_family`
+        :param string method: The HTTP method
+        :param send: A function that sends the request and returns the ``requests.Response``
+        """
+        breaker = self.breaker(family)
+        attempt = 0
+
+        while True:
+            breaker.allow()
+
+            try:
+                response = send()
+            except _network_errors:
+                breaker.record_failure()
+
+                wait = self.delay(method, attempt)
+                if wait is None:
+                    raise
+            else:
+                if response.status_code in self.statuses:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                wait = self.delay(method, attempt, response)
+                if wait is None:
+                    return response
+
+                response.close()
+
+            time.sleep(wait)
+            attempt += 1
+
+    def __repr__(self):
+        return '<RetryPolicy %s retries of %s>' % (self.retries, ', '.join(sorted(self.methods)))
+
+
+_default_policy = None
+_default_policy_lock = threading.Lock()
+
+
+def default_retry_policy():
+    """The process wide :class:`RetryPolicy` used by clients that are not given one so
+    they share circuit breakers"""
+    global _default_policy
+
+    with _default_policy_lock:
+        if _default_policy is None:
+            _default_policy = RetryPolicy()
+
+    return _default_policy
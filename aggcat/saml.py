@@ -1,11 +1,25 @@
+from __future__ import absolute_import
+
 import base64
 import re
+import threading
 from datetime import datetime
 from datetime import timedelta
 from uuid import uuid4
 from hashlib import sha1
+from multiprocessing import Pool, cpu_count
+
+try:
+    import M2Crypto
+except ImportError:
+    M2Crypto = None
 
-import M2Crypto
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+except ImportError:
+    serialization = None
 
 # replace newlines before encrypting
 pattern = re.compile(r'>[\n\s]+<', re.I | re.M)
@@ -66,11 +80,125 @@ SAML_SIGNATURE = """
 SAML_SIGNATURE = re.sub(pattern, '><', SAML_SIGNATURE).strip()
 
 
+def _require(module, name):
+    if module is None:
+        raise ImportError('%s is required for this signer. Install it with: pip install %s' % (name, name))
+
+
+# loaded RSA keys by path so every client in the process shares them
+_keys = {}
+_keys_lock = threading.Lock()
+
+
+def load_key(private_key):
+    """Load an RSA private key with M2Crypto once per process"""
+    _require(M2Crypto, 'M2Crypto')
+
+    with _keys_lock:
+        if private_key not in _keys:
+            _keys[private_key] = M2Crypto.RSA.load_key(private_key)
+
+        return _keys[private_key]
+
+
+class Signer(object):
+    """Signs SAML assertions with an RSA private key using PKCS#1 v1.5 and SHA-1, the
+    ``rsa-sha1`` signature method Intuit expects. Subclasses load the key and sign with a
+    particular library
+
+    :param string private_key: The absolute path to the x509 private key
+    """
+    name = None
+
+    def __init__(self, private_key):
+        self.private_key = private_key
+        self.key = self._load(private_key)
+
+    def _load(self, private_key):
+        raise NotImplementedError
+
+    def sign(self, data):
+        """The raw RSA signature of the SHA-1 digest of `data`"""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.private_key)
+
+
+class M2CryptoSigner(Signer):
+    """Sign with M2Crypto. This is the default when M2Crypto is installed"""
+    name = 'm2crypto'
+
+    def _load(self, private_key):
+        return load_key(private_key)
+
+    def sign(self, data):
+        return self.key.sign(sha1(data).digest(), 'sha1')
+
+
+class CryptographySigner(Signer):
+    """Sign with `cryptography <https://cryptography.io>`_. Its OpenSSL calls release the GIL
+    so threads can sign at the same time"""
+    name = 'cryptography'
+
+    def _load(self, private_key):
+        _require(serialization, 'cryptography')
+
+        with open(private_key, 'rb') as f:
+            return serialization.load_pem_private_key(f.read(), None, default_backend())
+
+    def sign(self, data):
+        return self.key.sign(data, padding.PKCS1v15(), hashes.SHA1())
+
+
+# signer backends by name
+SIGNERS = {
+    M2CryptoSigner.name: M2CryptoSigner,
+    CryptographySigner.name: CryptographySigner,
+}
+
+# signers by backend and key path so every client in the process shares them
+_signers = {}
+_signers_lock = threading.Lock()
+
+
+def _default_signer():
+    if M2Crypto is not None:
+        return M2CryptoSigner.name
+
+    if serialization is not None:
+        return CryptographySigner.name
+
+    raise ImportError('M2Crypto or cryptography is required to sign SAML assertions. Install one with: pip install cryptography')
+
+
+def get_signer(private_key, signer=None):
+    """Get the :class:`Signer` for a private key, loading it once per process
+
+    :param string private_key: The absolute path to the x509 private key
+    :param signer: (optional) A backend name from ``SIGNERS`` or a :class:`Signer`, which is
+                   returned as is. Default: ``m2crypto`` if it is installed, otherwise ``cryptography``
+    """
+    if isinstance(signer, Signer):
+        return signer
+
+    name = signer or _default_signer()
+    if name not in SIGNERS:
+        raise ValueError('signer must be one of %s' % (sorted(SIGNERS),))
+
+    with _signers_lock:
+        if (name, private_key) not in _signers:
+            _signers[(name, private_key)] = SIGNERS[name](private_key)
+
+        return _signers[(name, private_key)]
+
+
 class SAML(object):
     """Create authentication assertions using SAML format"""
-    def __init__(self, private_key, saml_identity_provider_id, customer_id):
-        # RSA key file to use for signing
-        self.rsa = M2Crypto.RSA.load_key(private_key)
+    def __init__(self, private_key, saml_identity_provider_id, customer_id, signer=None):
+        # signs with the RSA key file
+        self.signer = get_signer(private_key, signer)
+        self.rsa = self.signer.key
         self.now = datetime.utcnow()
         self.iso_now = '%sZ' % self.now.isoformat()
         self.assertion_id = uuid4().hex
@@ -83,6 +211,9 @@ class SAML(object):
         # authentication url
         self.saml_url = 'https://oauth.intuit.com/oauth/v1/get_access_token_by_saml'
 
+        # an assertion signed ahead of time, see sign_assertions
+        self.presigned = None
+
     def _signed_digest_value(self):
         """Get the digest value of the SAML assertion"""
         assertion = SAML_ASSERTION % {
@@ -102,7 +233,7 @@ class SAML(object):
             'assertion_id': self.assertion_id,
             'signed_digest_value': signed_digest_value,
         }
-        return base64.b64encode(self.rsa.sign(sha1(signed_info).digest(), 'sha1'))
+        return base64.b64encode(self.signer.sign(signed_info))
 
     def refresh(self):
         """Refresh the values to generate another assertion"""
@@ -110,8 +241,17 @@ class SAML(object):
         self.iso_now = '%sZ' % self.now.isoformat()
         self.assertion_id = uuid4().hex
 
+    def use(self, assertion):
+        """Return `assertion`, signed ahead of time by :func:`sign_assertions`, from the
+        next call to :meth:`assertion` instead of signing one. It is only used once"""
+        self.presigned = assertion
+
     def assertion(self):
         """Generate and return a SAML assertion"""
+        if self.presigned is not None:
+            assertion, self.presigned = self.presigned, None
+            return assertion
+
         signed_digest_value = self._signed_digest_value()
         signed_signature_value = self._signed_signature_value(signed_digest_value)
 
@@ -134,3 +274,59 @@ class SAML(object):
         })
 
         return b64_assertion
+
+
+def _assertions(args):
+    """Sign the assertions of a chunk of customer ids in a worker process"""
+    private_key, saml_identity_provider_id, customer_ids, signer = args
+    return [SAML(private_key, saml_identity_provider_id, customer_id, signer).assertion() for customer_id in customer_ids]
+
+
+def sign_assertions(private_key, saml_identity_provider_id, customer_ids, signer=None, processes=None, chunksize=256):
+    """Sign SAML assertions for many customers at once on a pool of processes
+
+    :param string private_key: The absolute path to the x509 private key
+    :param string saml_identity_provider_id: The SAML identitity provider id given on the Intuit application page
+    :param customer_ids: An iterable of customer ids
+    :param signer: (optional) A backend name from ``SIGNERS``. Default: ``m2crypto`` if it is installed,
+                   otherwise ``cryptography``
+    :param integer processes: (optional) Number of worker processes. ``1`` signs in this process.
+                              Default: the number of CPUs
+    :param integer chunksize: (optional) Customer ids sent to a worker at a time. Default: ``256``
+    :returns: ``list`` of base64 encoded assertions in the same order as `customer_ids`
+
+    Signing is CPU bound so a single process signs one assertion at a time however many
+    threads ask. Each worker loads the key once and signs a chunk of customers::
+
+        >>> from aggcat.saml import sign_assertions
+        >>> assertions = sign_assertions('/path/to/x509/appname.key', 'provider_id', range(10000))
+
+    Assertions are only valid for 10 minutes so exchange them for OAuth tokens soon after. A client
+    sends its customer's assertion instead of signing one when it is passed as ``assertion``::
+
+        >>> clients = [
+        ...     AggcatClient(..., customer_id, ..., assertion=assertion)
+        ...     for customer_id, assertion in zip(range(10000), assertions)
+        ... ]
+    """
+    if isinstance(signer, Signer):
+        signer = signer.name
+
+    customer_ids = list(customer_ids)
+    chunks = [
+        (private_key, saml_identity_provider_id, customer_ids[i:i + chunksize], signer)
+        for i in xrange(0, len(customer_ids), chunksize)
+    ]
+
+    processes = min(processes or cpu_count(), len(chunks))
+    if processes <= 1:
+        results = map(_assertions, chunks)
+    else:
+        # load the key in every worker before the chunks arrive
+        pool = Pool(processes, get_signer, (private_key, signer))
+        try:
+            results = pool.map(_assertions, chunks, 1)
+        finally:
+            pool.terminate()
+
+    return [assertion for chunk in results for assertion in chunk]
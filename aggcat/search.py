@@ -0,0 +1,355 @@
+from __future__ import absolute_import
+
+import re
+import zlib
+import heapq
+import cPickle as pickle
+from itertools import izip
+from bisect import bisect_left, bisect_right
+
+from .parser import IterObjectify
+
+_word = re.compile(r'\w+', re.UNICODE)
+
+# parts of a home url that do not tell institutions apart
+_URL_STOPWORDS = frozenset([u'http', u'https', u'www', u'com', u'net', u'org', u'html', u'htm', u'index'])
+
+# fields that are tokenized and how much a match in each is worth
+NAME, URL = 0, 1
+_FIELD_WEIGHTS = (3.0, 1.0)
+
+# how much each kind of token match is worth
+_EXACT = 1.0
+_PREFIX = 0.75
+_FUZZY = 0.5
+_ID = 5.0
+
+# default number of words a query word expands to
+_MAX_EXPANSIONS = 100
+
+_FORMAT_VERSION = 1
+
+
+def _text(value):
+    if value is None:
+        return u''
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return value
+
+
+def _tokens(value):
+    return _word.findall(_text(value).lower())
+
+
+def _url_tokens(value):
+    return [t for t in _tokens(value) if t not in _URL_STOPWORDS]
+
+
+def _trigrams(token):
+    padded = u'$%s$' % token
+    return set(padded[i:i + 3] for i in xrange(len(padded) - 2))
+
+
+class SearchResult(object):
+    """An institution found by :meth:`InstitutionIndex.search`"""
+    __slots__ = ('institution_id', 'institution_name', 'home_url', 'score')
+
+    def __init__(self, institution_id, institution_name, home_url, score):
+        self.institution_id = institution_id
+        self.institution_name = institution_name
+        self.home_url = home_url
+        self.score = score
+
+    def __repr__(self):
+        return '<SearchResult %s %s>' % (self.institution_id, self.institution_name.encode('utf-8'))
+
+
+class InstitutionIndex(object):
+    """Search institutions by name, home url or id without scanning the whole list
+
+    :param institutions: An iterable of ``(institution_id, institution_name, home_url)`` tuples
+
+    Names and home urls are split into words. Every word is found exactly through a
+    dictionary, by prefix through a sorted vocabulary and, when a word has a typo, by
+    the trigrams it shares with the vocabulary. Every word of a query must match and
+    results are ranked by where and how well they matched::
+
+        >>> from aggcat.search import InstitutionIndex
+        >>> index = InstitutionIndex.from_xml(client.get_institutions().content.to_xml())
+        >>> index.search('chase', limit=3)
+        [<SearchResult 14554 Chase Bank Credit Card (Amazon.com)>,
+         <SearchResult 14910 Chase e-Funds Card>,
+         <SearchResult 13278 JP Morgan Chase Bank>]
+        >>> index.search('jp morgn')
+        [<SearchResult 13278 JP Morgan Chase Bank>]
+        >>> index.save('/var/lib/myapp/institutions.idx')
+
+    Building the index takes a second for the full institution list. Save it and
+    load it with :meth:`load` so it only has to be built when the list changes.
+    """
+    def __init__(self, institutions=()):
+        self._docs = []
+        self._ids = {}
+        words = {}
+
+        for institution_id, name, home_url in institutions:
+            doc = len(self._docs)
+            institution_id = _text(institution_id).strip()
+            self._docs.append((institution_id, _text(name), _text(home_url)))
+            self._ids[institution_id] = doc
+
+            for field, tokens in ((NAME, _tokens(name)), (URL, _url_tokens(home_url))):
+                for token in tokens:
+                    words.setdefault(token, ([], []))[field].append(doc)
+
+        self._vocab = sorted(words)
+        self._postings = ([], [])
+        for token in self._vocab:
+            for field in (NAME, URL):
+                self._postings[field].append(sorted(set(words[token][field])))
+
+        self._build_lookups()
+
+    def _build_lookups(self):
+        """Build what can be derived from the vocabulary and postings. These are
+        not saved since they are quick to rebuild"""
+        self._vocab_ids = dict((token, vid) for vid, token in enumerate(self._vocab))
+
+        # institutions each word is in, so the most common words are kept when expanding
+        self._doc_counts = [
+            len(self._postings[NAME][vid]) + len(self._postings[URL][vid])
+            for vid in xrange(len(self._vocab))
+        ]
+
+        # the most common words of every prefix that starts too many words. The vocabulary is
+        # sorted so the words of a prefix are one slice of it and only those prefixes are visited
+        self._top_prefixes = {}
+        stack = [(u'', 0, len(self._vocab))]
+        while stack:
+            prefix, start, stop = stack.pop()
+            if prefix:
+                self._top_prefixes[prefix] = self._most_common(start, stop, _MAX_EXPANSIONS)
+
+            vid = start
+            while vid < stop:
+                if len(self._vocab[vid]) == len(prefix):
+                    vid += 1
+                    continue
+
+                child = self._vocab[vid][:len(prefix) + 1]
+                end = bisect_right(self._vocab, child + u'\uffff', vid, stop)
+                if end - vid > _MAX_EXPANSIONS:
+                    stack.append((child, vid, end))
+                vid = end
+
+        self._doc_tokens = [([], []) for _ in self._docs]
+        for field in (NAME, URL):
+            for vid, docs in enumerate(self._postings[field]):
+                for doc in docs:
+                    self._doc_tokens[doc][field].append(vid)
+
+        self._grams = {}
+        self._gram_counts = []
+        for vid, token in enumerate(self._vocab):
+            grams = _trigrams(token)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(vid)
+
+    @classmethod
+    def from_xml(cls, source):
+        """Build an index from a :meth:`AggcatClient.get_institutions` response
+
+        :param source: The XML as a string or a file opened for reading. The institutions are
+                       streamed so the whole document is never in memory as a tree
+        """
+        def institutions():
+            for element in IterObjectify(source).iterelements():
+                yield (
+                    element.findtext('institutionId'),
+                    element.findtext('institutionName'),
+                    element.findtext('homeUrl')
+                )
+
+        return cls(institutions())
+
+    @classmethod
+    def from_cache(cls, cache):
+        """Build an index from an :class:`aggcat.cache.InstitutionCache`"""
+        return cls.from_xml(cache.to_xml())
+
+    def dumps(self):
+        """Serialize the index to a string"""
+        state = (_FORMAT_VERSION, self._docs, self._vocab, self._postings)
+        return zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def loads(cls, data):
+        """Load an index serialized with :meth:`dumps`"""
+        version, docs, vocab, postings = pickle.loads(zlib.decompress(data))
+
+        if version != _FORMAT_VERSION:
+            raise ValueError('Unsupported index format version %s' % version)
+
+        index = cls.__new__(cls)
+        index._docs = docs
+        index._ids = dict((doc[0], i) for i, doc in enumerate(docs))
+        index._vocab = vocab
+        index._postings = postings
+        index._build_lookups()
+
+        return index
+
+    def save(self, path):
+        """Write the index to a file"""
+        with open(path, 'wb') as f:
+            f.write(self.dumps())
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written with :meth:`save`"""
+        with open(path, 'rb') as f:
+            return cls.loads(f.read())
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _most_common(self, start, stop, n):
+        """The `n` vocabulary ids from `start` to `stop` in the most institutions, most
+        common first. Ties go to the first word"""
+        counts = izip(self._doc_counts[start:stop], xrange(-start, -stop, -1))
+        return [-vid for count, vid in heapq.nlargest(n, counts)]
+
+    def _prefix_matches(self, token, max_expansions):
+        """Vocabulary ids of the words that start with `token`. When there are more than
+        `max_expansions` the words in the most institutions are kept"""
+        top = self._top_prefixes.get(token)
+        if top is not None and max_expansions is not None and max_expansions <= len(top):
+            return top[:max_expansions]
+
+        matches = []
+        start = vid = bisect_left(self._vocab, token)
+
+        while vid < len(self._vocab) and self._vocab[vid].startswith(token):
+            if max_expansions is not None and len(matches) == max_expansions:
+                # the prefix has more words than a cap the lookup does not cover
+                stop = bisect_right(self._vocab, token + u'\uffff', vid)
+                return self._most_common(start, stop, max_expansions)
+
+            matches.append(vid)
+            vid += 1
+
+        return matches
+
+    def _fuzzy_matches(self, token, min_similarity, max_expansions):
+        """``(similarity, vid)`` of the words sharing enough trigrams with `token`"""
+        grams = _trigrams(token)
+        shared = {}
+
+        for gram in grams:
+            for vid in self._grams.get(gram, ()):
+                shared[vid] = shared.get(vid, 0) + 1
+
+        matches = []
+        for vid, count in shared.iteritems():
+            similarity = 2.0 * count / (len(grams) + self._gram_counts[vid])
+            if similarity >= min_similarity:
+                matches.append((similarity, vid))
+
+        matches.sort(reverse=True)
+        return matches[:max_expansions] if max_expansions is not None else matches
+
+    def _expand(self, token, fuzzy, min_similarity, max_expansions):
+        """Map of vocabulary id -> weight of the words a query word matches"""
+        weights = {}
+
+        for vid in self._prefix_matches(token, max_expansions):
+            weights[vid] = _PREFIX
+
+        exact = self._vocab_ids.get(token)
+        if exact is not None:
+            weights[exact] = _EXACT
+        elif fuzzy and len(token) >= 3:
+            for similarity, vid in self._fuzzy_matches(token, min_similarity, max_expansions):
+                weights[vid] = max(weights.get(vid, 0), _FUZZY * similarity)
+
+        return weights
+
+    def _score(self, doc, weights):
+        score = 0
+        for field in (NAME, URL):
+            for vid in self._doc_tokens[doc][field]:
+                weight = weights.get(vid)
+                if weight is not None:
+                    score = max(score, weight * _FIELD_WEIGHTS[field])
+        return score
+
+    def search(self, query, limit=10, fuzzy=True, min_similarity=0.4, max_expansions=_MAX_EXPANSIONS):
+        """Find institutions matching every word of `query`
+
+        :param string query: Words from the name or home url of an institution, or its id
+        :param integer limit: (optional) Maximum number of results. ``None`` for all. Default: ``10``
+        :param boolean fuzzy: (optional) Match words with typos. Default: ``True``
+        :param float min_similarity: (optional) Dice coefficient of the trigrams of a word and a
+                                     query word needed for a fuzzy match. Default: ``0.4``
+        :param integer max_expansions: (optional) Maximum number of words a prefix or fuzzy match
+                                       of a query word expands to. ``None`` for all. Default: ``100``
+        :returns: ``list`` of :class:`SearchResult` ordered by score
+
+        ``max_expansions`` keeps short prefixes fast but is lossy. When more words start with a
+        query word than that, only the words in the most institutions are matched and fuzzy
+        matches keep the most similar words. Institutions that only have the other words are
+        not found. Pass ``None`` when every match is needed, such as when listing all results.
+        """
+        tokens = _tokens(query)
+        if not tokens:
+            return []
+
+        expanded = []
+        for token in tokens:
+            weights = self._expand(token, fuzzy, min_similarity, max_expansions)
+            id_doc = self._ids.get(token)
+            size = sum(len(self._postings[f][vid]) for vid in weights for f in (NAME, URL))
+            expanded.append((size, token, weights, id_doc))
+
+        # start from the rarest word so later words only look at a few candidates
+        expanded.sort(key=lambda e: e[0])
+
+        scores = None
+        for size, token, weights, id_doc in expanded:
+            if scores is None:
+                candidates = set()
+                for vid in weights:
+                    candidates.update(self._postings[NAME][vid])
+                    candidates.update(self._postings[URL][vid])
+                if id_doc is not None:
+                    candidates.add(id_doc)
+            else:
+                candidates = scores.keys()
+
+            next_scores = {}
+            for doc in candidates:
+                score = _ID if doc == id_doc else self._score(doc, weights)
+                if score:
+                    next_scores[doc] = (scores[doc] if scores else 0) + score
+
+            scores = next_scores
+            if not scores:
+                return []
+
+        # names that are the query, or start with it, come first
+        normalized = u' '.join(tokens)
+        results = []
+        for doc, score in scores.iteritems():
+            institution_id, name, home_url = self._docs[doc]
+            name_tokens = u' '.join(_tokens(name))
+            if name_tokens == normalized:
+                score += _FIELD_WEIGHTS[NAME]
+            elif name_tokens.startswith(normalized):
+                score += 1
+            results.append(SearchResult(institution_id, name, home_url, score))
+
+        results.sort(key=lambda r: (-r.score, len(r.institution_name), r.institution_name))
+
+        return results[:limit] if limit is not None else results
@@ -0,0 +1,304 @@
+from __future__ import absolute_import
+
+import sqlite3
+import threading
+from hashlib import sha1
+from datetime import datetime, date, timedelta
+
+from .batch import fetch_transaction_history, _transaction_date
+
+
+class Store(object):
+    """Where :class:`TransactionSync` keeps its high-water marks and recently seen
+    transactions. Subclass this to keep them somewhere other than SQLite."""
+    def get_mark(self, account_id):
+        """The date (YYYY-MM-DD) an account was last synced through or ``None``"""
+        raise NotImplementedError
+
+    def set_mark(self, account_id, synced_through):
+        """Set the date (YYYY-MM-DD) an account was synced through"""
+        raise NotImplementedError
+
+    def get_transactions(self, account_id, since):
+        """Get a ``dict`` of ``transaction_id`` -> :class:`StoredTransaction` for the
+        transactions of an account dated on or after `since` (YYYY-MM-DD) and the
+        transactions without a date, which are matched by id alone"""
+        raise NotImplementedError
+
+    def put_transactions(self, account_id, transactions):
+        """Insert or replace a list of :class:`StoredTransaction`"""
+        raise NotImplementedError
+
+    def delete_transactions(self, account_id, transaction_ids):
+        """Delete transactions by id"""
+        raise NotImplementedError
+
+    def prune(self, account_id, before):
+        """Forget the transactions of an account dated before `before` (YYYY-MM-DD). Transactions
+        without a date are kept"""
+        raise NotImplementedError
+
+
+class StoredTransaction(object):
+    """What the sync remembers about a transaction"""
+    __slots__ = ('transaction_id', 'date', 'fingerprint', 'pending', 'match_key')
+
+    def __init__(self, transaction_id, date, fingerprint, pending, match_key):
+        self.transaction_id = transaction_id
+        self.date = date
+        self.fingerprint = fingerprint
+        self.pending = pending
+        self.match_key = match_key
+
+
+class SQLiteStore(Store):
+    """Keep sync state in a SQLite database
+
+    :param string path: (optional) Path to the database file. Default: ``aggcat_sync.db`` in the current
+                        working directory. Pass an absolute path in anything but a quick test
+    """
+    def __init__(self, path='aggcat_sync.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS marks (
+                account_id TEXT PRIMARY KEY,
+                synced_through TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS transactions (
+                account_id TEXT NOT NULL,
+                transaction_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                pending INTEGER NOT NULL,
+                match_key TEXT,
+                PRIMARY KEY (account_id, transaction_id)
+            );
+            CREATE INDEX IF NOT EXISTS transactions_date ON transactions (account_id, date);
+        """)
+
+    def get_mark(self, account_id):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT synced_through FROM marks WHERE account_id = ?',
+                (str(account_id),)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def set_mark(self, account_id, synced_through):
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO marks (account_id, synced_through) VALUES (?, ?)',
+                    (str(account_id), synced_through)
+                )
+
+    def get_transactions(self, account_id, since):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT transaction_id, date, fingerprint, pending, match_key FROM transactions '
+                "WHERE account_id = ? AND (date >= ? OR date = '')",
+                (str(account_id), since)
+            ).fetchall()
+
+        return dict((row[0], StoredTransaction(row[0], row[1], row[2], bool(row[3]), row[4])) for row in rows)
+
+    def put_transactions(self, account_id, transactions):
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO transactions '
+                    '(account_id, transaction_id, date, fingerprint, pending, match_key) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(str(account_id), t.transaction_id, t.date, t.fingerprint, int(t.pending), t.match_key) for t in transactions]
+                )
+
+    def delete_transactions(self, account_id, transaction_ids):
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    'DELETE FROM transactions WHERE account_id = ? AND transaction_id = ?',
+                    [(str(account_id), transaction_id) for transaction_id in transaction_ids]
+                )
+
+    def prune(self, account_id, before):
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM transactions WHERE account_id = ? AND date < ? AND date != ''",
+                    (str(account_id), before)
+                )
+
+    def close(self):
+        self._db.close()
+
+
+class Change(object):
+    """A change found by :class:`TransactionSync`
+
+    ``kind`` is one of ``insert``, ``update`` or ``posted``. For ``posted`` changes
+    ``previous_id`` is the id the transaction had while it was pending since Intuit
+    gives a transaction a new id once it posts.
+    """
+    __slots__ = ('kind', 'transaction', 'previous_id')
+
+    INSERT = 'insert'
+    UPDATE = 'update'
+    POSTED = 'posted'
+
+    def __init__(self, kind, transaction, previous_id=None):
+        self.kind = kind
+        self.transaction = transaction
+        self.previous_id = previous_id
+
+    def __repr__(self):
+        return '<Change %s %s>' % (self.kind, getattr(self.transaction, 'id', None))
+
+
+def _attributes(obj):
+    """The public attributes set on an objectified object"""
+    names = list(getattr(type(obj), '__slots__', ())) + list(getattr(obj, '__dict__', {}).keys())
+
+    for name in sorted(set(names)):
+        if name.startswith('_') or name == 'to_xml' or not hasattr(obj, name):
+            continue
+        yield name, getattr(obj, name)
+
+
+def _fingerprint(obj):
+    """Hash of every value in an objectified transaction"""
+    digest = sha1()
+
+    def walk(o):
+        for name, value in _attributes(o):
+            digest.update(name)
+            if value is None or isinstance(value, basestring):
+                digest.update(repr(value))
+            else:
+                walk(value)
+
+        # repeated child elements are only in the list
+        for index, item in enumerate(getattr(o, '_list', ())):
+            digest.update('[%d]' % index)
+            if item is None or isinstance(item, basestring):
+                digest.update(repr(item))
+            else:
+                walk(item)
+
+    walk(obj)
+
+    return digest.hexdigest()
+
+
+def _is_pending(transaction):
+    return getattr(transaction, 'pending', None) == 'true'
+
+
+def _match_key(transaction):
+    """Used to find the posted version of a pending transaction"""
+    payee = getattr(transaction, 'payee_name', None) or getattr(transaction, 'description', None)
+    return '%s|%s' % (getattr(transaction, 'amount', None), payee)
+
+
+class TransactionSync(object):
+    """Only get the transactions that changed since the last sync
+
+    :param client: An :class:`AggcatClient`
+    :param store: (optional) A :class:`Store`. Default: a :class:`SQLiteStore` at ``aggcat_sync.db``
+                  in the current working directory
+    :param integer overlap_days: (optional) Days before the last sync to fetch again so late
+                                 changes and pending transactions are picked up. Default: ``7``
+    :param integer window_days: (optional) Passed to :func:`aggcat.batch.fetch_transaction_history`
+                                for the first sync of an account. Default: ``90``
+
+    Each account keeps a high-water mark of the day it was synced through. A sync fetches
+    from ``overlap_days`` before the mark, compares what comes back with the transactions
+    remembered from the last sync and returns the changes::
+
+        >>> from aggcat.sync import TransactionSync, SQLiteStore
+        >>> sync = TransactionSync(client, SQLiteStore('/var/lib/myapp/sync.db'))
+        >>> for change in sync.sync(400004540560, start_date='2013-01-01'):
+                print change.kind, change.transaction.id, change.transaction.amount
+        insert 400189790351 -8.1
+        ...
+        >>> sync.sync(400004540560)
+        [<Change posted 400190413932>]
+
+    Transactions older than the overlap are forgotten so the store only holds recent ids.
+    """
+    def __init__(self, client, store=None, overlap_days=7, window_days=90):
+        self.client = client
+        self.store = store if store is not None else SQLiteStore()
+        self.overlap_days = overlap_days
+        self.window_days = window_days
+
+    def _start_date(self, account_id, start_date):
+        mark = self.store.get_mark(account_id)
+
+        if mark is None:
+            if start_date is None:
+                raise ValueError('A start_date is required the first time account %s is synced' % account_id)
+            return start_date
+
+        start = datetime.strptime(mark, '%Y-%m-%d').date() - timedelta(days=self.overlap_days)
+        return start.strftime('%Y-%m-%d')
+
+    def sync(self, account_id, start_date=None, end_date=None):
+        """Sync an account and return a ``list`` of :class:`Change`
+
+        :param integer account_id: the id of an account retrieved from :meth:`get_login_accounts`
+            or :meth:`get_customer_accounts`.
+        :param string start_date: (optional) Where to start the first sync of an account in the format
+            YYYY-MM-DD. Ignored once the account has been synced.
+        :param string end_date: (optional) the date to sync through in the format YYYY-MM-DD. Default: today
+        """
+        start_date = self._start_date(account_id, start_date)
+        end_date = end_date or date.today().strftime('%Y-%m-%d')
+
+        known = self.store.get_transactions(account_id, start_date)
+        changes = []
+        inserts = []
+        seen = []
+
+        for transaction in fetch_transaction_history(self.client, account_id, start_date, end_date, self.window_days):
+            stored = StoredTransaction(
+                transaction.id,
+                _transaction_date(transaction)[:10],
+                _fingerprint(transaction),
+                _is_pending(transaction),
+                _match_key(transaction)
+            )
+            seen.append(stored)
+            previous = known.pop(stored.transaction_id, None)
+
+            if previous is None:
+                inserts.append((stored, transaction))
+            elif previous.pending and not stored.pending:
+                changes.append(Change(Change.POSTED, transaction))
+            elif previous.fingerprint != stored.fingerprint:
+                changes.append(Change(Change.UPDATE, transaction))
+
+        # pending transactions that disappeared have probably posted under a new id
+        disappeared = {}
+        for previous in known.itervalues():
+            if previous.pending:
+                disappeared.setdefault(previous.match_key, []).append(previous.transaction_id)
+
+        for stored, transaction in inserts:
+            candidates = disappeared.get(stored.match_key)
+            if candidates and not stored.pending:
+                changes.append(Change(Change.POSTED, transaction, candidates.pop(0)))
+            else:
+                changes.append(Change(Change.INSERT, transaction))
+
+        self.store.put_transactions(account_id, seen)
+        # undated transactions are not pruned by date so forget them once they stop coming back
+        self.store.delete_transactions(account_id, [t.transaction_id for t in known.itervalues() if t.pending or not t.date])
+
+        # move the mark and forget what the next sync will not fetch again
+        self.store.set_mark(account_id, end_date)
+        mark = datetime.strptime(end_date, '%Y-%m-%d').date() - timedelta(days=self.overlap_days)
+        self.store.prune(account_id, mark.strftime('%Y-%m-%d'))
+
+        return changes
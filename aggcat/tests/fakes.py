@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+
+from ..client import AggcatClient
+from ..metrics import ClientMetrics, MetricsRegistry
+
+KEY = 'aggcat/tests/data/test.key'
+
+TOKENS = 'oauth_token=token&oauth_token_secret=secret'
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, headers=None, content=''):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = content
+        self.text = content
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Sender(object):
+    """Return or raise the queued outcomes one call at a time"""
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class FakeSession(object):
+    """An OAuth session that records what it is asked to send"""
+    def __init__(self, *outcomes):
+        self.send = Sender(*outcomes)
+        self.requests = []
+
+    def _request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs.get('timeout')))
+        return self.send()
+
+    def get(self, url, **kwargs):
+        return self._request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._request('POST', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._request('DELETE', url, **kwargs)
+
+
+class FakeTransport(object):
+    """A transport that answers every token exchange and hands clients `session`
+    instead of the OAuth session they mount"""
+    def __init__(self, session=None):
+        self.session = session
+        self.assertions = []
+
+    def post(self, url, data=None, **kwargs):
+        self.assertions.append(data['saml_assertion'])
+        return FakeResponse(200, content=TOKENS)
+
+    def mount(self, session):
+        return self.session if self.session is not None else session
+
+
+def fake_client(*outcomes, **kwargs):
+    """An :class:`AggcatClient` built by its constructor whose token exchange is answered
+    by a :class:`FakeTransport` and whose requests return or raise `outcomes`. Pass
+    ``session`` to send the requests somewhere else. The other keyword arguments go to
+    the constructor"""
+    session = kwargs.pop('session', None)
+    if session is None:
+        session = FakeSession(*outcomes)
+
+    kwargs.setdefault('transport', FakeTransport(session))
+    kwargs.setdefault('metrics', ClientMetrics(MetricsRegistry()))
+
+    client = AggcatClient('key', 'secret', 'provider', 1234, KEY, **kwargs)
+    client.base_url = 'https://localhost/v1'
+    return client
@@ -0,0 +1,128 @@
+from __future__ import absolute_import
+
+import inspect
+import threading
+
+from .. import async_client
+from ..async_client import AsyncAggcatClient
+from ..client import AggcatClient
+from ..exceptions import HTTPError
+from ..transport import Transport
+
+
+class FakeTokens(object):
+    def __init__(self):
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+class StubClient(object):
+    """Answers every endpoint with its name, arguments and the thread it ran on"""
+    customer_id = 'customer'
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.tokens = FakeTokens()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def close(self):
+        self.tokens.stop()
+
+    def get_account(self, account_id):
+        self.started.set()
+        self.release.wait(5)
+        return ('get_account', account_id, threading.current_thread().name)
+
+    def get_account_transactions(self, account_id, start_date, end_date=None):
+        return ('get_account_transactions', account_id, start_date, end_date)
+
+    def delete_account(self, account_id):
+        raise HTTPError('Status Code: 404, Response missing')
+
+
+class TestAsyncClient(object):
+    """Test the thread pool client"""
+    def setup(self):
+        self.original = async_client.AggcatClient
+        async_client.AggcatClient = StubClient
+        self.client = AsyncAggcatClient('key', 'secret', 'provider', 'customer', 'test.key', workers=4)
+
+    def teardown(self):
+        async_client.AggcatClient = self.original
+        self.client.pool.terminate()
+
+    def test_init(self):
+        """Async Client Test: The client gets a connection pool sized to the workers"""
+        transport = self.client.client.kwargs['transport']
+
+        assert isinstance(transport, Transport)
+        assert transport.pool_maxsize == 4
+        assert self.client.client.args == ('key', 'secret', 'provider', 'customer', 'test.key')
+        assert 'workers' not in self.client.client.kwargs
+
+        transport = Transport()
+        client = AsyncAggcatClient('key', 'secret', 'provider', 'customer', 'test.key', transport=transport)
+        assert client.client.kwargs['transport'] is transport
+        client.pool.terminate()
+
+    def test_endpoints(self):
+        """Async Client Test: Every public client method has a background version"""
+        methods = [
+            name for name, _ in inspect.getmembers(AggcatClient, inspect.ismethod)
+            if not name.startswith('_') and name != 'invalidate_credential_fields'
+        ]
+
+        for name in methods:
+            assert hasattr(AsyncAggcatClient, name), name
+
+    def test_background(self):
+        """Async Client Test: Requests run on worker threads and return their results"""
+        self.client.client.release.clear()
+        result = self.client.get_account(1234)
+
+        # the call returns while the request is still running
+        assert self.client.client.started.wait(5)
+        assert not result.ready()
+
+        self.client.client.release.set()
+        name, account_id, thread = result.get(5)
+
+        assert (name, account_id) == ('get_account', 1234)
+        assert thread != threading.current_thread().name
+
+    def test_arguments(self):
+        """Async Client Test: Positional and keyword arguments are passed through"""
+        result = self.client.get_account_transactions(1234, '2013-08-01', end_date='2013-08-10')
+
+        assert result.get(5) == ('get_account_transactions', 1234, '2013-08-01', '2013-08-10')
+
+    def test_errors(self):
+        """Async Client Test: Errors are raised by get()"""
+        result = self.client.delete_account(1234)
+        result.wait(5)
+
+        assert not result.successful()
+        try:
+            result.get()
+        except HTTPError as e:
+            assert '404' in str(e)
+        else:
+            assert False, 'the error of the request should be raised'
+
+    def test_close(self):
+        """Async Client Test: Closing waits for requests in flight and stops token refreshes"""
+        self.client.client.release.clear()
+        result = self.client.get_account(1234)
+        assert self.client.client.started.wait(5)
+
+        threading.Timer(0.05, self.client.client.release.set).start()
+        self.client.close()
+
+        assert result.ready()
+        assert result.get()[0] == 'get_account'
+        assert self.client.client.tokens.stopped
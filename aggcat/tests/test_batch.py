@@ -0,0 +1,110 @@
+from __future__ import absolute_import
+
+import time
+import threading
+from datetime import datetime, timedelta
+
+from ..batch import fetch_transactions, fetch_transaction_history, date_windows
+from ..exceptions import HTTPError
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get_account_transactions(self, account_id, start_date, end_date=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(0.02)
+
+        with self.lock:
+            self.in_flight -= 1
+
+        if account_id == 'bad':
+            raise HTTPError('Status Code: 404')
+
+        return (account_id, start_date, end_date)
+
+
+class Transaction(object):
+    def __init__(self, id, posted_date):
+        self.id = id
+        self.posted_date = posted_date
+
+
+class Response(object):
+    def __init__(self, content):
+        self.content = content
+
+
+class HistoryClient(object):
+    def __init__(self, transactions):
+        self.transactions = transactions
+        self.windows = []
+
+    def get_account_transactions(self, account_id, start_date, end_date=None, stream=False):
+        self.windows.append((start_date, end_date))
+
+        # timezones pull in the day before the window and the order is not by date
+        start = (datetime.strptime(start_date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+        return Response(iter(reversed([
+            t for t in self.transactions
+            if start <= t.posted_date[:10] <= end_date
+        ])))
+
+
+class TestBatch(object):
+    """Test batch transaction fetching"""
+    def test_results(self):
+        """Batch Test: Every account gets a result and errors do not stop the batch"""
+        client = FakeClient()
+        accounts = [(i, '2013-01-01', '2013-02-01') for i in range(10)] + [('bad', '2013-01-01')]
+
+        results = dict((r.account_id, r) for r in fetch_transactions(client, accounts, concurrency=3))
+
+        assert len(results) == 11
+        assert results[3].ok
+        assert results[3].response == (3, '2013-01-01', '2013-02-01')
+        assert not results['bad'].ok
+        assert isinstance(results['bad'].error, HTTPError)
+        assert results['bad'].end_date is None
+        assert client.max_in_flight <= 3
+
+    def test_rate_limit(self):
+        """Batch Test: Requests are spaced out by the rate limit"""
+        client = FakeClient()
+        accounts = [(i, '2013-01-01') for i in range(5)]
+
+        start = time.time()
+        list(fetch_transactions(client, accounts, concurrency=5, rate_limit=50))
+
+        assert time.time() - start >= 4 / 50.0
+
+    def test_date_windows(self):
+        """Batch Test: Date ranges are split into consecutive windows"""
+        assert date_windows('2013-01-01', '2013-01-10', 5) == [
+            ('2013-01-01', '2013-01-05'),
+            ('2013-01-06', '2013-01-10'),
+        ]
+        assert date_windows('2013-01-01', '2013-01-01', 5) == [('2013-01-01', '2013-01-01')]
+        assert date_windows('2013-01-02', '2013-01-01', 5) == []
+
+    def test_history(self):
+        """Batch Test: Transaction history is de-duplicated and ordered by date"""
+        transactions = [
+            Transaction('1', '2013-01-01T00:00:00-07:00'),
+            Transaction('2', '2013-01-05T00:00:00-07:00'),
+            Transaction('3', '2013-01-06T00:00:00-07:00'),
+            Transaction('4', '2013-01-12T00:00:00-07:00'),
+        ]
+        client = HistoryClient(transactions)
+
+        # transaction 2 comes back in the first and second window
+        history = list(fetch_transaction_history(client, 1, '2013-01-01', '2013-01-12', window_days=5))
+
+        assert [t.id for t in history] == ['1', '2', '3', '4']
+        assert len(client.windows) == 3
@@ -0,0 +1,260 @@
+from __future__ import absolute_import
+
+import threading
+
+from nose.tools import raises
+
+from ..cache import InstitutionCache, TTLCache
+from ..client import AggcatClient, AggCatResponse
+from ..exceptions import HTTPError
+from ..parser import IterObjectify
+
+INSTITUTIONS = (
+    '<Institutions xmlns="http://schema.intuit.com/platform/fdatafeed/institution/v1">'
+    '<institution><institutionId>13278</institutionId><institutionName>JP Morgan Chase Bank</institutionName>'
+    '<homeUrl>https://www.chase.com/</homeUrl></institution>'
+    '<institution><institutionId>14554</institutionId><institutionName>Chase Bank Credit Card (Amazon.com)</institutionName>'
+    '<homeUrl>https://www.chase.com/</homeUrl></institution>'
+    '<institution><institutionId>13718</institutionId><institutionName>Fox Chase Bank</institutionName>'
+    '<homeUrl>https://www.foxchasebank.com/</homeUrl></institution>'
+    '</Institutions>'
+)
+
+DETAILS = (
+    '<InstitutionDetail xmlns="http://schema.intuit.com/platform/fdatafeed/institution/v1">'
+    '<institutionId>13278</institutionId><institutionName>JP Morgan Chase Bank</institutionName>'
+    '<address><city>Louisville</city></address>'
+    '<keys><key><name>usr_name</name></key><key><name>usr_password</name></key></keys>'
+    '</InstitutionDetail>'
+)
+
+CREDENTIAL_DETAILS = (
+    '<InstitutionDetail xmlns="http://schema.intuit.com/platform/fdatafeed/institution/v1">'
+    '<institutionId>100000</institutionId><address><city>Mountain View</city></address><keys>'
+    '<key><name>Banking Password</name><displayOrder>2</displayOrder><displayFlag>true</displayFlag></key>'
+    '<key><name>Banking Userid</name><displayOrder>1</displayOrder><displayFlag>true</displayFlag></key>'
+    '<key><name>Hidden</name><displayOrder>3</displayOrder><displayFlag>false</displayFlag></key>'
+    '</keys></InstitutionDetail>'
+)
+
+
+class FakeClient(object):
+    objectify = True
+    lazy = False
+    retain = 'xml'
+    _response = AggcatClient.__dict__['_response']
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+        self.status_code = None
+        self.started = threading.Event()
+        self.gate = None
+
+    def _make_request(self, path, headers={}, stream=False, raw=False):
+        self.requests.append((path, headers))
+
+        if path.startswith('institutions/'):
+            assert raw and not stream
+            return AggCatResponse(200, {}, DETAILS)
+
+        # hold the download until the test lets it go
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait()
+
+        if self.status_code is not None:
+            r = AggCatResponse(self.status_code, {}, IterObjectify(''))
+        elif headers:
+            r = AggCatResponse(304, {}, IterObjectify(''))
+        else:
+            r = AggCatResponse(200, {'etag': '"v1"'}, IterObjectify(INSTITUTIONS))
+
+        self.responses.append(r)
+        return r
+
+
+class TestInstitutionCache(object):
+    """Test the institution cache"""
+    def setup(self):
+        self.client = FakeClient()
+        self.cache = InstitutionCache(self.client, ':memory:')
+
+    def test_get(self):
+        """Cache Test: Institutions are downloaded once and found by id"""
+        assert self.cache.get(13278).institution_name == 'JP Morgan Chase Bank'
+        assert self.cache.get('14554').institution_name == 'Chase Bank Credit Card (Amazon.com)'
+        assert self.cache.get(1) is None
+        assert len(self.client.requests) == 1
+
+    def test_search_prefix(self):
+        """Cache Test: Institutions are found by name prefix"""
+        assert [i.institution_id for i in self.cache.search_prefix('CHASE')] == ['14554']
+        assert [i.institution_id for i in self.cache.search_prefix('')] == ['14554', '13718', '13278']
+        assert len(self.cache.search_prefix('', limit=1)) == 1
+
+    def test_conditional_refresh(self):
+        """Cache Test: Stale institution lists are refreshed with a conditional request"""
+        self.cache.refresh()
+        self.cache.ttl = -1
+
+        assert self.cache.refresh() is False
+        assert self.client.requests[-1] == ('institutions', {'If-None-Match': '"v1"'})
+        assert len(self.cache.institutions()) == 3
+        assert all(r.content.source.closed for r in self.client.responses)
+
+    def test_background_refresh(self):
+        """Cache Test: A stale list is served while it is refreshed in the background"""
+        self.cache.get(13278)
+        self.cache.ttl = -1
+        self.client.gate = threading.Event()
+
+        assert self.cache.get(14554).institution_name == 'Chase Bank Credit Card (Amazon.com)'
+        assert self.client.started.wait(5)
+        assert len(self.cache.institutions()) == 3
+
+        self.client.gate.set()
+        self.cache._thread.join()
+
+        assert len(self.client.requests) == 2
+        assert self.client.requests[-1] == ('institutions', {'If-None-Match': '"v1"'})
+
+    def test_stale_refresh_error(self):
+        """Cache Test: A failed refresh keeps serving the stale list and waits before trying again"""
+        cache = InstitutionCache(self.client, ':memory:', background_refresh=False)
+        cache.get(13278)
+        cache.ttl = -1
+        self.client.status_code = 500
+
+        assert cache.get(13278).institution_name == 'JP Morgan Chase Bank'
+        assert cache.get(13718).institution_name == 'Fox Chase Bank'
+        assert len(self.client.requests) == 2
+
+        cache.retry_interval = 0
+        cache._retry_at = 0
+        cache.get(13278)
+        assert len(self.client.requests) == 3
+
+    @raises(HTTPError)
+    def test_refresh_error(self):
+        """Cache Test: Refreshing raises HTTPError for an error status without a body"""
+        self.client.status_code = 401
+
+        try:
+            self.cache.refresh()
+        finally:
+            assert self.client.responses[-1].content.source.closed
+
+    def test_institution_details(self):
+        """Cache Test: Institution details are cached"""
+        r = self.cache.get_institution_details(13278)
+        cached = self.cache.get_institution_details(13278)
+
+        assert len(self.client.requests) == 1
+        assert cached.content.to_xml() == DETAILS
+        assert cached.content.institution_name == r.content.institution_name
+
+        self.cache.invalidate(13278)
+        self.cache.get_institution_details(13278)
+
+        assert len(self.client.requests) == 2
+
+    def test_institution_details_retain_none(self):
+        """Cache Test: Institution details are cached when the client retains nothing"""
+        self.client.retain = 'none'
+
+        r = self.cache.get_institution_details(13278)
+        cached = self.cache.get_institution_details(13278)
+
+        assert len(self.client.requests) == 1
+        assert r.content.institution_name == 'JP Morgan Chase Bank'
+        assert cached.content.institution_name == r.content.institution_name
+        assert cached.content.address.city == 'Louisville'
+
+
+class CredentialFieldsClient(AggcatClient):
+    """Client that counts institution detail requests instead of making them"""
+    def __init__(self, credential_fields_cache):
+        self.credential_fields_cache = credential_fields_cache
+        self.requests = 0
+        self.responses = []
+        self.status_code = 200
+
+    def _make_request(self, path, stream=False):
+        assert path == 'institutions/100000' and stream
+        self.requests += 1
+
+        if self.status_code == 200:
+            r = AggCatResponse(200, {}, IterObjectify(CREDENTIAL_DETAILS))
+        else:
+            r = AggCatResponse(self.status_code, {}, IterObjectify('<Status><errorInfo></errorInfo></Status>'))
+
+        self.responses.append(r)
+        return r
+
+
+class TestCredentialFields(object):
+    """Test caching credential fields"""
+    def setup(self):
+        self.cache = TTLCache()
+        self.client = CredentialFieldsClient(self.cache)
+
+    def test_cached(self):
+        """Credential Fields Test: Fields are fetched once per institution and shared between clients"""
+        fields = self.client.get_credential_fields(100000)
+        assert [f['name'] for f in fields] == ['Banking Userid', 'Banking Password']
+
+        other = CredentialFieldsClient(self.cache)
+        assert other.get_credential_fields('100000') == fields
+        assert self.client.requests == 1 and other.requests == 0
+
+        # callers can not change what is cached
+        fields[0]['name'] = 'changed'
+        assert self.client.get_credential_fields(100000)[0]['name'] == 'Banking Userid'
+
+    def test_validate_credentials(self):
+        """Credential Fields Test: Validating credentials uses the cached fields"""
+        self.client._validate_credentials(100000, **{'Banking Userid': 'demo', 'Banking Password': 'go'})
+        self.client._validate_credentials(100000, **{'Banking Userid': 'demo', 'Banking Password': 'go'})
+        assert self.client.requests == 1
+
+        try:
+            self.client._validate_credentials(100000, **{'Banking Userid': 'demo'})
+        except ValueError:
+            pass
+        else:
+            assert False, 'missing credentials should raise ValueError'
+
+    def test_expire_and_invalidate(self):
+        """Credential Fields Test: Fields are fetched again once expired or invalidated"""
+        self.client.get_credential_fields(100000)
+        self.client.invalidate_credential_fields(100000)
+        self.client.get_credential_fields(100000)
+        assert self.client.requests == 2
+
+        self.cache.ttl = -1
+        self.client.get_credential_fields(100000)
+        assert self.client.requests == 3
+        assert len(self.cache) == 1
+
+        self.client.invalidate_credential_fields()
+        assert len(self.cache) == 0
+
+    def test_error_not_cached(self):
+        """Credential Fields Test: Error responses raise HTTPError and are never cached"""
+        self.client.status_code = 401
+
+        for _ in xrange(2):
+            try:
+                self.client.get_credential_fields(100000)
+            except HTTPError:
+                pass
+            else:
+                assert False, 'a 401 should raise HTTPError'
+
+        assert self.client.requests == 2
+        assert len(self.cache) == 0
+        assert all(r.content.source.closed for r in self.client.responses)
+
+        self.client.status_code = 200
+        assert len(self.client.get_credential_fields(100000)) == 2
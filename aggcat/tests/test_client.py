@@ -6,6 +6,7 @@ import ConfigParser
 from datetime import datetime
 
 from ..client import AggcatClient
+from ..async_client import AsyncAggcatClient
 from ..exceptions import HTTPError
 
 from nose.tools import raises, nottest
@@ -157,6 +158,15 @@ class TestClient(object):
         assert r.content.home_url == 'http://www.intuit.com'
         assert r.content.email_address == 'CustomerCentralBank@intuit.com'
 
+    def test_async_get_institution_details(self):
+        """Client Test: Institution details in the background"""
+        ac = AsyncAggcatClient(*self.client_args, workers=2)
+        results = [ac.get_institution_details(self.institution_id) for i in range(2)]
+        ac.close()
+
+        for r in results:
+            assert int(r.get().content.institution_id) == self.institution_id
+
     def test_url_building(self):
         """Client Test: URL building"""
         assert self.ac._build_url('institutions') == \
@@ -306,17 +316,16 @@ class TestClient(object):
             'Banking Password': ''
         })
 
-    @raises(NotImplementedError)
     def test_z14_list_files(self):
         """Client Test: List files"""
         self.ac.list_files()
 
-    @raises(NotImplementedError)
+    @raises(HTTPError)
     def test_z15_get_file_data(self):
         """Client Test: Get file data"""
         self.ac.get_file_data('fake_file_name.gz')
 
-    @raises(NotImplementedError)
+    @raises(HTTPError)
     def test_z16_delete_file(self):
         """Client Test: Delete file"""
         self.ac.delete_file('fake_file_name.gz')
@@ -0,0 +1,53 @@
+from __future__ import absolute_import
+
+from nose.plugins.skip import SkipTest
+
+from .. import columnar
+from .test_models import TRANSACTIONS
+
+
+class TestColumnar(object):
+    """Test columnar transactions"""
+    def setup(self):
+        if columnar.numpy is None:
+            raise SkipTest('numpy is not installed')
+
+        self.columns = columnar.decode_transactions(TRANSACTIONS)
+
+    def test_columns(self):
+        """Columnar Test: Transactions are decoded into typed arrays"""
+        numpy = columnar.numpy
+        c = self.columns
+
+        assert len(c) == 2
+        assert c.id.tolist() == [400189790351, 400189790352]
+        assert c.amount.tolist() == [-8.1, 12.0]
+        assert c.posted_date[0] == numpy.datetime64('2013-08-11')
+        assert numpy.isnat(c.posted_date[1])
+        assert c.pending.tolist() == [False, False]
+        assert c.record_type.tolist() == ['InvestmentTransaction', 'BankingTransaction']
+        assert c.currency.tolist() == ['USD', None]
+        assert c.category[0] == 'Investments'
+
+    def test_aggregate(self):
+        """Columnar Test: Amounts are aggregated by category and selected by mask"""
+        c = self.columns
+
+        assert c.totals_by('category') == {'Investments': -8.1, None: 12.0}
+        assert abs(c.total() - 3.9) < 1e-9
+
+        deposits = c[c.amount > 0]
+        assert len(deposits) == 1
+        assert deposits.id.tolist() == [400189790352]
+        assert deposits.record_type.tolist() == ['BankingTransaction']
+
+    def test_dataframe(self):
+        """Columnar Test: Columns convert to a pandas DataFrame"""
+        if columnar.pandas is None:
+            raise SkipTest('pandas is not installed')
+
+        df = self.columns.to_dataframe()
+
+        assert list(df.columns) == list(columnar.TransactionColumns.columns)
+        assert df.amount.sum() == self.columns.total()
+        assert list(df.category.cat.categories) == ['Investments']
@@ -0,0 +1,215 @@
+from __future__ import absolute_import
+
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import threading
+import SocketServer
+import BaseHTTPServer
+
+import requests
+
+from ..retry import RetryPolicy
+from ..exceptions import ChecksumError, DownloadError
+from .fakes import fake_client
+
+DATA = ''.join(chr(i % 251) for i in xrange(300000))
+
+FILE_LIST = (
+    '<FileList><file><fileName>export.gz</fileName><fileSize>300000</fileSize></file>'
+    '<file><fileName>other.gz</fileName><fileSize>10</fileSize></file></FileList>'
+)
+
+
+class FileHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serve files with Range support and optionally drop connections part way through"""
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(('GET', self.path, self.headers.get('Range')))
+
+        if self.path.endswith('/export/files'):
+            return self._send(200, FILE_LIST)
+
+        data = server.files.get(self.path.rsplit('/', 1)[1])
+        if data is None:
+            return self._send(404, '')
+
+        start, end, status = 0, len(data) - 1, 200
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range') or '')
+        if match and server.ranges:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            status = 206
+
+        body = data[start:end + 1]
+        headers = {'Content-Range': 'bytes %s-%s/%s' % (start, end, len(data))} if status == 206 else {}
+
+        with server.lock:
+            fail = server.failures > 0 and len(body) > 1
+            if fail:
+                server.failures -= 1
+
+        # send the full Content-Length but hang up half way through the body, or before it
+        if server.hang_up:
+            self._send(status, '', headers, len(body))
+        else:
+            self._send(status, body[:len(body) // 2] if fail else body, headers, len(body))
+
+    def do_DELETE(self):
+        self.server.requests.append(('DELETE', self.path, None))
+        self.server.files.pop(self.path.rsplit('/', 1)[1], None)
+        self._send(200, '')
+
+    def _send(self, status, body, headers={}, length=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body) if length is None else length))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FileServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class TestFiles(object):
+    """Test bulk file downloads against a local server"""
+    def setup(self):
+        self.server = FileServer(('127.0.0.1', 0), FileHandler)
+        self.server.files = {'export.gz': DATA}
+        self.server.requests = []
+        self.server.ranges = True
+        self.server.failures = 0
+        self.server.hang_up = False
+        self.server.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        # a client with the signing swapped out for a plain session to the local server
+        self.client = fake_client(session=requests.Session(), retry=RetryPolicy())
+        self.client.base_url = 'http://127.0.0.1:%s/v1' % self.server.server_address[1]
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'export.gz')
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_endpoints(self):
+        """Files Test: Files are listed, read by range and deleted"""
+        files = self.client.list_files().content
+        assert [f.file_name for f in files] == ['export.gz', 'other.gz']
+
+        r = self.client.get_file_data('export.gz', (10, 19))
+        assert r.status_code == 206
+        assert r.content == DATA[10:20]
+        assert self.client.get_file_data('export.gz').content == DATA
+
+        self.client.delete_file('export.gz')
+        assert self.server.requests[-1] == ('DELETE', '/v1/export/files/export.gz', None)
+        assert 'export.gz' not in self.server.files
+
+    def test_download(self):
+        """Files Test: Files are streamed to disk and verified"""
+        checksum = hashlib.md5(DATA).hexdigest()
+
+        assert self.client.download_file('export.gz', self.path, checksum=checksum, chunk_size=4096) == self.path
+        assert self.read() == DATA
+        assert not os.path.exists(self.path + '.part')
+
+    def test_resume(self):
+        """Files Test: Downloads resume with a Range request after the connection drops"""
+        self.server.failures = 3
+
+        self.client.download_file('export.gz', self.path, size=len(DATA), chunk_size=4096)
+
+        assert self.read() == DATA
+        ranges = [r[2] for r in self.server.requests]
+        assert ranges[0] == 'bytes=0-299999'
+        assert ranges[1] == 'bytes=150000-299999'
+        assert len(ranges) == 4
+
+    def test_resume_part_file(self):
+        """Files Test: A part file left by an earlier run is resumed"""
+        with open(self.path + '.part', 'wb') as f:
+            f.write(DATA[:1000])
+
+        self.client.download_file('export.gz', self.path, size=len(DATA))
+
+        assert self.read() == DATA
+        assert self.server.requests[0][2] == 'bytes=1000-299999'
+
+    def test_segments(self):
+        """Files Test: Big files are fetched in parallel ranged segments"""
+        self.server.failures = 2
+
+        self.client.download_file('export.gz', self.path, segments=4, segment_threshold=1000, chunk_size=4096)
+
+        assert self.read() == DATA
+        ranges = set(r[2] for r in self.server.requests)
+        assert set(['bytes=0-0', 'bytes=0-74999', 'bytes=75000-149999', 'bytes=150000-224999', 'bytes=225000-299999']) <= ranges
+
+    def test_no_ranges(self):
+        """Files Test: Servers without Range support get the file in one request"""
+        self.server.ranges = False
+
+        self.client.download_file('export.gz', self.path)
+        assert self.read() == DATA
+
+    def test_checksum(self):
+        """Files Test: Files that do not match their checksum are removed"""
+        try:
+            self.client.download_file('export.gz', self.path, checksum='0' * 32)
+        except ChecksumError:
+            pass
+        else:
+            assert False, 'a bad checksum should raise ChecksumError'
+
+        assert not os.path.exists(self.path)
+        assert not os.path.exists(self.path + '.part')
+
+    def test_give_up(self):
+        """Files Test: Downloads that keep failing without progress raise DownloadError"""
+        self.server.hang_up = True
+
+        try:
+            self.client.download_file('export.gz', self.path, size=len(DATA), retries=2)
+        except DownloadError:
+            pass
+        else:
+            assert False, 'a download that never finishes should raise DownloadError'
+
+        assert len(self.server.requests) == 3
+
+    def test_give_up_segments(self):
+        """Files Test: A segmented download that fails leaves no part file to resume from"""
+        self.server.hang_up = True
+
+        try:
+            self.client.download_file('export.gz', self.path, size=len(DATA), segments=4, segment_threshold=1000, retries=1)
+        except DownloadError:
+            pass
+        else:
+            assert False, 'a download that never finishes should raise DownloadError'
+
+        assert not os.path.exists(self.path + '.part')
+
+        # the next run starts from the beginning instead of taking the empty file as done
+        self.server.hang_up = False
+        self.client.download_file('export.gz', self.path, size=len(DATA))
+
+        assert self.read() == DATA
+        assert self.server.requests[-1][2] == 'bytes=0-299999'
@@ -0,0 +1,166 @@
+from __future__ import absolute_import
+
+import threading
+
+import requests
+from nose.tools import raises
+from requests.exceptions import ConnectionError
+
+from ..exceptions import HTTPError
+from ..metrics import MetricsRegistry, ClientMetrics, CONTENT_TYPE, start_http_server
+from ..retry import RetryPolicy
+from .fakes import FakeResponse, fake_client
+
+
+class TestRegistry(object):
+    """Test the metrics registry"""
+    def setup(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        """Metrics Test: Counters render as Prometheus text"""
+        counter = self.registry.counter('aggcat_test_total', 'Test count', ('endpoint', 'code'))
+        counter.inc('accounts', '500')
+        counter.inc('accounts', '500', amount=2)
+        counter.inc('logins', 'say "hi"\n\\')
+
+        assert counter.value('accounts', '500') == 3
+        assert counter.value('institutions', '500') == 0
+        assert self.registry.render() == '\n'.join([
+            '# HELP aggcat_test_total Test count',
+            '# TYPE aggcat_test_total counter',
+            'aggcat_test_total{endpoint="accounts",code="500"} 3',
+            'aggcat_test_total{endpoint="logins",code="say \\"hi\\"\\n\\\\"} 1',
+        ]) + '\n'
+
+    def test_histogram(self):
+        """Metrics Test: Histograms render cumulative buckets, sum and count"""
+        histogram = self.registry.histogram('aggcat_test_seconds', 'Test seconds', ('endpoint',), (0.1, 1))
+        histogram.observe(0.05, 'accounts')
+        histogram.observe(0.5, 'accounts')
+        histogram.observe(2, 'accounts')
+
+        assert histogram.value('accounts').count == 3
+        assert histogram.value('logins') is None
+        assert self.registry.render() == '\n'.join([
+            '# HELP aggcat_test_seconds Test seconds',
+            '# TYPE aggcat_test_seconds histogram',
+            'aggcat_test_seconds_bucket{endpoint="accounts",le="0.1"} 1',
+            'aggcat_test_seconds_bucket{endpoint="accounts",le="1.0"} 2',
+            'aggcat_test_seconds_bucket{endpoint="accounts",le="+Inf"} 3',
+            'aggcat_test_seconds_sum{endpoint="accounts"} 2.55',
+            'aggcat_test_seconds_count{endpoint="accounts"} 3',
+        ]) + '\n'
+
+    def test_register(self):
+        """Metrics Test: Metrics are registered once by name"""
+        counter = self.registry.counter('aggcat_test_total', 'Test count')
+
+        assert self.registry.counter('aggcat_test_total', 'Test count') is counter
+        assert self.registry.get('aggcat_test_total') is counter
+
+        counter.inc()
+        assert 'aggcat_test_total 1' in self.registry.render()
+
+    @raises(ValueError)
+    def test_type_conflict(self):
+        """Metrics Test: A name can only be one type of metric"""
+        self.registry.counter('aggcat_test', 'Test')
+        self.registry.histogram('aggcat_test', 'Test')
+
+    @raises(ValueError)
+    def test_labels(self):
+        """Metrics Test: Every label needs a value"""
+        self.registry.counter('aggcat_test_total', 'Test count', ('endpoint',)).inc()
+
+    def test_threads(self):
+        """Metrics Test: Metrics can be updated from many threads"""
+        counter = self.registry.counter('aggcat_test_total', 'Test count', ('endpoint',))
+        histogram = self.registry.histogram('aggcat_test_seconds', 'Test seconds', ('endpoint',))
+
+        def update():
+            for _ in xrange(1000):
+                counter.inc('accounts')
+                histogram.observe(0.01, 'accounts')
+
+        threads = [threading.Thread(target=update) for _ in xrange(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert counter.value('accounts') == 8000
+        assert histogram.value('accounts').count == 8000
+
+    def test_http_server(self):
+        """Metrics Test: The metrics are served over HTTP"""
+        self.registry.counter('aggcat_test_total', 'Test count').inc()
+        server = start_http_server(0, '127.0.0.1', self.registry)
+
+        try:
+            r = requests.get('http://127.0.0.1:%s/metrics' % server.server_address[1])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert r.status_code == 200
+        assert r.headers['content-type'] == CONTENT_TYPE
+        assert r.text == self.registry.render()
+
+
+class TestClientMetrics(object):
+    """Test the metrics recorded by the client"""
+    def setup(self):
+        self.registry = MetricsRegistry()
+
+    def client(self, *outcomes):
+        return fake_client(*outcomes, retry=RetryPolicy(retries=0), metrics=ClientMetrics(self.registry))
+
+    def test_requests(self):
+        """Metrics Test: Requests are counted, timed and sized by endpoint"""
+        client = self.client(FakeResponse(200, content='<Accounts/>'), FakeResponse(200, content='<Transactions/>'))
+        client.get_customer_accounts()
+        client.get_account_transactions(1234, '2013-08-10')
+
+        metrics = client.metrics
+        assert metrics.requests.value('accounts', 'GET', '200') == 1
+        assert metrics.requests.value('transactions', 'GET', '200') == 1
+        assert metrics.duration.value('accounts').count == 1
+        assert metrics.size.value('transactions').sum == len('<Transactions/>')
+        assert 'aggcat_requests_total{endpoint="accounts",method="GET",status="200"} 1' in self.registry.render()
+
+    def test_errors(self):
+        """Metrics Test: Error codes and exceptions are counted"""
+        client = self.client(FakeResponse(503, content='unavailable'), ConnectionError())
+
+        for _ in xrange(2):
+            try:
+                client.delete_account(1234)
+            except (HTTPError, ConnectionError):
+                pass
+
+        metrics = client.metrics
+        assert metrics.requests.value('accounts', 'DELETE', '503') == 1
+        assert metrics.errors.value('accounts', '503') == 1
+        assert metrics.errors.value('accounts', 'ConnectionError') == 1
+
+    def test_token_refresh(self):
+        """Metrics Test: Rejected tokens are counted as refreshes"""
+        rejected = FakeResponse(401, {'www-authenticate': 'OAuth oauth_problem="token_rejected"'})
+        client = self.client(rejected, FakeResponse(200, content='<Accounts/>'))
+
+        client.get_customer_accounts()
+
+        metrics = client.metrics
+        assert metrics.token_refreshes.value('accounts') == 1
+        assert metrics.requests.value('accounts', 'GET', '401') == 1
+        assert metrics.requests.value('accounts', 'GET', '200') == 1
+        assert metrics.errors.value('accounts', '401') == 0
+
+    def test_objectify_failure(self):
+        """Metrics Test: Responses that can not be objectified are counted but blank ones are not"""
+        client = self.client(FakeResponse(200, content='<Accounts>'), FakeResponse(200, content=''))
+
+        assert client.get_customer_accounts().content == '<Accounts>'
+        assert client.get_customer_accounts().content == ''
+        assert client.metrics.objectify_failures.value('accounts') == 1
@@ -0,0 +1,90 @@
+from __future__ import absolute_import
+
+import pickle
+from decimal import Decimal
+from datetime import datetime, timedelta
+
+from .. import models
+
+TRANSACTIONS = (
+    '<TransactionList xmlns="http://schema.intuit.com/platform/fdatafeed/transactionlist/v1" '
+    'xmlns:ns2="http://schema.intuit.com/platform/fdatafeed/transaction/v1" '
+    'xmlns:ns3="http://schema.intuit.com/platform/fdatafeed/investmenttransaction/v1">'
+    '<ns3:InvestmentTransaction><ns2:id>400189790351</ns2:id><ns2:currencyType>USD</ns2:currencyType>'
+    '<ns2:postedDate>2013-08-11T08:52:26.397-07:00</ns2:postedDate><ns2:pending>false</ns2:pending>'
+    '<ns2:categorization><ns2:common><ns2:normalizedPayeeName>Broker</ns2:normalizedPayeeName></ns2:common>'
+    '<ns2:context><ns2:source>AAN</ns2:source><ns2:categoryName>Investments</ns2:categoryName></ns2:context>'
+    '</ns2:categorization><ns3:totalAmount>-8.1</ns3:totalAmount><ns3:units>2.5</ns3:units></ns3:InvestmentTransaction>'
+    '<ns2:BankingTransaction><ns2:id>400189790352</ns2:id><ns2:amount>12.00</ns2:amount>'
+    '<ns2:userDate>2013-08-12T00:00:00Z</ns2:userDate></ns2:BankingTransaction>'
+    '<notRefreshedReason>NOT_NECESSARY</notRefreshedReason>'
+    '</TransactionList>'
+)
+
+
+class TestModels(object):
+    """Test typed models"""
+    @classmethod
+    def setup_class(self):
+        with open('aggcat/tests/data/api_discover_and_add_accounts.xml', 'r') as f:
+            self.accounts = models.decode(f.read())
+
+    def test_accounts(self):
+        """Models Test: Accounts are decoded into their account type"""
+        assert [type(a).__name__ for a in self.accounts[:5]] == [
+            'CreditAccount', 'BankingAccount', 'CreditAccount', 'InvestmentAccount', 'LoanAccount'
+        ]
+
+        credit = self.accounts[0]
+        assert credit.account_id == 400004530271
+        assert credit.current_balance == Decimal('-811.52')
+        assert credit.credit_account_type == 'CREDITCARD'
+        assert credit.balance_amount is None
+        assert credit.aggr_success_date == datetime(2013, 8, 11, 15, 52, 26, 397000, models.FixedOffset(0))
+        assert credit.balance_date.utcoffset() == timedelta(hours=-7)
+
+    def test_loan_accounts(self):
+        """Models Test: Loan accounts are decoded with every loan field"""
+        loans = [a for a in self.accounts if isinstance(a, models.LoanAccount)]
+        assert [l.loan_type for l in loans] == ['LOAN', 'MORTGAGE']
+
+        for loan in loans:
+            assert loan.autopay_enrolled is True
+            assert loan.current_school == 'Cur School'
+            assert loan.original_school == 'Orig School'
+            assert loan.guarantor == 'Guarantor'
+            assert loan.first_mortgage is False
+            assert loan.recurring_payment_amount == Decimal('811.52')
+            assert loan.payment_min_amount == Decimal('811.52')
+            assert loan.loan_payment_freq == 'MONTHLY'
+            assert loan.lender == 'Lender'
+
+    def test_slots(self):
+        """Models Test: Records have no __dict__"""
+        assert not hasattr(self.accounts[0], '__dict__')
+        assert 'current_balance' in models.CreditAccount._attributes
+        assert 'account_id' in models.CreditAccount._attributes
+
+    def test_transactions(self):
+        """Models Test: Transactions are decoded with amounts, dates and categories"""
+        investment, banking = models.decode(TRANSACTIONS)
+
+        assert isinstance(investment, models.InvestmentTransaction)
+        assert investment.id == 400189790351
+        assert investment.total_amount == Decimal('-8.1')
+        assert investment.units == Decimal('2.5')
+        assert investment.pending is False
+        assert investment.category_name == 'Investments'
+        assert investment.normalized_payee_name == 'Broker'
+
+        assert isinstance(banking, models.BankingTransaction)
+        assert banking.amount == Decimal('12.00')
+        assert banking.user_date == datetime(2013, 8, 12, tzinfo=models.FixedOffset(0))
+        assert banking.category_name is None
+
+    def test_iterdecode(self):
+        """Models Test: Streamed records match decoded records and can be pickled"""
+        records = list(models.iterdecode(TRANSACTIONS))
+
+        assert records == models.decode(TRANSACTIONS)
+        assert pickle.loads(pickle.dumps(records, 2)) == records
@@ -1,6 +1,12 @@
 from __future__ import absolute_import
 
-from ..parser import Objectify
+import sys
+import inspect
+import weakref
+from io import BytesIO
+
+from .. import parser
+from ..parser import Objectify, IterObjectify, LazyObjectify
 
 
 class TestParser(object):
@@ -28,3 +34,149 @@ class TestParser(object):
         assert self.o[0].ingredients[0].name == 'Flour'
         assert self.o[1].name == 'Smoked Bacon'
         assert self.o[1].ingredients[0].name == 'Bacon'
+
+    def test_class_cache(self):
+        """Parser Test: Elements with the same shape share a slotted class"""
+        with open('aggcat/tests/data/sample_xml.xml', 'r') as f:
+            o = Objectify(f.read()).get_object()
+
+        assert type(self.o[0]) is type(self.o[1])
+        assert type(self.o[0]) is type(o[0])
+        assert type(self.o[0].ingredients[0]) is type(self.o[1].ingredients[2])
+        assert not hasattr(self.o[0], '__dict__')
+        assert self.o[0].name != self.o[1].name
+
+    def test_tag_names(self):
+        """Parser Test: Tag names are converted once and shared by every parser"""
+        assert parser.clean_tag_name('aggrSuccessDate') == 'aggr_success_date'
+        assert parser.clean_tag_name('inv401kSource') == 'inv401k_source'
+        assert 'prepTime' in parser._tag_names
+        assert 'creditAccountType' in parser._tag_names
+        assert self.o[0].prep_time == '15'
+
+    def test_deep_tree(self):
+        """Parser Test: Deep trees are walked without recursion"""
+        # lxml refuses documents deeper than 256 levels unless huge_tree is set
+        xml = '<root>%s<leaf>bottom</leaf>%s</root>' % ('<level>' * 200, '</level>' * 200)
+        depths = []
+
+        def profile(frame, event, arg):
+            if event == 'call':
+                depth = 0
+                while frame is not None:
+                    depth += 1
+                    frame = frame.f_back
+                depths.append(depth)
+
+        # measure how deep the stack grows instead of lowering the global recursion limit
+        start = len(inspect.stack())
+        previous = sys.getprofile()
+        sys.setprofile(profile)
+        try:
+            o = Objectify(xml).get_object()
+        finally:
+            sys.setprofile(previous)
+
+        assert max(depths) - start < 50
+
+        for i in xrange(199):
+            o = o.level
+        assert o.leaf == 'bottom'
+
+    def test_list_order(self):
+        """Parser Test: List items keep their document order"""
+        xml = '<root><item><n>1</n></item><item><n>2</n></item><other><n>3</n></other><item><n>4</n></item></root>'
+        o = Objectify(xml).get_object()
+
+        assert [i.n for i in o] == ['1', '2', '3', '4']
+
+    def test_retain(self):
+        """Parser Test: to_xml() only keeps what the retain mode asks for"""
+        xml = '<root xmlns="urn:test"><item><n>1</n></item><item><n>2</n></item></root>'
+
+        o = Objectify(xml).get_object()
+        out = BytesIO()
+        o.to_xml(out)
+        assert o.to_xml() is xml
+        assert out.getvalue() == xml
+        assert o.to_xml(view=True).tobytes() == xml
+
+        o = Objectify(xml, retain='tree').get_object()
+        assert o.to_xml() == '<root><item><n>1</n></item><item><n>2</n></item></root>'
+
+        o = Objectify(xml, retain='none').get_object()
+        assert [i.n for i in o] == ['1', '2']
+        try:
+            o.to_xml()
+        except ValueError:
+            pass
+        else:
+            assert False, 'to_xml() should raise when nothing is retained'
+
+        try:
+            Objectify(xml, retain='everything')
+        except ValueError:
+            pass
+        else:
+            assert False, 'unknown retain modes should raise'
+
+    def test_retain_releases_objectify(self):
+        """Parser Test: Objectified responses do not keep the Objectify or its tree alive"""
+        objectify = Objectify('<root><item><n>1</n></item><item><n>2</n></item></root>')
+        o = objectify.get_object()
+        ref = weakref.ref(objectify)
+
+        assert objectify.tree is None
+        del objectify
+        assert ref() is None
+        assert o.to_xml().startswith('<root>')
+
+    def test_streaming(self):
+        """Parser Test: Streaming yields each top level element as an object"""
+        with open('aggcat/tests/data/sample_xml.xml', 'r') as f:
+            recipes = list(IterObjectify(f))
+
+        assert len(recipes) == 2
+        assert recipes[0].name == 'Fried Pickles'
+        assert recipes[0].cook_time == '30'
+        assert len(recipes[1].ingredients) == 3
+        assert recipes[1].ingredients[2].name == 'Cavendars'
+
+    def test_streaming_namespaces(self):
+        """Parser Test: Streaming removes namespaces from each record"""
+        with open('aggcat/tests/data/api_discover_and_add_accounts.xml', 'r') as f:
+            accounts = list(IterObjectify(f.read()))
+
+        assert len(accounts) == 10
+        assert accounts[0].account_id == '400004530271'
+        assert accounts[0].credit_account_type == 'CREDITCARD'
+        assert accounts[1].banking_account_type == 'CD'
+
+    def test_lazy(self):
+        """Parser Test: Lazy objects match the eagerly objectified ones"""
+        with open('aggcat/tests/data/sample_xml.xml', 'r') as f:
+            xml = f.read()
+
+        o = LazyObjectify(xml).get_object()
+
+        assert o.to_xml() == xml
+        assert len(o) == 2
+        assert len(o._list) == 2
+        assert o[0].name == 'Fried Pickles'
+        assert o[0] is o[0]
+        assert o[-1].name == 'Smoked Bacon'
+        assert [i.name for i in o[1].ingredients] == ['Bacon', 'Wood Chips', 'Cavendars']
+        assert not hasattr(o[0], '_list')
+        assert not hasattr(o[0], 'to_xml')
+
+    def test_lazy_unwrapping(self):
+        """Parser Test: Lazy objects unwrap the root like Objectify"""
+        with open('aggcat/tests/data/api_two_factor_choice_account.xml', 'r') as f:
+            xml = f.read()
+
+        eager = Objectify(xml).get_object()
+        lazy = LazyObjectify(xml).get_object()
+
+        assert eager._name == lazy._name
+        assert len(eager) == len(lazy)
+        assert [c.text for c in eager] == [c.text for c in lazy]
@@ -0,0 +1,72 @@
+from __future__ import absolute_import
+
+from ..pool import AggcatClientPool
+from ..saml import load_key, SAML
+
+
+class FakeTokens(object):
+    def __init__(self):
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+class FakeClient(object):
+    def __init__(self, customer_id):
+        self.customer_id = customer_id
+        self.tokens = FakeTokens()
+
+    def close(self):
+        self.tokens.stop()
+
+
+class FakeClientPool(AggcatClientPool):
+    created = 0
+
+    def _create_client(self, customer_id):
+        self.created += 1
+        return FakeClient(customer_id)
+
+
+class TestPool(object):
+    """Test Client Pool"""
+    def setup(self):
+        self.pool = FakeClientPool('key', 'secret', 'provider', 'aggcat/tests/data/test.key', max_customers=2)
+
+    def test_lazy_clients(self):
+        """Pool Test: Clients are created once when first used"""
+        assert len(self.pool) == 0
+
+        c = self.pool['a']
+
+        assert self.pool['a'] is c
+        assert self.pool.created == 1
+        assert 'a' in self.pool
+
+    def test_lru_eviction(self):
+        """Pool Test: The least recently used client is evicted"""
+        a = self.pool['a']
+        self.pool['b']
+        self.pool['a']
+        self.pool['c']
+
+        assert len(self.pool) == 2
+        assert 'b' not in self.pool
+        assert 'a' in self.pool
+        assert not a.tokens.stopped
+
+    def test_evict(self):
+        """Pool Test: Evicted clients stop refreshing tokens"""
+        a = self.pool['a']
+        self.pool.evict('a')
+
+        assert 'a' not in self.pool
+        assert a.tokens.stopped
+
+    def test_shared_key(self):
+        """Pool Test: Private keys are loaded once per process"""
+        key = load_key('aggcat/tests/data/test.key')
+
+        assert load_key('aggcat/tests/data/test.key') is key
+        assert SAML('aggcat/tests/data/test.key', 'provider', 1).rsa is key
@@ -0,0 +1,170 @@
+from __future__ import absolute_import
+
+from .. import profiling
+from ..parser import Objectify
+from ..retry import RetryPolicy
+from .fakes import FakeResponse, fake_client
+
+ACCOUNTS = '<ns8:AccountList xmlns:ns8="urn:account"><ns8:BankingAccount><accountId>1</accountId></ns8:BankingAccount></ns8:AccountList>'
+
+
+class RecordingHook(profiling.Hook):
+    def __init__(self):
+        self.events = []
+
+    def start(self, phase, endpoint):
+        self.events.append(('start', phase, endpoint))
+
+    def end(self, phase, endpoint, seconds, size):
+        assert seconds >= 0
+        self.events.append(('end', phase, endpoint, size))
+
+    def ended(self):
+        return [e[1:] for e in self.events if e[0] == 'end']
+
+
+class TestProfiling(object):
+    """Test profiling hooks"""
+    def setup(self):
+        self.hook = RecordingHook()
+
+    def teardown(self):
+        profiling.remove_hook(self.hook)
+
+    def client(self, *outcomes):
+        return fake_client(*outcomes, retry=RetryPolicy(backoff=0.001))
+
+    def test_disabled(self):
+        """Profiling Test: Phases do nothing without hooks"""
+        assert not profiling.enabled()
+        assert profiling.phase(profiling.NETWORK, 'accounts') is profiling.phase(profiling.PARSE)
+        assert profiling.endpoint('accounts') is profiling.phase(profiling.PARSE)
+
+        with profiling.phase(profiling.NETWORK) as p:
+            p.add_bytes(10)
+
+    def test_hooks(self):
+        """Profiling Test: Hooks are called at the start and end of phases"""
+        profiling.add_hook(self.hook)
+        assert profiling.enabled()
+
+        with profiling.phase(profiling.NETWORK, 'accounts') as p:
+            p.add_bytes(10)
+            p.add_bytes(5)
+            with profiling.phase(profiling.OAUTH_SIGNING):
+                pass
+
+        with profiling.endpoint('transactions'):
+            with profiling.phase(profiling.OBJECTIFY):
+                pass
+
+        with profiling.phase(profiling.PARSE):
+            pass
+
+        assert self.hook.events == [
+            ('start', 'network', 'accounts'),
+            ('start', 'oauth_signing', 'accounts'),
+            ('end', 'oauth_signing', 'accounts', 0),
+            ('end', 'network', 'accounts', 15),
+            ('start', 'objectify', 'transactions'),
+            ('end', 'objectify', 'transactions', 0),
+            ('start', 'parse', None),
+            ('end', 'parse', None, 0),
+        ]
+
+        profiling.remove_hook(self.hook)
+        with profiling.phase(profiling.PARSE):
+            pass
+        assert len(self.hook.events) == 8
+
+    def test_objectify(self):
+        """Profiling Test: Objectify reports parsing, namespace removal and objectifying"""
+        profiling.add_hook(self.hook)
+        Objectify(ACCOUNTS)
+
+        assert self.hook.ended() == [
+            ('parse', None, len(ACCOUNTS)),
+            ('namespaces', None, 0),
+            ('objectify', None, 0),
+        ]
+
+    def test_request(self):
+        """Profiling Test: Request phases are reported under their endpoint family"""
+        client = self.client(FakeResponse(503), FakeResponse(200, content=ACCOUNTS))
+        profiling.add_hook(self.hook)
+
+        assert client.get_customer_accounts().content.account_id == '1'
+        assert self.hook.ended() == [
+            ('network', 'accounts', 0),
+            ('network', 'accounts', len(ACCOUNTS)),
+            ('parse', 'accounts', len(ACCOUNTS)),
+            ('namespaces', 'accounts', 0),
+            ('objectify', 'accounts', 0),
+        ]
+
+    def test_tokens(self):
+        """Profiling Test: SAML signing and the token exchange are reported"""
+        client = self.client()
+        profiling.add_hook(self.hook)
+
+        assert client._get_oauth_tokens()['oauth_token'] == ['token']
+        assert self.hook.ended() == [
+            ('saml_signing', 'tokens', 0),
+            ('token_exchange', 'tokens', 43),
+        ]
+
+    def test_auth(self):
+        """Profiling Test: OAuth signing is timed"""
+        profiling.add_hook(self.hook)
+        auth = profiling.ProfiledAuth(lambda request: request + ' signed')
+
+        with profiling.endpoint('logins'):
+            assert auth('request') == 'request signed'
+
+        assert self.hook.ended() == [('oauth_signing', 'logins', 0)]
+
+
+class TestPhaseCollector(object):
+    """Test the built in collector"""
+    def test_histogram(self):
+        """Profiling Test: Histograms count values into buckets"""
+        histogram = profiling.Histogram((0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.cumulative() == [(0.1, 2), (1, 3), (float('inf'), 4)]
+        assert histogram.count == 4
+        assert histogram.sum == 2.65
+        assert histogram.quantile(0.5) == 0.1
+        assert histogram.quantile(0.75) == 1
+        assert profiling.Histogram().quantile(0.5) == 0.0
+
+    def test_collector(self):
+        """Profiling Test: The collector keeps timings and bytes per endpoint and phase"""
+        collector = profiling.PhaseCollector()
+        collector.end('network', 'accounts', 0.2, 100)
+        collector.end('network', 'accounts', 0.4, 50)
+        collector.end('parse', 'accounts', 0.0364, 150)
+
+        stats = collector.stats()
+        network = stats[('accounts', 'network')]
+        assert network.count == 2
+        assert network.bytes == 150
+        assert network.max == 0.4
+        assert abs(network.mean - 0.3) < 1e-9
+
+        # stats are copies
+        collector.end('network', 'accounts', 0.1, 0)
+        assert network.count == 2
+
+        report = collector.report().splitlines()
+        assert report[0].split()[:3] == ['endpoint', 'phase', 'calls']
+        assert report[1].split()[:3] == ['accounts', 'network', '3']
+        assert report[2].split()[:3] == ['accounts', 'parse', '1']
+
+        # p99 is never more than the slowest call
+        assert report[2].split()[5:7] == ['0.0364', '0.0364']
+
+        collector.reset()
+        assert collector.stats() == {}
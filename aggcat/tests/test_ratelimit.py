@@ -0,0 +1,164 @@
+from __future__ import absolute_import
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+from multiprocessing import Process
+
+from ..retry import RetryPolicy
+from ..ratelimit import TokenBucket, FileTokenBucket, RateLimiter
+from .fakes import FakeResponse, fake_client
+
+
+def take(path, count):
+    """Take tokens from a shared bucket in another process"""
+    bucket = FileTokenBucket(path, 50)
+    for _ in xrange(count):
+        bucket.acquire()
+    bucket.close()
+
+
+class TestTokenBucket(object):
+    """Test token buckets"""
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'bucket')
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rate(self):
+        """Rate Limit Test: Calls are spaced out to the rate"""
+        bucket = TokenBucket(100)
+
+        start = time.time()
+        for _ in xrange(11):
+            bucket.acquire()
+
+        assert 0.09 <= time.time() - start < 0.5
+
+    def test_burst(self):
+        """Rate Limit Test: A full bucket lets a burst through at once"""
+        bucket = TokenBucket(1, burst=5)
+
+        assert [bucket.reserve() for _ in xrange(5)] == [0] * 5
+        assert 0.9 < bucket.reserve() <= 1
+
+    def test_first_come_first_served(self):
+        """Rate Limit Test: Waiting calls are served in the order they arrived"""
+        bucket = TokenBucket(10)
+        waits = [bucket.reserve() for _ in xrange(4)]
+
+        assert waits[0] == 0
+        assert all(0.05 < b - a <= 0.1 for a, b in zip(waits, waits[1:]))
+        assert 0.25 < bucket.backlog() <= 0.4
+
+    def test_timeout(self):
+        """Rate Limit Test: Calls that would wait too long take nothing"""
+        bucket = TokenBucket(1)
+
+        assert bucket.acquire(timeout=0)
+        assert not bucket.acquire(timeout=0.5)
+        assert bucket.backlog() <= 1
+
+    def test_threads(self):
+        """Rate Limit Test: Threads share a bucket"""
+        bucket = TokenBucket(200)
+        threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in xrange(5)]) for _ in xrange(4)]
+
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert time.time() - start >= 19 / 200.0
+
+    def test_shared_file(self):
+        """Rate Limit Test: Buckets opened from the same file share their tokens"""
+        a = FileTokenBucket(self.path, 10)
+        b = FileTokenBucket(self.path, 10)
+
+        assert a.reserve() == 0
+        assert 0.05 < b.reserve() <= 0.1
+        assert 0.15 < a.reserve() <= 0.2
+
+        a.close()
+        b.close()
+
+    def test_processes(self):
+        """Rate Limit Test: Processes share a file bucket"""
+        processes = [Process(target=take, args=(self.path, 5)) for _ in xrange(2)]
+
+        start = time.time()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        assert all(process.exitcode == 0 for process in processes)
+        assert time.time() - start >= 9 / 50.0
+
+
+class RecordingLimiter(RateLimiter):
+    def __init__(self, *args, **kwargs):
+        super(RecordingLimiter, self).__init__(*args, **kwargs)
+        self.families = []
+
+    def acquire(self, family=None):
+        self.families.append(family)
+        return super(RecordingLimiter, self).acquire(family)
+
+
+class TestRateLimiter(object):
+    """Test rate limits per endpoint family"""
+    def test_families(self):
+        """Rate Limit Test: Endpoint families have their own limits under the overall limit"""
+        limiter = RateLimiter(1000, limits={'transactions': 1, 'accounts': (1, 3)})
+
+        assert limiter.acquire('transactions') < 0.05
+        assert limiter.backlog('transactions') > 0.9
+        assert limiter.backlog('accounts') < 0.05
+        assert limiter.backlog('institutions') < 0.05
+
+        for _ in xrange(3):
+            assert limiter.acquire('accounts') < 0.05
+        assert limiter.backlog('accounts') > 0.9
+
+    def test_no_limits(self):
+        """Rate Limit Test: A limiter without limits never waits"""
+        limiter = RateLimiter()
+
+        assert limiter.backlog('accounts') == 0
+        assert limiter.acquire('accounts') < 0.05
+
+    def test_shared_files(self):
+        """Rate Limit Test: Limiters with the same path share their buckets"""
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'aggcat')
+            a = RateLimiter(10, limits={'transactions': 5}, path=path)
+            b = RateLimiter(10, limits={'transactions': 5}, path=path)
+
+            a.acquire('transactions')
+            assert 0.05 < b.backlog() <= 0.1
+            assert 0.25 < b.backlog('transactions') <= 0.3
+            assert sorted(os.listdir(directory)) == ['aggcat.all', 'aggcat.transactions']
+
+            a.close()
+            b.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_client(self):
+        """Rate Limit Test: Every try of a client request waits for the limiter"""
+        client = fake_client(
+            FakeResponse(503), FakeResponse(200, content='<Transactions/>'),
+            objectify=False, retry=RetryPolicy(backoff=0.001), rate_limiter=RecordingLimiter(1000)
+        )
+
+        client._make_request('accounts/1234/transactions')
+
+        assert client.rate_limiter.families == ['transactions', 'transactions']
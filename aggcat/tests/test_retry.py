@@ -0,0 +1,197 @@
+from __future__ import absolute_import
+
+import time
+from email.utils import formatdate
+
+from nose.tools import raises
+from requests.exceptions import ConnectionError, Timeout
+
+from ..retry import RetryPolicy, CircuitBreaker, endpoint_family, retry_after, CLOSED, OPEN, HALF_OPEN
+from ..exceptions import HTTPError, CircuitOpenError
+from .fakes import FakeResponse, Sender, fake_client
+
+
+class TestRetryPolicy(object):
+    """Test retries and backoff"""
+    def setup(self):
+        self.policy = RetryPolicy(retries=3, backoff=0.001, max_backoff=0.01)
+
+    def test_endpoint_family(self):
+        """Retry Test: Paths are grouped into endpoint families"""
+        assert endpoint_family('institutions') == 'institutions'
+        assert endpoint_family('institutions/100000') == 'institutions'
+        assert endpoint_family('institutions/100000/logins') == 'logins'
+        assert endpoint_family('logins/1234/accounts') == 'logins'
+        assert endpoint_family('accounts') == 'accounts'
+        assert endpoint_family('accounts/1234/positions') == 'accounts'
+        assert endpoint_family('accounts/1234/transactions') == 'transactions'
+        assert endpoint_family('export/files/export.gz') == 'files'
+
+    def test_retry_after(self):
+        """Retry Test: Retry-After is read as seconds or an HTTP date"""
+        assert retry_after(None) is None
+        assert retry_after('2') == 2.0
+        assert retry_after('not a date') is None
+        assert 50 < retry_after(formatdate(time.time() + 60)) <= 60
+        assert retry_after(formatdate(time.time() - 60)) == 0
+
+    def test_backoff(self):
+        """Retry Test: Waits are jittered up to an exponential backoff"""
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        response = FakeResponse(503)
+
+        for attempt, limit in enumerate([1, 2, 4, 5, 5]):
+            policy.retries = 10
+            waits = [policy.delay('GET', attempt, response) for _ in xrange(50)]
+            assert all(0 <= wait <= limit for wait in waits)
+            assert len(set(waits)) > 1
+
+    def test_delay(self):
+        """Retry Test: Only idempotent methods and failing statuses are retried"""
+        assert self.policy.delay('GET', 0, FakeResponse(503)) is not None
+        assert self.policy.delay('DELETE', 0) is not None
+        assert self.policy.delay('POST', 0, FakeResponse(503)) is None
+        assert self.policy.delay('PUT', 0) is None
+        assert self.policy.delay('GET', 0, FakeResponse(404)) is None
+        assert self.policy.delay('GET', 3, FakeResponse(503)) is None
+        assert self.policy.delay('GET', 0, FakeResponse(429, {'retry-after': '0.005'})) == 0.005
+        assert self.policy.delay('GET', 0, FakeResponse(429, {'retry-after': '120'})) is None
+
+    def test_retries(self):
+        """Retry Test: Failed GETs are sent again until they succeed"""
+        first = FakeResponse(503)
+        send = Sender(first, ConnectionError(), Timeout(), FakeResponse(200))
+
+        assert self.policy.send('accounts', 'GET', send).status_code == 200
+        assert send.calls == 4
+        assert first.closed
+
+    def test_give_up(self):
+        """Retry Test: The last failure is returned or raised once retries run out"""
+        send = Sender(*[FakeResponse(500) for _ in xrange(4)])
+        assert self.policy.send('accounts', 'GET', send).status_code == 500
+        assert send.calls == 4
+
+        send = Sender(*[Timeout() for _ in xrange(4)])
+        try:
+            self.policy.send('institutions', 'GET', send)
+        except Timeout:
+            pass
+        else:
+            assert False, 'the last timeout should be raised'
+        assert send.calls == 4
+
+    def test_no_retry_post(self):
+        """Retry Test: POSTs are never sent twice"""
+        send = Sender(ConnectionError(), FakeResponse(200))
+
+        try:
+            self.policy.send('logins', 'POST', send)
+        except ConnectionError:
+            pass
+        else:
+            assert False, 'a POST should not be retried'
+        assert send.calls == 1
+
+        send = Sender(FakeResponse(503), FakeResponse(200))
+        assert self.policy.send('logins', 'POST', send).status_code == 503
+        assert send.calls == 1
+
+
+class TestCircuitBreaker(object):
+    """Test circuit breakers"""
+    def test_states(self):
+        """Retry Test: Circuits open after failures, then half open and close"""
+        breaker = CircuitBreaker('accounts', failure_threshold=2, reset_timeout=0.05)
+
+        breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+        try:
+            breaker.allow()
+        except CircuitOpenError:
+            pass
+        else:
+            assert False, 'an open circuit should fail fast'
+
+        # one trial request is let through once the timeout passes
+        time.sleep(0.06)
+        breaker.allow()
+        assert breaker.state == HALF_OPEN
+
+        try:
+            breaker.allow()
+        except CircuitOpenError:
+            pass
+        else:
+            assert False, 'only one trial request should be sent'
+
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.failures == 0
+
+    def test_failed_trial(self):
+        """Retry Test: A failed trial opens the circuit again"""
+        breaker = CircuitBreaker('accounts', failure_threshold=5, reset_timeout=0.01)
+        for _ in xrange(5):
+            breaker.record_failure()
+
+        time.sleep(0.02)
+        breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+    def test_families(self):
+        """Retry Test: Each endpoint family has its own circuit"""
+        policy = RetryPolicy(retries=0, failure_threshold=2)
+
+        for _ in xrange(2):
+            policy.send('transactions', 'GET', Sender(FakeResponse(503)))
+
+        send = Sender(FakeResponse(200))
+        assert policy.send('accounts', 'GET', send).status_code == 200
+
+        try:
+            policy.send('transactions', 'GET', send)
+        except CircuitOpenError:
+            pass
+        else:
+            assert False, 'the transactions circuit should be open'
+
+        assert send.calls == 1
+        assert policy.breaker('transactions') is policy.breakers()['transactions']
+        assert policy.breakers()['accounts'].state == CLOSED
+
+    def test_client_errors(self):
+        """Retry Test: Client errors do not open the circuit"""
+        policy = RetryPolicy(failure_threshold=1)
+        policy.send('accounts', 'GET', Sender(FakeResponse(404)))
+
+        assert policy.breaker('accounts').state == CLOSED
+
+
+class TestClientRetries(object):
+    """Test retries of client requests"""
+    def client(self, *outcomes):
+        return fake_client(*outcomes, objectify=False, retry=RetryPolicy(backoff=0.001, timeout=(1, 2)))
+
+    def test_get(self):
+        """Retry Test: Client GETs are retried with a timeout"""
+        client = self.client(FakeResponse(502), Timeout(), FakeResponse(200, content='<Accounts/>'))
+
+        assert client.get_customer_accounts().content == '<Accounts/>'
+        assert client.client.requests == [('GET', 'https://localhost/v1/accounts', (1, 2))] * 3
+
+    @raises(HTTPError)
+    def test_post(self):
+        """Retry Test: Adding a login is not retried"""
+        client = self.client(FakeResponse(503), FakeResponse(201))
+
+        try:
+            client._make_request('institutions/100000/logins', 'POST', '<InstitutionLogin/>')
+        finally:
+            assert len(client.client.requests) == 1
@@ -0,0 +1,129 @@
+from __future__ import absolute_import
+
+import re
+import base64
+from hashlib import sha1
+
+from nose.plugins.skip import SkipTest
+from nose.tools import raises
+
+from ..saml import (
+    SAML, SIGNERS, SAML_SIGNED_INFO, Signer, M2CryptoSigner, CryptographySigner,
+    get_signer, sign_assertions
+)
+from .fakes import fake_client
+
+KEY = 'aggcat/tests/data/test.key'
+CERT = 'aggcat/tests/data/test.crt'
+
+
+def signer(name):
+    try:
+        return get_signer(KEY, name)
+    except ImportError:
+        raise SkipTest('%s is not installed' % name)
+
+
+def verify(assertion):
+    """Check the digest and signature of an assertion against the test certificate"""
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+    except ImportError:
+        raise SkipTest('cryptography is not installed')
+
+    xml = base64.b64decode(assertion)
+    assertion_id = re.search(r'ID="_(\w+)"', xml).group(1)
+    digest = re.search(r'<ds:DigestValue>(.*?)</ds:DigestValue>', xml).group(1)
+    signature = re.search(r'<ds:SignatureValue>(.*?)</ds:SignatureValue>', xml).group(1)
+
+    # the digest is of the assertion without its signature
+    unsigned = re.sub(r'<ds:Signature .*</ds:Signature>', '', xml)
+    assert base64.b64encode(sha1(unsigned).digest()) == digest
+
+    with open(CERT, 'rb') as f:
+        public_key = x509.load_pem_x509_certificate(f.read(), default_backend()).public_key()
+
+    signed_info = SAML_SIGNED_INFO % {'assertion_id': assertion_id, 'signed_digest_value': digest}
+    public_key.verify(base64.b64decode(signature), signed_info, padding.PKCS1v15(), hashes.SHA1())
+
+    return xml
+
+
+class TestSigners(object):
+    """Test SAML signer backends"""
+    def test_backends(self):
+        """SAML Test: Every backend signs assertions Intuit can verify"""
+        for name in SIGNERS:
+            xml = verify(SAML(KEY, 'provider', 1234, name).assertion())
+            assert '>1234</saml2:NameID>' in xml
+
+    def test_same_signature(self):
+        """SAML Test: The backends make the same signature"""
+        m2crypto = signer('m2crypto')
+        cryptography = signer('cryptography')
+
+        assert isinstance(m2crypto, M2CryptoSigner)
+        assert isinstance(cryptography, CryptographySigner)
+        assert m2crypto.sign('signed info') == cryptography.sign('signed info')
+
+    def test_shared_signer(self):
+        """SAML Test: Signers are loaded once per process and can be passed in"""
+        cryptography = signer('cryptography')
+
+        assert get_signer(KEY, 'cryptography') is cryptography
+        assert get_signer(KEY, cryptography) is cryptography
+        assert SAML(KEY, 'provider', 1, cryptography).signer is cryptography
+        assert SAML(KEY, 'provider', 1, 'cryptography').rsa is cryptography.key
+
+    @raises(ValueError)
+    def test_unknown_signer(self):
+        """SAML Test: Unknown signer backends are rejected"""
+        get_signer(KEY, 'pycrypto')
+
+    @raises(NotImplementedError)
+    def test_signer_interface(self):
+        """SAML Test: Signers must load a key"""
+        Signer(KEY)
+
+
+class TestSignAssertions(object):
+    """Test batch signing"""
+    def check(self, assertions, customer_ids):
+        assert len(assertions) == len(customer_ids)
+        assert len(set(assertions)) == len(customer_ids)
+
+        for assertion, customer_id in zip(assertions, customer_ids):
+            xml = verify(assertion)
+            assert '>%s</saml2:NameID>' % customer_id in xml
+
+    def test_in_process(self):
+        """SAML Test: Assertions are signed in order in this process"""
+        customer_ids = range(10)
+        self.check(sign_assertions(KEY, 'provider', customer_ids, processes=1, chunksize=3), customer_ids)
+
+    def test_processes(self):
+        """SAML Test: Assertions are signed in order on a process pool"""
+        customer_ids = ['customer%s' % i for i in xrange(50)]
+        signer('cryptography')
+
+        assertions = sign_assertions(KEY, 'provider', customer_ids, signer='cryptography', processes=2, chunksize=7)
+        self.check(assertions, customer_ids)
+
+    def test_empty(self):
+        """SAML Test: No customers means no assertions"""
+        assert sign_assertions(KEY, 'provider', []) == []
+
+    def test_token_exchange(self):
+        """SAML Test: A client exchanges an assertion from sign_assertions once then signs its own"""
+        assertion, = sign_assertions(KEY, 'provider', [1234], processes=1)
+        client = fake_client(assertion=assertion)
+        transport = client.transport
+        assert transport.assertions == [assertion]
+
+        client._refresh_client()
+        assert len(transport.assertions) == 2
+        assert transport.assertions[1] != assertion
+        assert '>1234</saml2:NameID>' in verify(transport.assertions[1])
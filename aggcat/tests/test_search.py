@@ -0,0 +1,90 @@
+from __future__ import absolute_import
+
+import os
+import tempfile
+
+from ..search import InstitutionIndex
+
+INSTITUTIONS = (
+    '<Institutions xmlns="http://schema.intuit.com/platform/fdatafeed/institution/v1">'
+    '<institution><institutionId>13278</institutionId><institutionName>JP Morgan Chase Bank</institutionName>'
+    '<homeUrl>https://www.chase.com/</homeUrl></institution>'
+    '<institution><institutionId>14554</institutionId><institutionName>Chase Bank Credit Card (Amazon.com)</institutionName>'
+    '<homeUrl>https://www.chase.com/</homeUrl></institution>'
+    '<institution><institutionId>13718</institutionId><institutionName>Fox Chase Bank</institutionName>'
+    '<homeUrl>https://www.foxchasebank.com/</homeUrl></institution>'
+    '<institution><institutionId>100000</institutionId><institutionName>CCBank-EWS</institutionName>'
+    '<homeUrl>http://www.intuit.com/</homeUrl></institution>'
+    '<institution><institutionId>14007</institutionId><institutionName>Bank of America</institutionName>'
+    '<homeUrl>https://www.bankofamerica.com/</homeUrl></institution>'
+    '</Institutions>'
+)
+
+
+class TestInstitutionIndex(object):
+    """Test searching institutions"""
+    def setup(self):
+        self.index = InstitutionIndex.from_xml(INSTITUTIONS)
+
+    def ids(self, query, **kwargs):
+        return [r.institution_id for r in self.index.search(query, **kwargs)]
+
+    def test_exact(self):
+        """Search Test: Every word must match and names starting with the query rank first"""
+        assert len(self.index) == 5
+        assert self.ids('chase') == ['14554', '13718', '13278']
+        assert self.ids('chase bank', limit=1) == ['14554']
+        assert self.ids('fox chase') == ['13718']
+        assert self.ids('chase america') == []
+        assert self.ids('') == []
+
+    def test_prefix(self):
+        """Search Test: The words of a query match as prefixes"""
+        assert self.ids('jp morg') == ['13278']
+        assert self.ids('amer') == ['14007']
+
+    def test_max_expansions(self):
+        """Search Test: Prefixes of more than max_expansions words keep the most common words"""
+        institutions = [(str(i), u'Alpha%03d Bank' % i, None) for i in xrange(150)]
+        institutions += [(str(1000 + i), u'Alphaz Credit Union', None) for i in xrange(3)]
+        index = InstitutionIndex(institutions)
+
+        ids = [r.institution_id for r in index.search('alpha', limit=None, fuzzy=False)]
+        # alphaz and 99 of the other words
+        assert len(ids) == 102
+        assert set([u'1000', u'1001', u'1002']) < set(ids)
+
+        ids = [r.institution_id for r in index.search('alpha', limit=None, fuzzy=False, max_expansions=None)]
+        assert len(ids) == 153
+
+        for max_expansions in (1, 120):
+            ids = [r.institution_id for r in index.search('alpha', limit=None, fuzzy=False, max_expansions=max_expansions)]
+            assert len(ids) == max_expansions + 2
+            assert set([u'1000', u'1001', u'1002']) <= set(ids)
+
+    def test_fuzzy(self):
+        """Search Test: Words with typos match through trigrams"""
+        assert self.ids('jp morgn') == ['13278']
+        assert self.ids('amercia') == ['14007']
+        assert self.ids('amercia', fuzzy=False) == []
+
+    def test_url_and_id(self):
+        """Search Test: Institutions are found by home url and id"""
+        assert self.ids('intuit') == ['100000']
+        assert self.ids('bankofamerica') == ['14007']
+        assert self.ids('13718') == ['13718']
+
+    def test_serialize(self):
+        """Search Test: A saved index returns the same results"""
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+
+        try:
+            self.index.save(path)
+            index = InstitutionIndex.load(path)
+        finally:
+            os.remove(path)
+
+        assert len(index) == 5
+        for query in ('chase', 'jp morgn', '13718', 'amer'):
+            assert [r.institution_id for r in index.search(query)] == self.ids(query)
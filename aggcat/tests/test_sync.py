@@ -0,0 +1,130 @@
+from __future__ import absolute_import
+
+from nose.tools import raises
+
+from ..parser import Objectify
+from ..sync import TransactionSync, SQLiteStore
+
+CATEGORIZED = (
+    '<BankingTransaction><id>1</id><postedDate>2013-01-09T00:00:00-07:00</postedDate>'
+    '<amount>-10.00</amount><payeeName>Coffee</payeeName><pending>false</pending><categorization>'
+    '<common><normalizedPayeeName>Coffee</normalizedPayeeName></common>'
+    '<context><source>AAN</source><categoryName>Food</categoryName></context>'
+    '<context><source>USER</source><categoryName>%s</categoryName></context>'
+    '</categorization></BankingTransaction>'
+)
+
+
+class Transaction(object):
+    def __init__(self, id, posted_date, amount, payee_name, pending='false'):
+        self.id = id
+        self.posted_date = posted_date
+        self.amount = amount
+        self.payee_name = payee_name
+        self.pending = pending
+
+
+class Response(object):
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.transactions = []
+        self.requests = []
+
+    def get_account_transactions(self, account_id, start_date, end_date=None, stream=False):
+        self.requests.append((start_date, end_date))
+        return Response(iter([
+            t for t in self.transactions
+            if not t.posted_date or start_date <= t.posted_date[:10] <= end_date
+        ]))
+
+
+class TestSync(object):
+    """Test incremental transaction sync"""
+    def setup(self):
+        self.client = FakeClient()
+        self.store = SQLiteStore(':memory:')
+        self.sync = TransactionSync(self.client, self.store, overlap_days=5)
+
+    def changes(self, end_date, start_date=None):
+        return [
+            (c.kind, c.transaction.id, c.previous_id)
+            for c in self.sync.sync(1, start_date, end_date)
+        ]
+
+    @raises(ValueError)
+    def test_first_sync_needs_start_date(self):
+        """Sync Test: The first sync of an account needs a start date"""
+        self.sync.sync(1)
+
+    def test_incremental(self):
+        """Sync Test: Only changes since the last sync are returned"""
+        self.client.transactions = [
+            Transaction('1', '2013-01-02T00:00:00-07:00', '-10.00', 'Coffee'),
+            Transaction('2', '2013-01-09T00:00:00-07:00', '-20.00', 'Gas', 'true'),
+            Transaction('3', '2013-01-09T00:00:00-07:00', '-5.00', 'Lunch', 'true'),
+        ]
+
+        assert self.changes('2013-01-10', '2013-01-01') == [
+            ('insert', '1', None),
+            ('insert', '2', None),
+            ('insert', '3', None),
+        ]
+        assert self.store.get_mark(1) == '2013-01-10'
+
+        # nothing changed
+        assert self.changes('2013-01-10') == []
+        assert self.client.requests[-1] == ('2013-01-05', '2013-01-10')
+
+        # 2 posts under a new id, 3 posts with the same id, a new transaction shows up
+        self.client.transactions = [
+            Transaction('1', '2013-01-02T00:00:00-07:00', '-10.00', 'Coffee'),
+            Transaction('3', '2013-01-09T00:00:00-07:00', '-5.00', 'Lunch'),
+            Transaction('4', '2013-01-10T00:00:00-07:00', '-20.00', 'Gas'),
+            Transaction('5', '2013-01-11T00:00:00-07:00', '-1.00', 'Gum'),
+        ]
+
+        assert self.changes('2013-01-12') == [
+            ('posted', '3', None),
+            ('posted', '4', '2'),
+            ('insert', '5', None),
+        ]
+
+        # transaction 1 is now older than the overlap and was forgotten
+        assert sorted(self.store.get_transactions(1, '2000-01-01').keys()) == ['3', '4', '5']
+
+    def test_update(self):
+        """Sync Test: Changed transactions are updates"""
+        self.client.transactions = [Transaction('1', '2013-01-09T00:00:00-07:00', '-10.00', 'Coffee')]
+        self.changes('2013-01-10', '2013-01-01')
+
+        self.client.transactions = [Transaction('1', '2013-01-09T00:00:00-07:00', '-12.00', 'Coffee')]
+
+        assert self.changes('2013-01-10') == [('update', '1', None)]
+
+    def test_update_list_child(self):
+        """Sync Test: A change in a repeated child element is an update"""
+        self.client.transactions = [Objectify(CATEGORIZED % 'Dining').get_object()]
+        self.changes('2013-01-10', '2013-01-01')
+
+        self.client.transactions = [Objectify(CATEGORIZED % 'Dining').get_object()]
+        assert self.changes('2013-01-10') == []
+
+        self.client.transactions = [Objectify(CATEGORIZED % 'Coffee Shops').get_object()]
+        assert self.changes('2013-01-10') == [('update', '1', None)]
+
+    def test_undated(self):
+        """Sync Test: Transactions without a date are matched by id"""
+        self.client.transactions = [Transaction('1', None, '-10.00', 'Coffee')]
+
+        assert self.changes('2013-01-10', '2013-01-01') == [('insert', '1', None)]
+        assert self.changes('2013-01-20') == []
+        assert self.changes('2013-02-20') == []
+
+        # and forgotten once they stop coming back
+        self.client.transactions = []
+        assert self.changes('2013-02-21') == []
+        assert self.store.get_transactions(1, '2000-01-01') == {}
@@ -0,0 +1,132 @@
+from __future__ import absolute_import
+
+import time
+import threading
+
+from ..tokens import TokenManager
+from .fakes import FakeResponse, FakeSession, fake_client
+
+REJECTED = {'www-authenticate': 'OAuth oauth_problem="token_rejected"'}
+
+
+class TestTokenManager(object):
+    """Test OAuth token lifecycle"""
+    def setup(self):
+        self.fetches = 0
+        self.refreshed = []
+
+    def fetch(self):
+        self.fetches += 1
+        time.sleep(0.01)
+        return {'oauth_token': ['token%s' % self.fetches]}
+
+    def test_initial_fetch(self):
+        """Token Test: Tokens are fetched and announced on creation"""
+        tokens = TokenManager(self.fetch, self.refreshed.append)
+
+        assert self.fetches == 1
+        assert tokens.generation == 1
+        assert self.refreshed == [{'oauth_token': ['token1']}]
+        assert not tokens.needs_refresh()
+
+    def test_stale_generation(self):
+        """Token Test: Refreshing an old generation does not fetch again"""
+        tokens = TokenManager(self.fetch)
+        generation = tokens.generation
+
+        tokens.refresh(generation)
+        tokens.refresh(generation)
+
+        assert self.fetches == 2
+        assert tokens.tokens == {'oauth_token': ['token2']}
+
+    def test_single_flight(self):
+        """Token Test: Concurrent refreshes share a single fetch"""
+        tokens = TokenManager(self.fetch)
+        generation = tokens.generation
+
+        threads = [threading.Thread(target=tokens.refresh, args=(generation,)) for i in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert self.fetches == 2
+        assert tokens.generation == 2
+
+    def test_ensure_fresh(self):
+        """Token Test: Tokens inside the refresh margin are refreshed"""
+        tokens = TokenManager(self.fetch, lifetime=10, refresh_margin=20)
+        tokens.ensure_fresh()
+
+        assert self.fetches == 2
+
+    def test_background_refresh(self):
+        """Token Test: Tokens are refreshed in the background before they expire"""
+        tokens = TokenManager(self.fetch, lifetime=0.2, refresh_margin=0.1, background=True)
+        time.sleep(0.5)
+        tokens.stop()
+
+        assert self.fetches >= 3
+
+
+class RejectingSession(FakeSession):
+    """Hold the first two requests until both are sent so they are rejected together"""
+    def __init__(self):
+        FakeSession.__init__(
+            self,
+            FakeResponse(401, REJECTED), FakeResponse(401, REJECTED),
+            FakeResponse(200, content='<Accounts/>'), FakeResponse(200, content='<Accounts/>')
+        )
+        self.both_sent = threading.Event()
+
+    def _request(self, method, url, **kwargs):
+        response = FakeSession._request(self, method, url, **kwargs)
+
+        if len(self.requests) == 2:
+            self.both_sent.set()
+        if len(self.requests) <= 2:
+            assert self.both_sent.wait(5)
+
+        return response
+
+
+class TestClientTokens(object):
+    """Test how the client uses its tokens"""
+    def test_rejected_together(self):
+        """Token Test: Requests rejected together share one refresh and replay once each"""
+        session = RejectingSession()
+        client = fake_client(session=session, objectify=False)
+        generation = client.tokens.generation
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(client.get_customer_accounts())) for _ in xrange(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # the token exchange when the client was created and one refresh
+        assert len(client.transport.assertions) == 2
+        assert client.tokens.generation == generation + 1
+
+        assert len(session.requests) == 4
+        assert [r.status_code for r in results] == [200, 200]
+
+    def test_no_second_replay(self):
+        """Token Test: A replayed request is not replayed again when its tokens are rejected"""
+        client = fake_client(FakeResponse(401, REJECTED), FakeResponse(401, REJECTED), FakeResponse(200))
+
+        assert client.get_customer_accounts().status_code == 401
+        assert len(client.client.requests) == 2
+        assert len(client.transport.assertions) == 2
+
+    def test_close(self):
+        """Token Test: Closing a client stops its background refresh"""
+        client = fake_client(background_refresh=True)
+        thread = client.tokens._thread
+        assert thread.is_alive()
+
+        client.close()
+        assert not thread.is_alive()
+        assert client.tokens._thread is None
@@ -0,0 +1,33 @@
+from __future__ import absolute_import
+
+import requests
+
+from ..transport import Transport, default_transport
+
+
+class TestTransport(object):
+    """Test Transport"""
+    def test_shared_adapter(self):
+        """Transport Test: Mounted sessions share the connection pool"""
+        transport = Transport(pool_connections=2, pool_maxsize=20)
+        session = transport.mount(requests.Session())
+
+        assert session.get_adapter('https://oauth.intuit.com') is transport.adapter
+        assert transport.session.get_adapter('https://oauth.intuit.com') is transport.adapter
+        assert 'Connection' not in session.headers or session.headers['Connection'] != 'close'
+
+    def test_keep_alive_disabled(self):
+        """Transport Test: Disabling keep alive closes connections"""
+        transport = Transport(keep_alive=False)
+        session = transport.mount(requests.Session())
+
+        assert session.headers['Connection'] == 'close'
+
+    def test_default_transport(self):
+        """Transport Test: The default transport is shared"""
+        assert default_transport() is default_transport()
+
+    def test_pool_block(self):
+        """Transport Test: The pool size can be made a limit"""
+        assert not Transport().adapter._pool_block
+        assert Transport(pool_block=True).adapter._pool_block
@@ -0,0 +1,43 @@
+from __future__ import absolute_import
+
+from lxml import etree
+
+from ..utils import remove_namespaces, strip_namespaces
+
+
+class TestUtils(object):
+    """Test Utilities"""
+    @classmethod
+    def setup_class(self):
+        self.xml = (
+            '<InstitutionDetail xmlns="http://schema.intuit.com/platform/fdatafeed/institution/v1" '
+            'xmlns:ns2="http://schema.intuit.com/platform/fdatafeed/common/v1">'
+            '<institutionId>100000</institutionId>'
+            '<address ns2:type="home"><ns2:city>Louisville</ns2:city></address>'
+            '</InstitutionDetail>'
+        )
+
+    def test_remove_namespaces(self):
+        """Utils Test: remove namespaces returns namespace free xml"""
+        xml = remove_namespaces(etree.XML(self.xml))
+
+        assert 'xmlns' not in xml
+        assert etree.fromstring(xml).xpath('./address/city')[0].text == 'Louisville'
+
+    def test_strip_namespaces(self):
+        """Utils Test: strip namespaces rewrites the tree in place"""
+        tree = etree.XML(self.xml)
+        root = strip_namespaces(tree)
+
+        assert root is tree
+        assert root.tag == 'InstitutionDetail'
+        assert root.xpath('./institutionId')[0].text == '100000'
+        assert root.xpath('./address')[0].get('type') == 'home'
+        assert root.xpath('./address/city')[0].text == 'Louisville'
+
+    def test_strip_namespaces_matches_remove_namespaces(self):
+        """Utils Test: strip namespaces serializes the same as remove namespaces"""
+        stripped = etree.tostring(strip_namespaces(etree.XML(self.xml)))
+        removed = etree.tostring(etree.fromstring(remove_namespaces(etree.XML(self.xml))))
+
+        assert stripped == removed
@@ -0,0 +1,116 @@
+from __future__ import absolute_import
+
+import time
+import threading
+
+
+class TokenManager(object):
+    """Keep a set of OAuth tokens fresh
+
+    :param fetch: A callable that returns new tokens
+    :param on_refresh: (optional) A callable that is passed the tokens every time they change
+    :param integer lifetime: (optional) Seconds the tokens are valid for once issued. Default: ``3600``
+    :param integer refresh_margin: (optional) Refresh the tokens this many seconds before they expire. Default: ``300``
+    :param boolean background: (optional) Refresh the tokens from a background thread before they
+                               expire instead of on the next request. Default: ``False``
+
+    Only one refresh happens at a time. Callers pass the :attr:`generation` of the tokens they
+    used to :meth:`refresh` so that when many of them find the same tokens rejected they wait
+    on a single token exchange instead of each doing their own.
+    """
+    def __init__(self, fetch, on_refresh=None, lifetime=3600, refresh_margin=300, background=False):
+        self._fetch = fetch
+        self._on_refresh = on_refresh
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.lifetime = lifetime
+        self.refresh_margin = refresh_margin
+
+        # seconds to wait before retrying a failed background refresh
+        self.retry_interval = 30
+
+        self.tokens = None
+        self.issued_at = None
+        self.generation = 0
+
+        self.refresh()
+
+        if background:
+            self.start()
+
+    @property
+    def expires_at(self):
+        """Time the current tokens expire"""
+        return self.issued_at + self.lifetime
+
+    def needs_refresh(self):
+        """Check if the tokens are expired or about to expire"""
+        return time.time() >= self.expires_at - self.refresh_margin
+
+    def refresh(self, generation=None):
+        """Get new tokens and return them
+
+        :param integer generation: (optional) The generation of the tokens the caller found
+                                   stale. If they have already been replaced the current
+                                   tokens are returned without fetching new ones.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return self.tokens
+
+            tokens = self._fetch()
+
+            self.tokens = tokens
+            self.issued_at = time.time()
+
+            if self._on_refresh is not None:
+                self._on_refresh(tokens)
+
+            # bump the generation last so anyone who sees it also sees
+            # whatever on_refresh built from the new tokens
+            self.generation += 1
+
+            return tokens
+
+    def ensure_fresh(self):
+        """Refresh the tokens now if they are about to expire"""
+        if self.needs_refresh():
+            self.refresh(self.generation)
+
+    def start(self):
+        """Start refreshing tokens in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='aggcat-token-refresh')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stopped.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """Background thread loop"""
+        while not self._stopped.is_set():
+            wait = self.expires_at - self.refresh_margin - time.time()
+
+            if wait > 0:
+                self._stopped.wait(wait)
+                continue
+
+            try:
+                self.refresh(self.generation)
+            except Exception:
+                # the next request will refresh synchronously if this keeps failing
+                self._stopped.wait(self.retry_interval)
+
+    def __repr__(self):
+        return '<TokenManager generation %s @ %s>' % (self.generation, hex(id(self)))
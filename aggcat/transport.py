@@ -0,0 +1,84 @@
+from __future__ import absolute_import
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class Transport(object):
+    """A pool of keep-alive HTTP connections shared by the SAML token exchange
+    and every OAuth session built by :class:`AggcatClient`
+
+    :param integer pool_connections: (optional) Number of hosts to keep connection pools for. Default: ``10``
+    :param integer pool_maxsize: (optional) Number of connections per host kept open for reuse. More are opened
+                                 when more requests are in flight and closed once they finish, unless
+                                 ``pool_block`` is set. Default: ``10``
+    :param boolean pool_block: (optional) Make ``pool_maxsize`` a limit. Requests wait for a free
+                               connection instead of opening another one. Default: ``False``
+    :param boolean keep_alive: (optional) Keep connections open between requests. Default: ``True``
+
+    Connections live in the transport and not in the sessions that use it so they survive
+    token refreshes. A single transport can be shared by many clients::
+
+        from aggcat import AggcatClient
+        from aggcat.transport import Transport
+
+        transport = Transport(pool_maxsize=50)
+
+        client = AggcatClient(
+            'oauth_consumer_key',
+            'oauth_consumer_secret',
+            'saml_identity_provider_id',
+            'customer_id',
+            '/path/to/x509/appname.key',
+            transport=transport
+        )
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, keep_alive=True, pool_block=False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+
+        # the adapter holds the connection pools
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+
+        # plain session used for requests that are not OAuth signed
+        self.session = self.mount(requests.Session())
+
+    def mount(self, session):
+        """Make `session` send its requests through the shared connection pools"""
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def post(self, url, **kwargs):
+        """Send an unsigned POST request"""
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        """Close all of the pooled connections"""
+        self.adapter.close()
+
+    def __repr__(self):
+        return '<Transport %s connections per host @ %s>' % (self.pool_maxsize, hex(id(self)))
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def default_transport():
+    """The process wide :class:`Transport` used by clients that are not given one"""
+    global _default_transport
+
+    with _default_transport_lock:
+        if _default_transport is None:
+            _default_transport = Transport()
+
+    return _default_transport
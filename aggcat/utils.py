@@ -1,35 +1,79 @@
 from StringIO import StringIO
 from lxml import etree
 
+# stylesheet used by remove_namespaces()
+REMOVE_NAMESPACES_XSL = """
+    <xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+    <xsl:output method="xml" indent="no"/>
+
+    <xsl:template match="/|comment()|processing-instruction()">
+        <xsl:copy>
+          <xsl:apply-templates/>
+        </xsl:copy>
+    </xsl:template>
+
+    <xsl:template match="*">
+        <xsl:element name="{local-name()}">
+          <xsl:apply-templates select="@*|node()"/>
+        </xsl:element>
+    </xsl:template>
+
+    <xsl:template match="@*">
+        <xsl:attribute name="{local-name()}">
+          <xsl:value-of select="."/>
+        </xsl:attribute>
+    </xsl:template>
+    </xsl:stylesheet>
+"""
+
+# compile the stylesheet once when the module is imported instead of on every call
+REMOVE_NAMESPACES_XSLT = etree.XSLT(etree.XML(REMOVE_NAMESPACES_XSL))
+
+# cache of {namespace}tag -> tag. The Intuit schemas only use a small
+# set of tag names so this stays tiny
+_local_names = {}
+
+
+def _local_name(tag):
+    """Return the tag or attribute name without its namespace"""
+    try:
+        return _local_names[tag]
+    except KeyError:
+        local_name = tag[tag.find('}') + 1:]
+        _local_names[tag] = local_name
+        return local_name
+
+
+def strip_namespaces(tree):
+    """Remove the namespaces from an lxml tree in place and return the root element.
+
+    This is the fast path for :func:`remove_namespaces`. The tags are rewritten
+    on the existing tree so there is no XSLT transform, serialization or re-parse.
+    """
+    if hasattr(tree, 'getroot'):
+        tree = tree.getroot()
+
+    for element in tree.iter(etree.Element):
+        tag = element.tag
+        if tag[0] == '{':
+            element.tag = _local_name(tag)
+
+        for name in element.attrib.keys():
+            if name[0] == '{':
+                element.attrib[_local_name(name)] = element.attrib.pop(name)
+
+    # drop the now unused xmlns declarations
+    etree.cleanup_namespaces(tree)
+
+    return tree
+
 
 def remove_namespaces(tree):
-        io = StringIO()
-        """Remove the namspaces from XML for easier parsing"""
-        xslt = """
-            <xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
-            <xsl:output method="xml" indent="no"/>
-
-            <xsl:template match="/|comment()|processing-instruction()">
-                <xsl:copy>
-                  <xsl:apply-templates/>
-                </xsl:copy>
-            </xsl:template>
-
-            <xsl:template match="*">
-                <xsl:element name="{local-name()}">
-                  <xsl:apply-templates select="@*|node()"/>
-                </xsl:element>
-            </xsl:template>
-
-            <xsl:template match="@*">
-                <xsl:attribute name="{local-name()}">
-                  <xsl:value-of select="."/>
-                </xsl:attribute>
-            </xsl:template>
-            </xsl:stylesheet>
-        """
-        xslt_root = etree.XML(xslt)
-        transform = etree.XSLT(xslt_root)
-        parsed_tree = transform(tree)
-        parsed_tree.write(io)
-        return io.getvalue()
+    """Remove the namspaces from XML for easier parsing and return it as a string.
+
+    Use :func:`strip_namespaces` if you are going to parse the result again.
+    """
+    io = StringIO()
+    parsed_tree = REMOVE_NAMESPACES_XSLT(tree)
+    parsed_tree.write(io)
+    return io.getvalue()
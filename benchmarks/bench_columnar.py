@@ -0,0 +1,46 @@
+"""Compare building rows from objectified transactions by hand with
+decoding transactions into NumPy columns
+
+Run from the repository root::
+
+    python -m benchmarks.bench_columnar
+"""
+from __future__ import absolute_import
+
+import timeit
+
+from aggcat.columnar import decode_transactions
+from aggcat.parser import Objectify
+
+from .payloads import transactions_xml
+
+XML = transactions_xml(20000)
+
+
+def rows_by_hand():
+    """Objectify, build rows attribute by attribute and total the spending by category"""
+    totals = {}
+    for t in Objectify(XML).get_object():
+        category = t.categorization.context.category_name
+        totals[category] = totals.get(category, 0) + float(t.amount)
+    return totals
+
+
+def columns():
+    """Decode into columns and total the spending by category"""
+    return decode_transactions(XML).totals_by('category')
+
+
+def main(repeat=3):
+    print 'payload size: %.1f MB' % (len(XML) / 1024.0 / 1024.0)
+
+    for func in (rows_by_hand, columns):
+        print '%-20s %.4f sec' % (func.__name__, min(timeit.repeat(func, number=1, repeat=repeat)))
+
+    decoded = decode_transactions(XML)
+    seconds = min(timeit.repeat(lambda: decoded.totals_by('category'), number=100, repeat=repeat)) / 100
+    print '%-20s %.3f ms' % ('aggregate columns', seconds * 1000)
+
+
+if __name__ == '__main__':
+    main()
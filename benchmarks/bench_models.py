@@ -0,0 +1,70 @@
+"""Compare objectifying a transaction list with decoding it into typed models
+
+Run from the repository root::
+
+    python -m benchmarks.bench_models
+"""
+from __future__ import absolute_import
+
+import sys
+import timeit
+from decimal import Decimal
+
+from aggcat import models
+from aggcat.parser import Objectify
+
+from .payloads import transactions_xml
+
+XML = transactions_xml(20000)
+
+
+def objectify():
+    """Objectify and convert the amounts by hand"""
+    return sum(Decimal(t.amount) for t in Objectify(XML).get_object())
+
+
+def typed_models():
+    """Decode straight into typed records"""
+    return sum(t.amount for t in models.decode(XML))
+
+
+def streamed_models():
+    """Decode typed records one at a time"""
+    return sum(t.amount for t in models.iterdecode(XML))
+
+
+def deep_size(obj, seen=None):
+    """Bytes used by an object and everything reachable through its attributes"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen or obj is None:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, basestring):
+        return size
+
+    if isinstance(obj, list):
+        return size + sum(deep_size(item, seen) for item in obj)
+
+    for name in getattr(type(obj), '_attributes', None) or getattr(type(obj), '__slots__', ()):
+        if name != 'to_xml':
+            size += deep_size(getattr(obj, name, None), seen)
+
+    return size
+
+
+def main(repeat=3):
+    print 'payload size: %.1f MB' % (len(XML) / 1024.0 / 1024.0)
+
+    for func in (objectify, typed_models, streamed_models):
+        print '%-20s %.4f sec' % (func.__name__, min(timeit.repeat(func, number=1, repeat=repeat)))
+
+    objectified = list(Objectify(XML).get_object())
+    records = models.decode(XML)
+    print '%-20s %.1f MB' % ('objectified records', deep_size(objectified) / 1024.0 / 1024.0)
+    print '%-20s %.1f MB' % ('typed records', deep_size(records) / 1024.0 / 1024.0)
+
+
+if __name__ == '__main__':
+    main()
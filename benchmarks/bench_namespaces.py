@@ -0,0 +1,51 @@
+"""Compare namespace removal strategies on a ``get_institutions`` sized payload
+
+Run from the repository root::
+
+    python -m benchmarks.bench_namespaces
+"""
+from __future__ import absolute_import
+
+import timeit
+from StringIO import StringIO
+
+from lxml import etree
+
+from aggcat.utils import REMOVE_NAMESPACES_XSL, remove_namespaces, strip_namespaces
+
+from .payloads import institutions_xml
+
+XML = institutions_xml()
+
+
+def compile_per_call():
+    """The original behaviour: compile the XSLT, transform, serialize and re-parse"""
+    io = StringIO()
+    transform = etree.XSLT(etree.XML(REMOVE_NAMESPACES_XSL))
+    transform(etree.XML(XML)).write(io)
+    return etree.fromstring(io.getvalue())
+
+
+def compiled_xslt():
+    """Compiled XSLT, serialize and re-parse"""
+    return etree.fromstring(remove_namespaces(etree.XML(XML)))
+
+
+def in_place():
+    """Rewrite the tags on the parsed tree"""
+    return strip_namespaces(etree.XML(XML))
+
+
+def main(repeat=5):
+    print 'payload size: %.1f MB' % (len(XML) / 1024.0 / 1024.0)
+
+    results = {}
+    for func in (compile_per_call, compiled_xslt, in_place):
+        results[func.__name__] = min(timeit.repeat(func, number=1, repeat=repeat))
+        print '%-20s %.4f sec' % (func.__name__, results[func.__name__])
+
+    print 'speedup: %.1fx' % (results['compile_per_call'] / results['in_place'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Pin the throughput of :class:`aggcat.parser.Objectify` on a large transaction list
+and compare it with the original recursive walker
+
+Run from the repository root::
+
+    python -m benchmarks.bench_parser
+"""
+from __future__ import absolute_import
+
+import timeit
+from collections import Counter
+
+from aggcat.parser import Objectify, clean_tag_name
+
+from .payloads import transactions_xml
+
+COUNT = 20000
+XML = transactions_xml(COUNT)
+
+
+class RecursiveObjectify(Objectify):
+    """The walker before it was made iterative: an XPath and a Counter per interior
+    element and a recursive call per element"""
+    def _is_list_xml(self, element):
+        tags = []
+        for e in element.xpath('./*'):
+            tags.append(e.tag)
+
+        for count in Counter(tags).values():
+            if count > 1:
+                return True
+
+        return False
+
+    def _walk_and_objectify(self, element, obj):
+        if element.getchildren():
+            needs_list_obj = self._is_list_xml(element)
+
+            attributes = self._child_attributes(element)
+
+            if needs_list_obj:
+                new_obj = self._create_list_object(element.tag, attributes)
+            else:
+                new_obj = self._create_object(element.tag, attributes)
+
+            obj_attr_value = getattr(obj, element.tag, None)
+            has_list = hasattr(obj, '_list')
+
+            if obj_attr_value is None and not has_list:
+                setattr(obj, element.tag, new_obj)
+            else:
+                l = getattr(obj, '_list')
+                l.append(new_obj)
+                setattr(obj, '_list', l)
+
+            for child in element.getchildren():
+                self._walk_and_objectify(child, new_obj)
+        else:
+            setattr(obj, clean_tag_name(element.tag), element.text)
+
+
+def dump(obj):
+    """A comparable copy of an objectified tree"""
+    if obj is None or isinstance(obj, basestring):
+        return obj
+
+    attributes = tuple(
+        (name, dump(getattr(obj, name)))
+        for name in type(obj).__slots__
+        if name not in ('_list', 'to_xml') and hasattr(obj, name)
+    )
+    items = tuple(dump(item) for item in getattr(obj, '_list', ()))
+
+    return type(obj).__name__, attributes, items
+
+
+def main(repeat=3):
+    megabytes = len(XML) / 1024.0 / 1024.0
+    print 'payload size: %.1f MB, %d transactions' % (megabytes, COUNT)
+
+    assert dump(Objectify(XML).get_object()) == dump(RecursiveObjectify(XML).get_object())
+
+    for cls in (RecursiveObjectify, Objectify):
+        seconds = min(timeit.repeat(lambda: cls(XML).get_object(), number=1, repeat=repeat))
+        print '%-20s %.4f sec %8.0f transactions/sec %6.1f MB/sec' % (cls.__name__, seconds, COUNT / seconds, megabytes / seconds)
+
+
+if __name__ == '__main__':
+    main()
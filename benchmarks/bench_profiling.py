@@ -0,0 +1,44 @@
+"""Measure what profiling hooks cost when they are disabled and when the
+:class:`aggcat.profiling.PhaseCollector` is collecting
+
+Run from the repository root::
+
+    python -m benchmarks.bench_profiling
+"""
+from __future__ import absolute_import
+
+import timeit
+
+from aggcat import profiling
+from aggcat.parser import Objectify
+
+from .payloads import transactions_xml
+
+XML = transactions_xml(5000)
+
+
+def empty_phase():
+    with profiling.phase(profiling.NETWORK, 'accounts') as p:
+        p.add_bytes(1)
+
+
+def main(repeat=5, number=100000):
+    phase = min(timeit.repeat(empty_phase, number=number, repeat=repeat)) / number
+    objectify = min(timeit.repeat(lambda: Objectify(XML), number=1, repeat=repeat))
+    print '%-10s %8.3f usec per phase %8.4f sec objectify' % ('disabled', phase * 1e6, objectify)
+
+    collector = profiling.PhaseCollector()
+    profiling.add_hook(collector)
+    try:
+        phase = min(timeit.repeat(empty_phase, number=number, repeat=repeat)) / number
+        objectify = min(timeit.repeat(lambda: Objectify(XML), number=1, repeat=repeat))
+        print '%-10s %8.3f usec per phase %8.4f sec objectify' % ('collecting', phase * 1e6, objectify)
+    finally:
+        profiling.remove_hook(collector)
+
+    print
+    print collector.report()
+
+
+if __name__ == '__main__':
+    main()
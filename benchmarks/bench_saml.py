@@ -0,0 +1,42 @@
+"""Compare SAML assertions signed per second by each signer backend, one at a
+time and in batches on a process pool
+
+Run from the repository root::
+
+    python -m benchmarks.bench_saml
+"""
+from __future__ import absolute_import
+
+import time
+from multiprocessing import cpu_count
+
+from aggcat.saml import SAML, SIGNERS, get_signer, sign_assertions
+
+KEY = 'aggcat/tests/data/test.key'
+
+
+def rate(function, count):
+    start = time.time()
+    function()
+    return count / (time.time() - start)
+
+
+def main(count=5000):
+    processes = cpu_count()
+    customer_ids = range(count)
+    print 'assertions: %s, processes: %s' % (count, processes)
+
+    for name in sorted(SIGNERS):
+        try:
+            get_signer(KEY, name)
+        except ImportError:
+            print '%-14s not installed' % name
+            continue
+
+        single = rate(lambda: [SAML(KEY, 'provider', i, name).assertion() for i in customer_ids], count)
+        batch = rate(lambda: sign_assertions(KEY, 'provider', customer_ids, name, processes), count)
+        print '%-14s %8.0f/sec one at a time %8.0f/sec batched' % (name, single, batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Compare an :class:`aggcat.search.InstitutionIndex` with scanning the objectified
+institution list on a ``get_institutions`` sized payload
+
+Run from the repository root::
+
+    python -m benchmarks.bench_search
+"""
+from __future__ import absolute_import
+
+import timeit
+
+from aggcat.parser import Objectify
+from aggcat.search import InstitutionIndex
+
+from .payloads import institutions_xml
+
+XML = institutions_xml()
+QUERIES = ('bank number 117000', '117000', 'bank117000', 'numbr 117000')
+
+
+def scan(institutions, query):
+    """The manual way: look at every institution"""
+    query = query.lower()
+    return [i for i in institutions if query in i.institution_name.lower()]
+
+
+def main(repeat=5, number=100):
+    print 'payload size: %.1f MB' % (len(XML) / 1024.0 / 1024.0)
+
+    print '%-24s %.4f sec' % ('build index', min(timeit.repeat(lambda: InstitutionIndex.from_xml(XML), number=1, repeat=repeat)))
+
+    index = InstitutionIndex.from_xml(XML)
+    data = index.dumps()
+    print '%-24s %.4f sec (%.1f KB)' % ('load index', min(timeit.repeat(lambda: InstitutionIndex.loads(data), number=1, repeat=repeat)), len(data) / 1024.0)
+
+    institutions = Objectify(XML).get_object()
+    seconds = min(timeit.repeat(lambda: scan(institutions, 'bank number 117000'), number=1, repeat=repeat))
+    print '%-24s %.3f ms' % ('scan', seconds * 1000)
+
+    for query in QUERIES:
+        seconds = min(timeit.repeat(lambda: index.search(query), number=number, repeat=repeat)) / number
+        print '%-24s %.3f ms %s' % ('search %r' % query, seconds * 1000, index.search(query, limit=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""Synthetic Intuit payloads used by the benchmarks"""
+
+INSTITUTIONS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Institutions xmlns="http://schema.intuit.com/platform/fdatafeed/institution/v1" xmlns:ns2="http://schema.intuit.com/platform/fdatafeed/common/v1">%s</Institutions>"""
+
+INSTITUTION = """<institution><institutionId>%(id)s</institutionId><institutionName>Bank Number %(id)s</institutionName><homeUrl>https://www.bank%(id)s.com/</homeUrl><phoneNumber>1-800-555-0100</phoneNumber><address><ns2:address1>%(id)s Main St</ns2:address1><ns2:city>Louisville</ns2:city><ns2:state>KY</ns2:state><ns2:postalCode>40233</ns2:postalCode><ns2:country>USA</ns2:country></address><emailAddress>help@bank%(id)s.com</emailAddress><specialText>Please enter your Bank Number %(id)s User ID and Password required for login.</specialText><currencyCode>USD</currencyCode></institution>"""
+
+
+def institutions_xml(count=18000):
+    """A ``get_institutions`` response with `count` institutions. The default
+    is about the size of the real response (several megabytes)"""
+    return INSTITUTIONS % ''.join(INSTITUTION % {'id': i} for i in xrange(100000, 100000 + count))
+
+TRANSACTIONS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?><TransactionList xmlns="http://schema.intuit.com/platform/fdatafeed/transactionlist/v1" xmlns:ns2="http://schema.intuit.com/platform/fdatafeed/transaction/v1" xmlns:ns3="http://schema.intuit.com/platform/fdatafeed/bankingtransaction/v1">%s</TransactionList>"""
+
+TRANSACTION = """<ns3:BankingTransaction><ns2:id>%(id)s</ns2:id><ns2:currencyType>USD</ns2:currencyType><ns2:institutionTransactionId>INTUIT-%(id)s</ns2:institutionTransactionId><ns2:payeeName>%(payee)s</ns2:payeeName><ns2:memo>Purchase %(id)s</ns2:memo><ns2:postedDate>2013-%(month)02d-%(day)02dT00:00:00-07:00</ns2:postedDate><ns2:userDate>2013-%(month)02d-%(day)02dT00:00:00-07:00</ns2:userDate><ns2:amount>%(amount)s</ns2:amount><ns2:pending>false</ns2:pending><ns2:categorization><ns2:common><ns2:normalizedPayeeName>%(payee)s</ns2:normalizedPayeeName></ns2:common><ns2:context><ns2:source>AAN</ns2:source><ns2:categoryName>%(category)s</ns2:categoryName></ns2:context></ns2:categorization></ns3:BankingTransaction>"""
+
+PAYEES = (('Coffee Shop', 'Dining'), ('Gas Station', 'Auto'), ('Grocery Store', 'Groceries'), ('Payroll', 'Income'))
+
+
+def transactions_xml(count=50000):
+    """A ``get_account_transactions`` response with `count` banking transactions"""
+    transactions = []
+
+    for i in xrange(count):
+        payee, category = PAYEES[i % len(PAYEES)]
+        transactions.append(TRANSACTION % {
+            'id': 400000000000 + i,
+            'payee': payee,
+            'category': category,
+            'month': i % 12 + 1,
+            'day': i % 28 + 1,
+            'amount': '%.2f' % ((i % 500) / 7.0 * (1 if category == 'Income' else -1)),
+        })
+
+    return TRANSACTIONS % ''.join(transactions)